@@ -1,7 +1,7 @@
 import numpy as np
 from numpy import identity, zeros
 
-from data import N
+import data
 from parameters import beta, init
 
 
@@ -16,8 +16,6 @@ def CVaR(h):
     l = int(np.ceil(S * (1-beta)))
     return - (f[:l-1].sum() / (S * (1-beta)) + f[l-1] * (1 - (l-1) / (S * (1 - beta))))
 
-e = identity(N+1)
-
 
 def generateΔCVaR(RT, h_plus):
     """
@@ -26,8 +24,115 @@ def generateΔCVaR(RT, h_plus):
     :param h_plus:  np.ndarray
     :return:        np.ndarray
     """
-    CVaR_plus = zeros(N+1)
-    for i in range(N+1):
+    e = identity(data.N+1)
+    CVaR_plus = zeros(data.N+1)
+    for i in range(data.N+1):
         CVaR_plus[i] = CVaR(RT * (h_plus + [e[i]]))
     ΔCVaR = CVaR_plus - CVaR(RT * h_plus)
-    return ΔCVaR
\ No newline at end of file
+    return ΔCVaR
+
+
+class IncrementalCVaR:
+    """
+    Sorted-loss index over the terminal wealths of the training memory, giving the same result as generateΔCVaR without
+    re-sorting the whole memory N+2 times.
+
+    A unit perturbation of position i moves every terminal profit f[s] by RT[s, i], i.e. by at most Δ = max(RT) - min(RT).
+    Hence only the profits lying within Δ of the beta-quantile can change side: the ones below this band are always in the
+    tail, the ones above never are. The index keeps the profits sorted (insertion by bisection), and the sums of f and RT
+    over the sorted prefix below the band, so that each ΔCVaR only sorts the (small) band for all the N+1 perturbations
+    at once.
+    """
+
+    def __init__(self, window: int=None):
+        """
+        :param window:  If given, only the last window scenarios are kept (sliding window estimate of the CVaR)
+        """
+        self.window = window
+        self._RT = zeros((window or 64, data.N+1))  # Final returns, by slot (grown by doubling, or ring of size window)
+        self.f = zeros(0)                           # Sorted terminal profits
+        self.order = zeros(0, dtype=np.int64)       # Slot in self._RT of each sorted profit
+        self.count = 0                              # Number of scenarios added
+        # Bounds of the returns: they are not shrunk when scenarios leave the window, which only widens the band
+        self.RT_min = np.full(data.N+1, np.inf)
+        self.RT_max = np.full(data.N+1, -np.inf)
+
+        # Sums over the sorted prefix [0, k)
+        self.k = 0
+        self.f_prefix = 0.
+        self.RT_prefix = zeros(data.N+1)
+
+    def __len__(self):
+        return len(self.f)
+
+    def add(self, RT: np.ndarray, h_plus: np.ndarray):
+        """
+        Stores a new training scenario (and forgets the oldest one if the window is full).
+        :param RT:      Final returns (Gross)
+        :param h_plus:  Post-decision state at T-1
+        """
+        if self.window is not None:
+            i = self.count % self.window
+            if len(self.f) == self.window:
+                self.remove(i)
+        else:
+            i = self.count
+            if i == len(self._RT):
+                self._RT = np.concatenate((self._RT, zeros((i, data.N+1))))
+        f = (RT * h_plus).sum() - init
+        self._RT[i] = RT
+        self.RT_min = np.minimum(self.RT_min, RT)
+        self.RT_max = np.maximum(self.RT_max, RT)
+        self.count += 1
+
+        p = np.searchsorted(self.f, f)
+        self.f = np.insert(self.f, p, f)
+        self.order = np.insert(self.order, p, i)
+        if p < self.k:
+            self.k += 1
+            self.f_prefix += f
+            self.RT_prefix += RT
+
+    def remove(self, i: int):
+        """Forgets the scenario stored in the slot i."""
+        p = np.nonzero(self.order == i)[0][0]
+        if p < self.k:
+            self.k -= 1
+            self.f_prefix -= self.f[p]
+            self.RT_prefix -= self._RT[i]
+        self.f = np.delete(self.f, p)
+        self.order = np.delete(self.order, p)
+
+    def _move_prefix(self, k: int):
+        """Moves the end of the summed prefix to the sorted position k."""
+        if k > self.k:
+            rows = self.order[self.k:k]
+            self.f_prefix += self.f[self.k:k].sum()
+            self.RT_prefix += self._RT[rows].sum(axis=0)
+        elif k < self.k:
+            rows = self.order[k:self.k]
+            self.f_prefix -= self.f[k:self.k].sum()
+            self.RT_prefix -= self._RT[rows].sum(axis=0)
+        self.k = k
+
+    def ΔCVaR(self) -> np.ndarray:
+        """Return the ΔCVaR of the stored scenarios (see generateΔCVaR)."""
+        S = len(self.f)
+        c = S * (1 - beta)
+        l = int(np.ceil(c))
+        q = self.f[l-1]
+        Δ = (self.RT_max - self.RT_min).max()
+
+        lo = np.searchsorted(self.f, q - Δ, side='left')
+        hi = np.searchsorted(self.f, q + Δ, side='right')
+        self._move_prefix(lo)
+
+        # Profits of the band, unperturbed (first row) and perturbed by each unit position (following rows)
+        band = self._RT[self.order[lo:hi]]
+        perturbed = self.f[lo:hi] + np.vstack((zeros(hi - lo), band.T))
+        perturbed.sort(axis=1)
+
+        j = l - 1 - lo
+        below = self.f_prefix + np.concatenate(((0.,), self.RT_prefix))
+        cvar = - ((below + perturbed[:, :j].sum(axis=1)) / c + perturbed[:, j] * (1 - (l-1) / c))
+        return cvar[1:] - cvar[0]
@@ -3,68 +3,239 @@ from abc import ABCMeta, abstractmethod
 import numpy as np
 import numpy.random as rd
 
-from data import Data, N
+import data
 from parameters import freq
+from sampling import chiSquare, standardNormal
 
 
 class Generator:
     __metadata__ = ABCMeta
 
+    # Number of scenarios generated at once when filling a batch
+    chunk = 1000
+
     @abstractmethod
     def generate(self, S: int) -> np.ndarray:
         raise NotImplementedError
 
+    def generate_batch(self, S: int, T: int, filename=None) -> np.ndarray:
+        """
+        Generates S scenarios of T time steps at once.
+        :param filename:  If given, the scenarios are stored in this .npy file, memory-mapped (see loadScenarios)
+        :return:          S x T x (N+1) array of Gross returns
+        """
+        if filename is None:
+            return np.ascontiguousarray(self.generate_paths(S, T))
+        scenarios = np.lib.format.open_memmap(filename, mode='w+', dtype=np.float64, shape=(S, T, data.N+1))
+        for s in range(0, S, self.chunk):
+            n = min(self.chunk, S - s)
+            scenarios[s:s+n] = self.generate_paths(n, T)
+        scenarios.flush()
+        return scenarios
+
+    def generate_paths(self, S: int, T: int) -> np.ndarray:
+        """
+        Generates S paths of T time steps (by default, S * T independent scenarios).
+        :return:          S x T x (N+1) array of Gross returns
+        """
+        return self.generate(S * T).reshape(S, T, data.N+1)
+
 
 class GaussianGenerator(Generator):
 
-    def __init__(self, r, start=None, end=None):
+    def __init__(self, r, start=None, end=None, qmc=False, antithetic=False):
+        """
+        :param qmc:         Quasi-Monte Carlo sampling (scrambled Halton sequence, see sampling.standardNormal)
+        :param antithetic:  Antithetic sampling
+        """
         self.r = r
-        self.Gross = (Data.asfreq(freq, method='pad').pct_change()+1)[1:][start:end]
+        self.qmc = qmc
+        self.antithetic = antithetic
+        self.Gross = data.dataset.gross(start=start, end=end, freq=freq)
         self.LogGross = np.log(self.Gross)
         self.mean = self.LogGross.mean()
         self.cov = self.LogGross.cov()
+        self.L = np.linalg.cholesky(self.cov)   # Cholesky factor, computed once
 
     def generate(self, S: int) -> np.ndarray:
-        LogScenarios = rd.multivariate_normal(self.mean, self.cov, size=S)
+        LogScenarios = standardNormal(S, data.N, self.qmc, self.antithetic).dot(self.L.T) + np.array(self.mean)
         return np.concatenate(((1+self.r) * np.ones((S, 1)), np.exp(LogScenarios)), axis=1)
 
 
-class StudentTGenerator:
+class StudentTGenerator(Generator):
 
-    def __init__(self, r, nu=2, start=None, end=None):
+    def __init__(self, r, nu=2, start=None, end=None, qmc=False, antithetic=False):
+        """
+        :param qmc:         Quasi-Monte Carlo sampling (scrambled Halton sequence, see sampling.standardNormal), the
+                            chi-square variable being drawn as a sum of nu squared normal variables (nu must be an integer)
+        :param antithetic:  Antithetic sampling
+        """
+        if (qmc or antithetic) and nu != int(nu):
+            raise ValueError("Quasi-Monte Carlo and antithetic sampling need an integer nu")
         self.r = r
         self.nu = nu
-        self.Gross = (Data.asfreq(freq, method='pad').pct_change()+1)[1:][start:end]
+        self.qmc = qmc
+        self.antithetic = antithetic
+        self.Gross = data.dataset.gross(start=start, end=end, freq=freq)
         self.LogGross = np.log(self.Gross)
         self.mean = self.LogGross.mean()
         self.cov = self.LogGross.cov()
+        self.L = np.linalg.cholesky(self.cov)   # Cholesky factor, computed once
 
     def generate(self, S) -> np.ndarray:
-        gaussian = rd.multivariate_normal(np.zeros(N), self.cov, S)
-        chi2 = rd.chisquare(self.nu, (S, 1))
+        if self.qmc or self.antithetic:
+            Z = standardNormal(S, data.N + int(self.nu), self.qmc, self.antithetic)
+            gaussian, chi2 = Z[:, :data.N].dot(self.L.T), chiSquare(Z[:, data.N:])
+        else:
+            gaussian = rd.standard_normal((S, data.N)).dot(self.L.T)
+            chi2 = rd.chisquare(self.nu, (S, 1))
         LogScenarios = gaussian / np.sqrt(self.nu / chi2) + np.array(self.mean)
         return np.concatenate(((1 + self.r) * np.ones((S, 1)), np.exp(LogScenarios)), axis=1)
 
 
-class OGARCHGenerator:
-
-    def __init__(self, start=None, end=None):
-        self.Gross = (Data.asfreq(freq, method='pad').pct_change()+1)[1:][start:end]
+def loadScenarios(filename) -> np.ndarray:
+    """Loads, memory-mapped, the S x T x (N+1) scenarios stored by Generator.generate_batch."""
+    return np.load(filename, mmap_mode='r')
+
+
+def garchLikelihood(x, alpha, beta):
+    """
+    Gaussian log-likelihood of the GARCH(1,1) models of the series x, with variance targeting:
+        h[t+1] = omega + alpha x[t]^2 + beta h[t],    omega = var(x) (1 - alpha - beta),    h[0] = var(x)
+    evaluated at once for arrays of parameters alpha and beta.
+    :return: the log-likelihoods (up to a constant) and the conditional variances of the step following the series
+    :rtype: (numpy.array, numpy.array)
+    """
+    var = x.var()
+    omega = var * (1 - alpha - beta)
+    h = np.full(np.shape(alpha), var)
+    likelihood = np.zeros(np.shape(alpha))
+    for x2 in x ** 2:
+        likelihood -= np.log(h) + x2 / h
+        h = omega + alpha * x2 + beta * h
+    return likelihood / 2, h
+
+
+def fitGARCH(x, grid=16, zooms=6, persistence=0.999):
+    """
+    Fits a GARCH(1,1) model to the (centered) series x by maximum likelihood with variance targeting (see
+    garchLikelihood): the likelihood is maximized on a grid of (alpha, beta), which is then narrowed around the best
+    point zooms times. All the points of a grid are evaluated at once.
+    :type x:           numpy.array - Centered series
+    :type persistence: float       - Max alpha + beta (the variance must be stationary)
+    :return: omega, alpha, beta and the conditional variance of the next step
+    :rtype: (float, float, float, float)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    (alo, ahi), (blo, bhi) = (0., 0.5), (0., persistence)
+    for _ in range(zooms):
+        alpha, beta = np.meshgrid(np.linspace(alo, ahi, grid), np.linspace(blo, bhi, grid))
+        alpha, beta = alpha[alpha + beta <= persistence], beta[alpha + beta <= persistence]
+        likelihood, h = garchLikelihood(x, alpha, beta)
+        best = likelihood.argmax()
+        a, b = alpha[best], beta[best]
+        da, db = 2 * (ahi - alo) / (grid - 1), 2 * (bhi - blo) / (grid - 1)
+        (alo, ahi), (blo, bhi) = (max(0., a - da), min(0.5, a + da)), (max(0., b - db), min(persistence, b + db))
+    return x.var() * (1 - a - b), a, b, h[best]
+
+
+class OGARCHGenerator(Generator):
+    """
+    Orthogonal GARCH: the weekly log gross returns are projected on their principal components, which are modelled as
+    independent GARCH(1,1) processes (fitted once, see fitGARCH). The components beyond the factors first ones keep
+    their (constant) sample variance. The paths of generate_batch are simulated step by step, all at once, with the
+    conditional variances updated along each path, so that the volatility clusters over time.
+    """
+
+    def __init__(self, r, start=None, end=None, factors=None):
+        """
+        :param factors:  Number of principal components following a GARCH process (default: all)
+        """
+        self.r = r
+        self.Gross = data.dataset.gross(start=start, end=end, freq=freq)
         self.LogGross = np.log(self.Gross)
-        self.mean = self.LogGross.mean()
+        self.mean = np.array(self.LogGross.mean())
         self.cov = self.LogGross.cov()
+        # Principal components, by decreasing variance
+        variances, W = np.linalg.eigh(self.cov)
+        self.W = W[:, ::-1]
+        self.variances = variances[::-1]
+        self.factors = data.N if factors is None else factors
+        F = (np.array(self.LogGross) - self.mean).dot(self.W)
+        fits = np.array([fitGARCH(F[:, i]) for i in range(self.factors)]).reshape(-1, 4)
+        self.omega, self.alpha, self.beta, self.h = fits.T
+
+    def variance(self, h):
+        """Return the variances of all the principal components, given the conditional variances h of the factors."""
+        constant = np.broadcast_to(self.variances[self.factors:], h.shape[:-1] + (data.N - self.factors,))
+        return np.concatenate((h, constant), axis=-1)
+
+    def gross(self, F):
+        """Return the gross returns (with the riskless asset first) of the principal components values F."""
+        riskless = (1 + self.r) * np.ones(F.shape[:-1] + (1,))
+        return np.concatenate((riskless, np.exp(F.dot(self.W.T) + self.mean)), axis=-1)
 
     def generate(self, S: int) -> np.ndarray:
-        from rpy2.robjects import pandas2ri, r as R
-        pandas2ri.activate()
-        R.assign('Data', self.Data)
-        R.assign('N', N)
-        R("""
-library(rmgarch)
-xspec = ugarchspec(mean.model = list(armaOrder = c(1, 1)), variance.model = list(garchOrder = c(1,1), model = 'sGARCH'), distribution.model = 'norm')
-uspec = multispec(replicate(N, xspec))
-spec = dccspec(uspec = uspec, dccOrder = c(1, 1), distribution = 'mvnorm')
-speca = dccspec(uspec = uspec, dccOrder = c(1, 1), model='aDCC', distribution = 'mvnorm')
-fit_adcc = dccfit(spec1a, data = Data)
-""")
+        """Generates S scenarios of the next step, from the conditional variances at the end of the data."""
+        return self.gross(rd.standard_normal((S, data.N)) * np.sqrt(self.variance(self.h)))
+
+    def generate_paths(self, S: int, T: int) -> np.ndarray:
+        F = np.empty((S, T, data.N))
+        h = np.tile(self.h, (S, 1))
+        for t in range(T):
+            F[:, t] = rd.standard_normal((S, data.N)) * np.sqrt(self.variance(h))
+            h = self.omega + self.alpha * F[:, t, :self.factors] ** 2 + self.beta * h
+        return self.gross(F)
+
+
+# Model of the assets without a chosen specification in ARCHGenerator
+defaultSpecification = {'mean': 'Constant', 'vol': 'GARCH', 'dist': 'Normal', 'p': 1, 'q': 1}
+
+
+class ARCHGenerator(Generator):
+    """
+    Univariate volatility model of each asset, with the specification chosen by the model selection of scenarios.garch
+    (see scenarios.garch.specifications), fitted once with arch to its weekly log gross returns. The assets are linked
+    by a Gaussian copula, with the correlation of their standardized residuals: the shocks of the paths are correlated
+    normal variables, mapped to the distribution of each model, from which arch simulates the paths of each asset from
+    the end of the data.
+    """
+
+    def __init__(self, r, start=None, end=None, specifications=None):
+        """
+        :param specifications:  Specification of each ticker, as the arguments of arch_model (e.g. the output of
+                                scenarios.garch.specifications), the other tickers following defaultSpecification
+        """
+        from arch import arch_model
+        self.r = r
+        self.Gross = data.dataset.gross(start=start, end=end, freq=freq)
+        # In percent, the scale expected by the arch optimizer
+        LogGross = 100 * np.log(self.Gross)
+        specifications = specifications or {}
+        self.specifications = [specifications.get(ticker, defaultSpecification) for ticker in self.Gross.columns]
+        self.fits = [arch_model(LogGross[ticker].values, **spec).fit(disp='off', show_warning=False)
+                     for (ticker, spec) in zip(self.Gross.columns, self.specifications)]
+        residuals = np.column_stack([fit.std_resid for fit in self.fits])
+        residuals = residuals[~np.isnan(residuals).any(axis=1)]
+        self.L = np.linalg.cholesky(np.corrcoef(residuals.T))
+
+    def shocks(self, i: int, U: np.ndarray) -> np.ndarray:
+        """Return the standardized shocks of the model of the asset i, whose CDF values are U."""
+        fit = self.fits[i]
+        distribution = fit.model.distribution
+        return distribution.ppf(U, fit.params.values[len(fit.params) - distribution.num_params:])
 
+    def generate(self, S: int) -> np.ndarray:
+        """Generates S scenarios of the next step."""
+        return self.generate_paths(S, 1)[:, 0]
+
+    def generate_paths(self, S: int, T: int) -> np.ndarray:
+        from scipy.special import ndtr
+        U = ndtr(rd.standard_normal((S, T, data.N)).dot(self.L.T))
+        LogGross = np.empty((S, T, data.N))
+        for i, fit in enumerate(self.fits):
+            shocks = self.shocks(i, U[:, :, i])
+            forecast = fit.forecast(horizon=T, method='simulation', simulations=S, rng=lambda size: shocks)
+            LogGross[:, :, i] = forecast.simulations.values[-1] / 100
+        riskless = (1 + self.r) * np.ones((S, T, 1))
+        return np.concatenate((riskless, np.exp(LogGross)), axis=-1)
@@ -1,7 +1,7 @@
 from numpy import identity, zeros
 
 from adp.value_function import ValueFunction
-from data import N
+import data
 from parameters import *
 from ..transition import ft
 
@@ -22,9 +22,9 @@ class LADPInspectionModel(object):
         :param V     : V, old value function
         :rtype       : LADPInspectionModel
         """
-        e = identity(N+1)
-        V_plus = zeros(N+1)
-        for i in range(N+1):
+        e = identity(data.N+1)
+        V_plus = zeros(data.N+1)
+        for i in range(data.N+1):
             h = R * (h_plus + e[i])
             x, y = self.step(h, V)
             V_plus[i] = V(ft(h, x, y))
@@ -46,8 +46,8 @@ class LADPInspectionModel(object):
         cash = h[0]
 
         # Return values
-        x = zeros(N)
-        y = zeros(N)
+        x = zeros(data.N)
+        y = zeros(data.N)
 
         k =   u[1:] - (1+theta) * u[0]  # Buying slopes
         l = - u[1:] + (1-theta) * u[0]  # Selling slopes
@@ -4,7 +4,7 @@ from gurobipy import GRB, Model, quicksum
 from numpy import array, identity
 
 from adp.transition import ft
-from data import N
+import data
 from parameters import theta
 
 
@@ -15,10 +15,10 @@ class ADPModel(Model):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setParam('OutputFlag', False)
-        self._x = array([self.addVar(lb=0) for i in range(N)])
-        self._y = array([self.addVar(lb=0) for i in range(N)])
+        self._x = array([self.addVar(lb=0) for i in range(data.N)])
+        self._y = array([self.addVar(lb=0) for i in range(data.N)])
         self.update()
-        self._holdingConstrs = [self.addConstr(- self._x[i] + self._y[i] <= 0) for i in range(N)]
+        self._holdingConstrs = [self.addConstr(- self._x[i] + self._y[i] <= 0) for i in range(data.N)]
         self._budgetConstr = self.addConstr(
             (1+theta) * quicksum(self._x) - (1-theta) * quicksum(self._y) <= 0
         )
@@ -30,7 +30,7 @@ class ADPModel(Model):
         self._h_plus_pre = h_plus
         self._h = R * h_plus
         self._V = V
-        for i in range(N):
+        for i in range(data.N):
             self._holdingConstrs[i].RHS = self._h[i+1]
         self._budgetConstr.RHS = self._h[0]
         self._h_plus = ft(self._h, self._x, self._y)
@@ -62,10 +62,10 @@ class ADPModel(Model):
         return self._V(self._R) + array([self._budgetConstr.Pi] + [cstr.Pi for cstr in self._holdingConstrs]) * self._R
 
     def manualΔV(self):
-        e = identity(N+1)
+        e = identity(data.N+1)
         V_plus = array([
             self.solve(self._R, self._h_plus_pre + e[i], self._V).objVal
-            for i in range(N+1)
+            for i in range(data.N+1)
             ])
         return V_plus - self.solve(self._R, self._h_plus_pre, self._V).objVal
 
@@ -5,7 +5,7 @@ from adp.updater import generateΔCVaR
 from numpy import array, ones, zeros
 
 from adp.generator import GaussianGenerator
-from data import N
+import data
 from parameters import T, alpha, gamma, init
 
 
@@ -15,8 +15,8 @@ class LValueFunctionUpdater:
         self.V = V
         self.m = m
         self.generator = GaussianGenerator()
-        self.h_plus = array([], dtype=np.int64).reshape(0, N+1)
-        self.RT = array([], dtype=np.int64).reshape(0, N+1)
+        self.h_plus = array([], dtype=np.int64).reshape(0, data.N+1)
+        self.RT = array([], dtype=np.int64).reshape(0, data.N+1)
         self.counter = count()
 
     def __next__(self):
@@ -24,12 +24,12 @@ class LValueFunctionUpdater:
         print("Scenario", s)
 
         # Initialization
-        deltaV = zeros((T, N+1))
-        h_plus = zeros(N+1)
+        deltaV = zeros((T, data.N+1))
+        h_plus = zeros(data.N+1)
         h_plus[0] = init
 
         print("\tTime 0")
-        self.m.solve(ones(N+1), h_plus, self.V[0])
+        self.m.solve(ones(data.N+1), h_plus, self.V[0])
         h_plus = self.m.h_plus
 
         # 1 <= t <= T - 1
@@ -2,7 +2,7 @@ import numpy as np
 from numpy import zeros
 
 from adp.ladp.inspection import LADPInspectionModel
-from data import N
+import data
 from parameters import theta, w0
 
 
@@ -19,14 +19,14 @@ def LADPUB(obj, R: np.ndarray, h_plus: np.ndarray, u: np.array):
     h = h_plus * R
 
     # Return values
-    x = zeros(N)
-    y = zeros(N)
+    x = zeros(data.N)
+    y = zeros(data.N)
 
     k =   u[1:] - (1 + theta) * u[0]          # Buying slopes
     l = - u[1:] + (1 - theta) * u[0]          # Selling slopes
 
     # Indexer used to find index on a mask
-    indexer = np.arange(N)
+    indexer = np.arange(data.N)
 
     # Step 0
 
@@ -1,7 +1,7 @@
 from numpy import array
 
 from adp.ladp.model import LADPModel
-from data import N
+import data
 from parameters import w0
 
 
@@ -9,11 +9,11 @@ class LADPUBModel(LADPModel):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._UBConstrs = [self.addConstr(self._x[i] - self._y[i] <= 0) for i in range(N)]
+        self._UBConstrs = [self.addConstr(self._x[i] - self._y[i] <= 0) for i in range(data.N)]
 
     def set(self, R, h_plus, u):
         super().set(R, h_plus, u)
-        for i in range(N):
+        for i in range(data.N):
             self._UBConstrs[i].RHS = w0 - self._h[i+1]
 
     @property
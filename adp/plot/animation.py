@@ -3,7 +3,7 @@ from matplotlib.animation import FuncAnimation
 from mpl_toolkits.mplot3d import Axes3D
 from numpy import arange, ones, zeros
 
-from data import Data, N
+import data
 from parameters import S, T, repeat
 
 
@@ -30,9 +30,9 @@ class ValueFunctionAnimation(FuncAnimation):
         self.lines = []
         self.lines.append(self.ax.plot(self.xs, 0 * self.ys, zeros(T),
                                        label='Cash', color=colors[0])[0])
-        for i in range(1, N):
+        for i in range(1, data.N):
             self.lines.append(self.ax.plot(self.xs, i * self.ys, zeros(T),
-                                           label=Data.columns[i-1],
+                                           label=data.Data.columns[i-1],
                                            color=colors[i])[0])
         self.ax.legend()
         super().__init__(self.fig, self.run, S-1, blit=True, repeat=False)
@@ -2,7 +2,7 @@ from mpl_toolkits.mplot3d import Axes3D
 from numpy import ones
 
 from adp.plot.base import PlotterProcess
-from data import N
+import data
 
 
 class FinalPositionsPlotter(PlotterProcess):
@@ -15,7 +15,7 @@ class FinalPositionsPlotter(PlotterProcess):
     def draw(self):
         memory = self.trainer.memory
         self.ax.clear()
-        for n in range(N):
+        for n in range(data.N):
             s = len(memory.RT)
             xs = range(s)
             ys = n * ones(s)
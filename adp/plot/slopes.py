@@ -5,7 +5,7 @@ from mpl_toolkits.mplot3d import Axes3D
 from numpy import ones
 
 from adp.plot.base import PlotterProcess
-from data import N
+import data
 from parameters import T, figsize
 
 
@@ -18,7 +18,7 @@ class SlopesNumberPlotter(PlotterProcess):
 
     def draw(self):
         self.ax.clear()
-        for n in range(N):
+        for n in range(data.N):
             xs = range(T)
             ys = n * ones(T)
             zs = [len(self.V[t].V[n].a) for t in range(T)]
@@ -38,7 +38,7 @@ class MeanBreaksPlotter(PlotterProcess):
 
     def draw(self):
         self.ax.clear()
-        for n in range(N):
+        for n in range(data.N):
             xs = range(T)
             ys = n * ones(T)
             zs = [Vt.V[n].a.mean() for Vt in self.V]
@@ -58,7 +58,7 @@ class MeanSlopesPlotter(PlotterProcess):
 
     def draw(self):
         self.ax.clear()
-        for n in range(N):
+        for n in range(data.N):
             xs = range(T)
             ys = n * ones(T)
             zs = [V[n].slopes.mean() / V.cash for V in self.strategy]
@@ -79,7 +79,7 @@ class FirstSlopeAx(Axes3D):
 
     def plot(self):
         super().clear()
-        for n in range(N):
+        for n in range(data.N):
             xs = range(T)
             ys = n * ones(T)
             zs = [V[n].slopes[0] / V.cash for V in self.strategy]
@@ -1,7 +1,7 @@
 import numpy as np
 
 from adp.plot.base import PlotterProcess
-from data import Data
+import data
 from parameters import test_end, test_start, init
 
 
@@ -14,7 +14,7 @@ class GrossTestPlotter(PlotterProcess):
         self.ax = self.fig.gca()
         self.scenarios = []
         self.test_wealth = []
-        self.gross = (Data.asfreq('W-FRI', method='pad').pct_change()+1)[1:][test_start:test_end]
+        self.gross = data.dataset.gross(start=test_start, end=test_end, freq='W-FRI')
         self.lengths = lengths
 
     def draw(self):
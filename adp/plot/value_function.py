@@ -3,7 +3,7 @@ from numpy import ones, zeros
 
 from adp.plot.base import PlotterProcess
 from adp.strategy import ADPStrategy
-from data import Data
+import data
 from parameters import T
 
 
@@ -14,7 +14,7 @@ class PWLValueFunctionPlotter(PlotterProcess):
         self.strategy = strategy
         self.n = n
         self.ax = Axes3D(self.fig)
-        self.ax.set_title(Data.columns[self.n])
+        self.ax.set_title(data.Data.columns[self.n])
 
     def draw(self):
         width = 0.1
@@ -1,87 +1,127 @@
 import numpy as np
 from numpy import zeros
 
-from adp.ladp.inspection import LADPInspectionModel
-from adp.value_function import ValueFunction
-from data import N
-from parameters import M, theta
+from adp.value_function import SeparableValueFunction
+import data
+from parameters import theta
 
 
-class PWLADPInspectionModel(LADPInspectionModel):
+class PWLADPInspectionModel(object):
+    """
+    Solver-free equivalent of PWLADPModel / gurobiModel: solves exactly, by inspection, the separable concave PWL
+    rebalancing problem
+        max  - V.cash * ((1+theta) sum(x) - (1-theta) sum(y)) + sum_i V_i(h_i + x_i - y_i)
+        s.t. (1+theta) sum(x) - (1-theta) sum(y) <= h_0,   h_i + x_i - y_i >= 0,   x, y >= 0.
 
-    def __init__(self):
-        super().__init__()
-        self.pi = None
-
-    def solve(self, R: np.ndarray, h_plus: np.ndarray, V: ValueFunction):
-        self.pi = np.argmin(V.idx(h_plus[1:]), axis=0) - 1
-        return super().solve(R, h_plus, V)
-
-    def step(self, h, V: ValueFunction):
-
-        idx = V.idx(h[1:])
-        pi = np.argmin(idx, axis=0) - 1
-
-        # Computing max bound
-        w_tidle = zeros((M, N))
-        w_tidle[:-1] = V.a[1:] - V.a[:-1]
-        w_tidle[-1] = float('inf')
-
-        # Computing approximate pre-decision variables
-        h_tidle = zeros((M, N))
-        h_tidle[idx] = w_tidle[idx]
-        h_tidle[pi, range(N)] = h[1:] - V.a[pi, range(N)]
-
-        # Return values
-        x = zeros((M, N))
-        y = zeros((M, N))
+    Each asset position is split into segments of the PWL value function: the ones above h_i can be bought, the ones below
+    h_i can be sold. For a cash value mu = V.cash + lambda (lambda being the dual of the budget constraint), a segment of
+    slope s is bought iff s / (1+theta) > mu and sold iff s / (1-theta) < mu. The budget used is decreasing with mu, so
+    the optimal mu is found by sweeping the sorted segment thresholds, the last crossed segment being partially traded.
+    """
 
-        k = V.slopes - (1 + theta) * V.cash  # Buying slopes
-        l = - V.slopes + (1 - theta) * V.cash  # Selling slopes
-
-        # Step 1: selling Sell assets
-        I = np.logical_and(l > 0, h_tidle > 0)  # Sell assets
-        if I.any():
-            y[I] = h_tidle[I]
-            h[0] += (1 - theta) * y[I].sum()
-
-        # Step 2
-        while True:
-            j_star_idx = np.logical_and(k > 0, h_tidle < w_tidle)
-            if j_star_idx.any():
-                j_star = np.unravel_index((k * j_star_idx).argmax(), (M, N))  # Best buy
-                if w_tidle[j_star] - h_tidle[j_star] < h[0] / (1 + theta):
-                    x[j_star] = w_tidle[j_star] - h_tidle[j_star]
-                    h[0] -= (1 + theta) * x[j_star]
-                else:
-                    x[j_star] = h[0] / (1 + theta)
-                    h[0] = 0
-                    break
-            else:
-                break
-
-        # Step 3: Perform sell-to-buy transactions if there is still a best buy
-        while True:
-            if j_star_idx.any():
-                j_star = np.unravel_index((k * j_star_idx).argmax(), (M, N))
-                i_star_idx = np.logical_and(l <= 0, h_tidle > 0, (1 - theta) / (1 + theta) * k[j_star] + l > 0)
-                if i_star_idx.any():
-                    i_star = np.unravel_index(np.where(i_star_idx, l, float('-inf')).argmax(), (M, N))
-                    if h_tidle[i_star] < (1+theta)/(1-theta) * (w_tidle[j_star] - h_tidle[j_star]):
-                        y[i_star] += h_tidle[i_star]
-                        x[j_star] += (1-theta)/(1+theta) * h_tidle[i_star]
-                    else:
-                        y[i_star] += (1+theta)/(1-theta) * (w_tidle[j_star] - h_tidle[j_star])
-                        x[j_star] += w_tidle[j_star] - h_tidle[j_star]
-                    h_tidle[i_star] -= y[i_star]
-                    h_tidle[j_star] += x[j_star]
-                else:
-                    break
-            else:
-                break
-            j_star_idx = np.logical_and(k > 0, h_tidle < w_tidle)
-
-        x = x.sum(axis=0)
-        y = y.sum(axis=0)
-
-        return x, y
+    def __init__(self):
+        self.x = None
+        self.y = None
+        self.h_plus = None
+        self.deltaV = None
+        self.λ = None
+
+    def solve(self, R: np.ndarray, hp: np.ndarray, V: SeparableValueFunction) -> (np.ndarray, np.ndarray):
+        """
+        Same interface and output as gurobiModel.
+        :param R:    Returns at time t (Gross)
+        :param hp:   Post-decision variable (pre-return) at time t-1
+        :param V:    Value function at time t
+        :return:     Post-decision variable at time t + DeltaV
+        """
+        h_plus, deltaV = self.solve_batch(np.asarray(R)[np.newaxis], np.asarray(hp)[np.newaxis], V)
+        self.x, self.y, self.h_plus, self.deltaV, self.λ = self.x[0], self.y[0], h_plus[0], deltaV[0], self.λ[0]
+        return self.h_plus, self.deltaV
+
+    def solve_batch(self, R: np.ndarray, hp: np.ndarray, V: SeparableValueFunction) -> (np.ndarray, np.ndarray):
+        """
+        Solves the problem for K portfolios at once.
+        :param R:    K x (N+1) Returns at time t (Gross)
+        :param hp:   K x (N+1) Post-decision variables (pre-return) at time t-1
+        :param V:    Value function at time t
+        :return:     K x (N+1) Post-decision variables at time t, K x (N+1) DeltaV
+        """
+        R = np.asarray(R, dtype=np.float64)
+        h = R * hp
+        self.x, self.y, self.λ = self.step(h, V)
+        outputCashFlow = (1+theta) * self.x.sum(axis=1) - (1-theta) * self.y.sum(axis=1)
+        self.h_plus = np.maximum(np.concatenate((h[:, :1] - outputCashFlow[:, np.newaxis], h[:, 1:] + self.x - self.y),
+                                                axis=1), 0)
+
+        # Duals: lambda for the budget constraint, and for the holding constraints, the part of the (1-theta) mu selling
+        # price which is not explained by the first slope, when the asset is completely sold.
+        μ = V.cash + self.λ[:, np.newaxis]
+        slopes = V.packed.slopes[:, 0]
+        holdingPi = np.where(self.h_plus[:, 1:] <= 0, np.maximum((1-theta) * μ - slopes, 0), 0)
+        self.deltaV = V.evaluate_batch(R) + np.concatenate((self.λ[:, np.newaxis], holdingPi), axis=1) * R
+        return self.h_plus, self.deltaV
+
+    @staticmethod
+    def step(h: np.ndarray, V: SeparableValueFunction) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Computes the optimal buys and sales from the K pre-decision states h (K x (N+1)).
+        :return: x, y (K x N Buys and Sales) and the K duals of the budget constraint
+        """
+        packed = V.packed
+        c = V.cash
+        a, slopes = packed.a, packed.slopes
+        K, m = len(h), a.shape[1]
+        valid = np.isfinite(a)
+        h0, hs = h[:, 0], h[:, 1:, np.newaxis]
+
+        # Lengths of the segments [a_j, a_j+1) that can be bought (above h) and sold (below h), K x N x m
+        ends = np.concatenate((a[:, 1:], np.full((data.N, 1), np.inf)), axis=1)
+        with np.errstate(invalid='ignore'):
+            buy = np.where(valid & (ends > hs), ends - np.maximum(a, hs), 0)
+            sell = np.where(valid, np.maximum(np.minimum(ends, hs) - a, 0), 0)
+        # The last segment is unbounded: we cannot buy more than all the cash and all the sales allow
+        buy = np.minimum(buy, ((h0 + (1-theta) * h[:, 1:].sum(axis=1)) / (1+theta))[:, np.newaxis, np.newaxis])
+
+        tb = slopes / (1+theta)     # Buying thresholds:  bought while mu < tb
+        ts = slopes / (1-theta)     # Selling thresholds: sold   when  mu > ts
+        bought = (buy > 0) & (tb > c)
+        sold = (sell > 0) & (ts < c)
+        x = np.where(bought, buy, 0)
+        y = np.where(sold, sell, 0)
+
+        # Budget used with mu = V.cash
+        B = (1+theta) * x.sum(axis=(1, 2)) - (1-theta) * y.sum(axis=(1, 2))
+        λ = zeros(K)
+        over = B > h0
+        if over.any():
+            # Events when increasing mu: bought segments are given up, new segments are sold (K x 2Nm, the ones which are
+            # not events being at infinity). When tied, segments farther from h are given up first, and nearer ones are
+            # sold first.
+            toSell = (sell > 0) & ~sold
+            τ = np.concatenate((np.where(bought, tb, np.inf).reshape(K, -1),
+                                np.where(toSell, ts, np.inf).reshape(K, -1)), axis=1)
+            δ = np.concatenate((np.where(bought, (1+theta) * buy, 0).reshape(K, -1),
+                                np.where(toSell, (1-theta) * sell, 0).reshape(K, -1)), axis=1)
+            j = np.broadcast_to(np.tile(np.arange(m), 2 * data.N), τ.shape)
+            order = np.lexsort((-j, τ), axis=-1)
+            after = B[:, np.newaxis] - np.cumsum(np.take_along_axis(δ, order, axis=1), axis=1)
+            hit = after <= h0[:, np.newaxis]
+            k = np.where(hit.any(axis=1), hit.argmax(axis=1), np.isfinite(τ).sum(axis=1) - 1)
+
+            # Events before k are completely crossed, event k is partially crossed so that the budget constraint is tight
+            rank = np.empty_like(order)
+            np.put_along_axis(rank, order, np.arange(τ.shape[1]), axis=1)
+            crossed = over[:, np.newaxis] & (rank < k[:, np.newaxis])
+            partial = over[:, np.newaxis] & (rank == k[:, np.newaxis])
+            rows = np.arange(K)
+            e = order[rows, k]
+            released = (after[rows, k] + δ[rows, e] - h0)[:, np.newaxis, np.newaxis]
+
+            Nm = data.N * m
+            x = np.where(crossed[:, :Nm].reshape(K, data.N, m), 0, x)
+            y = np.where(crossed[:, Nm:].reshape(K, data.N, m), sell, y)
+            x = np.where(partial[:, :Nm].reshape(K, data.N, m), buy - released / (1+theta), x)
+            y = np.where(partial[:, Nm:].reshape(K, data.N, m), released / (1-theta), y)
+            λ = np.where(over, τ[rows, e] - c, 0)
+
+        return x.sum(axis=2), y.sum(axis=2), λ
@@ -4,7 +4,7 @@ import numpy as np
 from numpy import array
 
 from adp.value_function import ValueFunction
-from data import N
+import data
 from parameters import theta
 
 
@@ -22,9 +22,9 @@ def gurobiModel(R, hp, V: ValueFunction) -> (np.ndarray, np.ndarray):
     m.setParam('OutputFlag', False)
 
     # Variables
-    hpv = array([m.addVar(lb=-GRB.INFINITY) for _ in range(N)])  # h_plus at time t
-    xv = array([m.addVar() for _ in range(N)])                   # Buys   at time t
-    yv = array([m.addVar() for _ in range(N)])                   # Sales  at time t
+    hpv = array([m.addVar(lb=-GRB.INFINITY) for _ in range(data.N)])  # h_plus at time t
+    xv = array([m.addVar() for _ in range(data.N)])                   # Buys   at time t
+    yv = array([m.addVar() for _ in range(data.N)])                   # Sales  at time t
     m.update()
 
     # Linear Expressions
@@ -33,12 +33,12 @@ def gurobiModel(R, hp, V: ValueFunction) -> (np.ndarray, np.ndarray):
 
     # Objective
     m.setObjective(- V.cash * outputCashFlow, GRB.MAXIMIZE)
-    for i in range(N):
+    for i in range(data.N):
         m.setPWLObj(hpv[i], V[i].x(), V[i].y())
 
     # Constraints
-    eqCstrs = [m.addConstr(hpv[i] - h[i+1] == xv[i] - yv[i]) for i in range(N)]
-    holdingCstrs = [m.addConstr(- xv[i] + yv[i] <= h[i+1]) for i in range(N)]
+    eqCstrs = [m.addConstr(hpv[i] - h[i+1] == xv[i] - yv[i]) for i in range(data.N)]
+    holdingCstrs = [m.addConstr(- xv[i] + yv[i] <= h[i+1]) for i in range(data.N)]
     budgetCstr = m.addConstr(outputCashFlow <= h[0])
 
     try:
@@ -48,3 +48,65 @@ def gurobiModel(R, hp, V: ValueFunction) -> (np.ndarray, np.ndarray):
 
     return np.maximum([h[0] - outputCashFlow.getValue()] + [v.x for v in hpv], 0), \
            V(R) + array([budgetCstr.Pi] + [c.Pi for c in holdingCstrs]) * R
+
+
+class PWLADPModel(Model):
+    """
+    Persistent version of gurobiModel for one time step: the variables and constraints are created once, and each call to
+    solve only updates the right-hand sides (h), the cash objective coefficients and the PWL objectives, so that Gurobi
+    re-optimizes from the previous basis instead of building a new model.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setParam('OutputFlag', False)
+
+        # Variables
+        self._hpv = array([self.addVar(lb=-GRB.INFINITY) for _ in range(data.N)])  # h_plus at time t
+        self._xv = array([self.addVar() for _ in range(data.N)])                   # Buys   at time t
+        self._yv = array([self.addVar() for _ in range(data.N)])                   # Sales  at time t
+        self.update()
+
+        # Linear Expressions
+        self._outputCashFlow = (1+theta) * quicksum(self._xv) - (1-theta) * quicksum(self._yv)
+        """:type: gurobipy.LinExpr"""
+
+        # Constraints (right-hand sides are set in solve)
+        self._eqCstrs = [self.addConstr(self._hpv[i] - self._xv[i] + self._yv[i] == 0) for i in range(data.N)]
+        self._holdingCstrs = [self.addConstr(- self._xv[i] + self._yv[i] <= 0) for i in range(data.N)]
+        self._budgetCstr = self.addConstr(self._outputCashFlow <= 0)
+
+        self.ModelSense = GRB.MAXIMIZE
+
+    def set(self, h, V: ValueFunction):
+        for i in range(data.N):
+            self._eqCstrs[i].RHS = h[i+1]
+            self._holdingCstrs[i].RHS = h[i+1]
+        self._budgetCstr.RHS = h[0]
+
+        # Objective: - V.cash * outputCashFlow + sum of the PWL value functions of the positions
+        for v in self._xv:
+            v.Obj = - V.cash * (1+theta)
+        for v in self._yv:
+            v.Obj = V.cash * (1-theta)
+        for i in range(data.N):
+            self.setPWLObj(self._hpv[i], V[i].x(), V[i].y())
+
+    def solve(self, R, hp, V: ValueFunction) -> (np.ndarray, np.ndarray):
+        """
+        Same interface and output as gurobiModel.
+        :param R:    Returns at time t (Gross)
+        :param hp:   Post-decision variable (pre-return) at time t-1
+        :param V:    Value function at time t
+        :return:     Post-decision variable at time t + DeltaV
+        """
+        h = R * hp
+        self.set(h, V)
+
+        try:
+            self.optimize()
+        except GurobiError as e:
+            pass
+
+        return np.maximum([h[0] - self._outputCashFlow.getValue()] + [v.x for v in self._hpv], 0), \
+               V(R) + array([self._budgetCstr.Pi] + [c.Pi for c in self._holdingCstrs]) * R
@@ -0,0 +1,168 @@
+import os
+import pickle
+import zlib
+from functools import partial
+from itertools import product
+from multiprocessing import Pool
+
+from numpy import random as rd
+
+from adp import value_function
+from adp.generator import GaussianGenerator, StudentTGenerator, loadScenarios
+from adp.pwladp.model import PWLADPModel
+from adp.pwladp.trainer import ADPStrategyTrainer
+from adp.strategy import ADPStrategy
+from adp.value_function import PWLCompactFunction
+import data
+from parameters import S, T, freq, k, perf_dir_name, periods
+
+scenariosDir = "pickle/scenarios"     # Training scenarios of the running jobs (scratch files, not kept in the results)
+
+generators = {
+    'gaussian': GaussianGenerator,
+    'student': StudentTGenerator
+}
+
+
+class TrainingJob(object):
+    """
+    One training run of the sweep, i.e. one (generator type, period, m, gamma) combination. Its results are stored in
+    perf_dir_name (default): 'strategy', 'memory' and 'test' when finished, and a 'checkpoint' (strategy, memory and test results)
+    every checkpoint scenarios, from which an interrupted job is resumed. The training scenarios are generated once from
+    the job seed, in a scratch file of scenariosDir which is removed when the job is finished.
+    """
+
+    def __init__(self, type, key, m, gamma, S=S, model_class=PWLADPModel, test=10, checkpoint=500,
+                 path=perf_dir_name, scratch=scenariosDir):
+        """
+        :param type:         Scenarios generator, 'gaussian' or 'student'
+        :param key:          Period key in parameters.periods
+        :param m:            Max number of slopes of the value functions
+        :param gamma:        Risk aversion
+        :param S:            Number of training scenarios
+        :param model_class:  Decision model used by the trainer
+        :param test:         Number of scenarios between two out-of-sample scores
+        :param checkpoint:   Number of scenarios between two checkpoints
+        :param path:         Directory of the results, formatted as perf_dir_name
+        :param scratch:      Directory of the training scenarios
+        """
+        self.type = type
+        self.key = key
+        self.m = m
+        self.gamma = gamma
+        self.S = S
+        self.model_class = model_class
+        self.test = test
+        self.checkpoint = checkpoint
+        self.path = path
+        self.scratch = scratch
+
+    def __repr__(self):
+        return "<TrainingJob {:s} {:s} m={:d} gamma={:.1f}>".format(self.type, self.key, self.m, self.gamma)
+
+    @property
+    def dirname(self):
+        return self.path.format(self.type, self.S, k, self.key, self.m, self.gamma * 10)
+
+    @property
+    def scenariosFile(self):
+        return os.path.join(self.scratch, "{:s}_{:d}_{:s}_m_{:d}_gamma_{:.0f}.npy".format(self.type, self.S, self.key,
+                                                                                          self.m, self.gamma * 10))
+
+    @property
+    def seed(self):
+        """
+        Seed of the scenarios generation, derived from the job (and not from its path), so that a job is reproducible
+        in any worker.
+        """
+        return zlib.crc32(perf_dir_name.format(self.type, self.S, k, self.key, self.m, self.gamma * 10).encode())
+
+    def finished(self):
+        return os.path.exists(self.dirname + "test")
+
+    def dump(self, name, obj):
+        with open(self.dirname + name + ".tmp", "wb") as file:
+            pickle.dump(file=file, obj=obj)
+        os.replace(self.dirname + name + ".tmp", self.dirname + name)
+
+    def run(self):
+        if self.finished():
+            return self
+        os.makedirs(self.dirname, exist_ok=True)
+
+        # The max number of slopes is a module parameter of the value functions: it is set for the job only
+        m, value_function.m = value_function.m, self.m
+        try:
+            self.train()
+        finally:
+            value_function.m = m
+        return self
+
+    def train(self):
+        """Trains the strategy, from the last checkpoint if any, and dumps the results."""
+        (period, start, middle, end, r) = periods[self.key]
+        Gross_test = data.dataset.gross(start=middle, end=end, freq=freq)
+        Gross_test.insert(0, 'r', 1 + r)
+
+        model_class = self.model_class
+        if model_class is PWLADPModel:
+            from gurobipy import Env
+            model_class = partial(PWLADPModel, env=Env())
+
+        generator = generators[self.type](r=r, start=start, end=middle)
+        try:
+            scenarios = loadScenarios(self.scenariosFile)
+        except FileNotFoundError:
+            os.makedirs(self.scratch, exist_ok=True)
+            rd.seed(self.seed)
+            generator.generate_batch(self.S, T, filename=self.scenariosFile + ".tmp.npy")
+            os.replace(self.scenariosFile + ".tmp.npy", self.scenariosFile)
+            scenarios = loadScenarios(self.scenariosFile)
+        trainer = ADPStrategyTrainer(gamma=self.gamma, generator=generator, model_class=model_class,
+                                     scenarios=scenarios)
+        try:
+            with open(self.dirname + "checkpoint", "rb") as file:
+                strategy, trainer.memory, trainer.counter, results = pickle.load(file)
+        except FileNotFoundError:
+            strategy = ADPStrategy(value_function_class=PWLCompactFunction)
+            results = {}
+
+        for s in range(trainer.counter, self.S):
+            trainer.train(strategy)
+            if s % self.test == 0:
+                results[s] = strategy.score(Gross_test).iloc[-1].sum()
+            if (s + 1) % self.checkpoint == 0:
+                self.dump("checkpoint", (strategy, trainer.memory, trainer.counter, results))
+
+        self.dump("strategy", strategy)
+        self.dump("memory", trainer.memory)
+        self.dump("test", results)
+        # The memory-mapped scenarios are closed before their file is removed
+        del trainer, scenarios
+        for filename in (self.dirname + "checkpoint", self.scenariosFile):
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+
+def runJob(job: TrainingJob) -> TrainingJob:
+    return job.run()
+
+
+def trainingJobs(types, keys, ms, gammas, **kwargs):
+    """Returns the jobs of the grid types x keys x ms x gammas (kwargs are passed to each TrainingJob)."""
+    return [TrainingJob(type, key, m, gamma, **kwargs) for (type, key, m, gamma) in product(types, keys, ms, gammas)]
+
+
+def trainSweep(jobs, processes=None):
+    """
+    Trains the jobs in a pool of processes (one job per worker at a time). Finished jobs are skipped, interrupted ones
+    are resumed from their last checkpoint.
+    :param processes: Number of workers (default: number of cores)
+    """
+    jobs = [job for job in jobs if not job.finished()]
+    print("{:d} jobs to train".format(len(jobs)))
+    with Pool(processes) as pool:
+        for job in pool.imap_unordered(runJob, jobs):
+            print("Done:", job)
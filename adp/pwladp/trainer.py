@@ -1,47 +1,150 @@
 from gurobipy import GurobiError
 
 import numpy as np
-from numpy import array, ones, zeros
+from numpy import ones, zeros
 
-from adp.cvar import generateΔCVaR
+from adp.cvar import IncrementalCVaR
 from adp.generator import Generator
-from adp.pwladp.model import gurobiModel
-from data import N
+from adp.pwladp.model import PWLADPModel
+import data
 from parameters import T, alpha, init
 
 
 class TrainingMemory:
-    def __init__(self):
-        self.hp = array([], dtype=np.float64).reshape(0, N+1)
-        self.RT = array([], dtype=np.float64).reshape(0, N+1)
-        self.h = array([], dtype=np.float64)
+    """
+    Final returns RT, post-decision states hp (at T-1) and terminal wealths h of the training scenarios, stored in
+    preallocated buffers: grown by doubling, or a ring buffer keeping only the last capacity scenarios.
+    """
+
+    def __init__(self, capacity: int=None, window: int=None, filename: str=None):
+        """
+        :param capacity:  If given, max number of scenarios kept in memory (the oldest ones are overwritten)
+        :param window:    If given, number of last scenarios on which the CVaR is estimated (default: all the memory)
+        :param filename:  If given, every scenario is also appended to this file (see history), so that the whole
+                          training remains available on disk when the memory is bounded
+        """
+        self.capacity = capacity
+        self.filename = filename
+        self.count = 0      # Number of scenarios added
+        self._hp = zeros((capacity or 64, data.N+1))
+        self._RT = zeros((capacity or 64, data.N+1))
+        self._h = zeros(capacity or 64)
+        if window is None:
+            window = capacity
+        self.cvar = IncrementalCVaR(window=window)
+
+    def __len__(self):
+        return min(self.count, len(self._h))
+
+    def __setstate__(self, state):
+        """Loads the memories pickled before the buffers (whose state is only RT, hp and h, all the scenarios)."""
+        if '_h' not in state:
+            RT, hp, h = state.pop('RT'), state.pop('hp'), state.pop('h')
+            state.update(capacity=None, filename=None, count=len(h), cvar=IncrementalCVaR())
+            for i in range(len(h)):
+                state['cvar'].add(RT[i], hp[i])
+            # One free row, so that the (possibly empty) buffers can be grown by doubling
+            state['_RT'], state['_hp'], state['_h'] = (np.concatenate((x, zeros((1,) + x.shape[1:])))
+                                                       for x in (RT, hp, h))
+        self.__dict__.update(state)
+
+    def add(self, RT: np.ndarray, hp: np.ndarray, h: float):
+        if self.capacity is not None:
+            i = self.count % self.capacity
+        else:
+            i = self.count
+            if i == len(self._h):
+                self._hp = np.concatenate((self._hp, zeros((i, data.N+1))))
+                self._RT = np.concatenate((self._RT, zeros((i, data.N+1))))
+                self._h = np.concatenate((self._h, zeros(i)))
+        self._hp[i] = hp
+        self._RT[i] = RT
+        self._h[i] = h
+        self.count += 1
+        self.cvar.add(RT, hp)
+
+        if self.filename is not None:
+            with open(self.filename, 'ab') as file:
+                file.write(np.concatenate((RT, hp, (h,))).astype(np.float64).tobytes())
+
+    def ΔCVaR(self) -> np.ndarray:
+        return self.cvar.ΔCVaR()
+
+    def chronological(self, buffer: np.ndarray) -> np.ndarray:
+        """Returns the stored part of the buffer, from the oldest to the newest scenario."""
+        if self.count <= len(buffer):
+            return buffer[:self.count]
+        i = self.count % len(buffer)
+        return np.concatenate((buffer[i:], buffer[:i]))
+
+    @property
+    def hp(self) -> np.ndarray:
+        return self.chronological(self._hp)
+
+    @property
+    def RT(self) -> np.ndarray:
+        return self.chronological(self._RT)
+
+    @property
+    def h(self) -> np.ndarray:
+        return self.chronological(self._h)
+
+    def history(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """Returns RT, hp and h of all the scenarios written to filename, memory-mapped."""
+        rows = np.memmap(self.filename, dtype=np.float64, mode='r').reshape(-1, 2 * (data.N+1) + 1)
+        return rows[:, :data.N+1], rows[:, data.N+1:-1], rows[:, -1]
 
 
 class ADPStrategyTrainer:
 
-    def __init__(self, gamma: float, generator: Generator):
+    def __init__(self, gamma: float, generator: Generator, model_class=PWLADPModel, scenarios=None, batch=100,
+                 memory: TrainingMemory=None):
+        """
+        :param gamma:        Risk aversion
+        :param generator:    Scenarios generator
+        :param model_class:  Decision model, instantiated once per time step and re-solved at each scenario
+                             (PWLADPModel, or PWLADPInspectionModel to train without Gurobi)
+        :param scenarios:    S x T x (N+1) pre-generated scenarios (e.g. adp.generator.loadScenarios), the s-th training
+                             scenario being scenarios[s]. If None, the scenarios are generated by blocks of batch.
+        :param memory:       Training memory (e.g. bounded), default TrainingMemory()
+        """
         self.gamma = gamma
         self.generator = generator
+        self.models = [model_class() for _ in range(T)]
+        self.scenarios = scenarios
+        self.batch = batch
+        self._block = zeros((0, T, data.N+1))
+        self._offset = 0
 
         self.counter = 0
-        self.memory = TrainingMemory()
+        self.memory = memory if memory is not None else TrainingMemory()
+
+    def scenario(self) -> np.ndarray:
+        """Returns the T x (N+1) Gross returns of the next training scenario."""
+        if self.scenarios is not None:
+            return np.asarray(self.scenarios[self.counter])
+        if self._offset == len(self._block):
+            self._block = self.generator.generate_batch(self.batch, T)
+            self._offset = 0
+        self._offset += 1
+        return self._block[self._offset - 1]
 
     def train(self, strategy):
         alpha_s = alpha(self.counter)
 
         # Initialization
-        hp = zeros(N+1)
+        hp = zeros(data.N+1)
         hp[0] = init
-        R = self.generator.generate(T)
+        R = self.scenario()
 
         # t = 0
-        hp, ΔV = gurobiModel(ones(N+1), hp, strategy[0])
+        hp, ΔV = self.models[0].solve(ones(data.N+1), hp, strategy[0])
 
         # 1 <= t <= T - 1
         for t in range(1, T):
             old = hp
             try:
-                hp, ΔV = gurobiModel(R[t-1], hp, strategy[t])
+                hp, ΔV = self.models[t].solve(R[t-1], hp, strategy[t])
             except GurobiError as e:
                 print(e.message)
                 hp = R * hp
@@ -52,11 +155,9 @@ class ADPStrategyTrainer:
         h = R[T-1] * hp  # Final Wealth
 
         # Updating training memory
-        self.memory.RT = np.vstack((self.memory.RT, R[T-1]))
-        self.memory.hp = np.vstack((self.memory.hp, hp))
-        self.memory.h = np.append(self.memory.h, h.sum())
+        self.memory.add(R[T-1], hp, h.sum())
 
-        ΔCVaR = generateΔCVaR(self.memory.RT, self.memory.hp)
+        ΔCVaR = self.memory.ΔCVaR()
         ΔV = self.gamma * R[T-1] - (1 - self.gamma) * ΔCVaR
         strategy[T-1].update(h, ΔV, alpha_s)
         self.counter += 1
@@ -2,29 +2,32 @@ from gurobipy import GRB, LinExpr, Model, quicksum
 
 import numpy as np
 
-from data import N
+import data
 from parameters import beta, init, periods, theta
 
 
-def singlePeriodModel(R: np.ndarray, gamma: float) -> np.ndarray:
+def singlePeriodModel(R: np.ndarray, gamma: float, probas: np.ndarray=None) -> np.ndarray:
     """
     Computes the Single Period Portfolio Selection Problem, with R as return
     samples.
+    :param probas:  Probability of each sample (e.g. reduced scenarios, see reduction), equal by default. They are scaled
+                    by S, so that equal probabilities give the same objective as the default
     """
     S = len(R)
+    weights = [1.] * S if probas is None else [S * p for p in map(float, probas)]
     m = Model()
     m.setParam('OutputFlag', False)
 
     # Variables
-    x = np.array([m.addVar(lb=0) for _ in range(N)])
-    y = np.array([m.addVar(lb=0) for _ in range(N)])
+    x = np.array([m.addVar(lb=0) for _ in range(data.N)])
+    y = np.array([m.addVar(lb=0) for _ in range(data.N)])
     g0 = m.addVar(lb=-GRB.INFINITY)
     g2 = [m.addVar(lb=0) for _ in range(S)]
 
     m.update()
 
     # Linear Expr
-    h = np.zeros(N+1, dtype=LinExpr)
+    h = np.zeros(data.N+1, dtype=LinExpr)
     h[1:] = x - y
     h[0] = init - (1 + theta) * quicksum(x) + (1 - theta) * quicksum(y)
 
@@ -32,9 +35,9 @@ def singlePeriodModel(R: np.ndarray, gamma: float) -> np.ndarray:
     [m.addConstr(hv >= 0) for hv in h]
     [m.addConstr(v >= - g0 - quicksum(R[s] * h) + init) for (s, v) in enumerate(g2)]
 
-    m.setObjective(gamma * quicksum(quicksum(r * h) for r in R)
+    m.setObjective(gamma * quicksum(w * quicksum(r * h) for (w, r) in zip(weights, R))
                    - (1 - gamma) * g0
-                   - (1 - gamma) / (1 - beta) * quicksum(g2), GRB.MAXIMIZE)
+                   - (1 - gamma) / (1 - beta) * quicksum(w * v for (w, v) in zip(weights, g2)), GRB.MAXIMIZE)
 
     m.optimize()
     return np.array([v.getValue() for v in h])
@@ -1,11 +1,14 @@
 from gurobipy import GurobiError
 
+import numpy as np
 import pandas as pd
+from numpy import random as rd
 from numpy import ones, zeros, array
 
+from adp.pwladp.inspection import PWLADPInspectionModel
 from adp.pwladp.model import gurobiModel
 from adp.value_function import SeparableValueFunction
-from data import N
+import data
 from parameters import T, init
 
 
@@ -25,7 +28,7 @@ class ADPStrategy:
         h.iloc[0] = 0
         h.iloc[0, 0] = init
 
-        h.iloc[1], _ = gurobiModel(ones(N+1), h.iloc[0].as_matrix(), self[0])
+        h.iloc[1], _ = gurobiModel(ones(data.N+1), h.iloc[0].values, self[0])
         for t in range(1, T):
             try:
                 h.iloc[t+1], _ = gurobiModel(gross.iloc[t-1], h.iloc[t], self[t])
@@ -33,3 +36,33 @@ class ADPStrategy:
                 print('Error during testing:', e)
                 h.iloc[t+1] = h.iloc[t]
         return h
+
+    def score_batch(self, gross: np.ndarray) -> np.ndarray:
+        """
+        Replays the strategy on K paths of returns at once, the decisions of each time step being computed in batch by
+        PWLADPInspectionModel (same decisions as score, without Gurobi).
+        :param gross:  K x T x (N+1) Gross returns (e.g. bootstrap, or a generator's generate_batch)
+        :return:       K x (T+1) x (N+1) positions, as the rows of score (the wealth trajectories are the sums over the
+                       last axis)
+        """
+        K = len(gross)
+        model = PWLADPInspectionModel()
+        h = zeros((K, T+1, data.N+1))
+        h[:, 0, 0] = init
+
+        h[:, 1], _ = model.solve_batch(ones((K, data.N+1)), h[:, 0], self[0])
+        for t in range(1, T):
+            h[:, t+1], _ = model.solve_batch(gross[:, t-1], h[:, t], self[t])
+        return h
+
+
+def bootstrap(gross: pd.DataFrame, K: int, T: int=T) -> np.ndarray:
+    """
+    Returns K paths of T returns resampled (with replacement) from the rows of gross, as a K x T x (N+1) array.
+    The first path is the historical one, if gross has at least T rows (else all the paths are resampled).
+    """
+    gross = np.asarray(gross, dtype=np.float64)
+    paths = gross[rd.randint(len(gross), size=(K, T))]
+    if len(gross) >= T:
+        paths[0] = gross[:T]
+    return paths
@@ -5,7 +5,7 @@ import pandas as pd
 from matplotlib import pyplot as plt
 from numpy import random as rd
 
-from data import N, Data
+import data
 from parameters import M, T, a, decimals, m, w0
 
 
@@ -22,7 +22,7 @@ class ValueFunction:
 class LinearValueFunction(np.ndarray, ValueFunction):
 
     def __new__(cls, *args, **kwargs):
-        return rd.rand(T, N+1).view(cls)
+        return rd.rand(T, data.N+1).view(cls)
 
     def __call__(self, h: np.ndarray) -> float:
         return (self * h).sum()
@@ -31,6 +31,10 @@ class LinearValueFunction(np.ndarray, ValueFunction):
 class PWLFunction:
 
     __metaclass__ = ABCMeta
+    __slots__ = ()
+
+    # Number of updates of the function, checked by the caches built from it (see SeparableValueFunction.packed)
+    version = 0
 
     def __call__(self, h: float) -> float:
         pi = self.pi(h)
@@ -66,6 +70,7 @@ class PWLDynamicFunction(PWLFunction):
         return "{:s} (Dynamic)".format(super().__str__())
 
     def update(self, h: float, deltaV: float, alpha: float):
+        self.version += 1
 
         h = round(h, decimals)
 
@@ -118,6 +123,123 @@ class PWLDynamicFunction(PWLFunction):
             self.a = np.delete(self.a, k+1)
 
 
+class PWLCompactFunction(PWLFunction):
+    """
+    Same function and updates as PWLDynamicFunction, but the breakpoints and slopes are stored in preallocated buffers
+    of size m+1 (grown by doubling if m is None) with a length counter, and the insertions, merges and pooling of the
+    slopes are done in place, by shifting the end of the buffers.
+    """
+
+    __slots__ = ('_a', '_slopes', '_n', 'version')
+
+    def __init__(self, a: np.ndarray=None, slopes: np.ndarray=None, n: np.ndarray=None):
+        """
+        The buffers can be given, e.g. as rows of the matrices of a SeparableValueFunction (see
+        SeparableValueFunction.update), they are then used as they are.
+        :param a:       Breakpoints buffer
+        :param slopes:  Slopes buffer
+        :param n:       Length counter, as a 1-element array
+        """
+        if a is None:
+            size = m + 1 if m is not None else 8
+            a, slopes, n = np.zeros(size), np.zeros(size), np.ones(1, dtype=np.int64)
+            slopes[0] = 1
+        self._a = a
+        self._slopes = slopes
+        self._n = n
+        self.version = 0
+
+    @property
+    def n(self) -> int:
+        return int(self._n[0])
+
+    @n.setter
+    def n(self, n: int):
+        self._n[0] = n
+
+    def __str__(self):
+        return "{:s} (Compact)".format(super().__str__())
+
+    @property
+    def a(self) -> np.ndarray:
+        return self._a[:self.n]
+
+    @property
+    def slopes(self) -> np.ndarray:
+        return self._slopes[:self.n]
+
+    def pi(self, h: float) -> int:
+        pi = np.searchsorted(self._a[:self.n], h, side='right') - 1
+        if pi < 0:
+            raise ValueError("{:f} is below the first breakpoint {:f}".format(h, self._a[0]))
+        return pi
+
+    def _remove(self, start: int, stop: int):
+        """Removes the breakpoints and slopes [start, stop)."""
+        n, d = self.n, stop - start
+        self._a[start:n-d] = self._a[stop:n]
+        self._slopes[start:n-d] = self._slopes[stop:n]
+        self.n -= d
+
+    def update(self, h: float, deltaV: float, alpha: float):
+        self.version += 1
+
+        h = round(h, decimals)
+
+        a, slopes, n = self._a, self._slopes, self.n
+        pi = self.pi(h)
+
+        new_slope = (1 - alpha) * slopes[pi] + alpha * deltaV
+
+        # Checking h and a
+        if a[pi] == h:
+            slopes[pi] = new_slope
+        else:
+            # If the state has never been reached, we add a cut
+            pi += 1
+            if n == len(a):
+                self._a = a = np.concatenate((a, np.zeros(n)))
+                self._slopes = slopes = np.concatenate((slopes, np.zeros(n)))
+            a[pi+1:n+1] = a[pi:n]
+            slopes[pi+1:n+1] = slopes[pi:n]
+            a[pi] = h
+            slopes[pi] = new_slope
+            self.n = n = n + 1
+
+        # Checking if slopes are still decreasing
+        # First Case: monotonicity failed on the left
+        if pi > 0 and slopes[pi - 1] < slopes[pi]:
+            k = pi - 1
+            while True:
+                # We select from k to pi (we have to put +1)
+                updated = slopes[k:pi + 1].mean()
+                if k == 0 or updated < slopes[k - 1]:
+                    self._remove(k + 1, pi + 1)
+                    slopes[k] = updated
+                    break
+                else:
+                    k -= 1
+
+        # Second Case: monotonicity failed on the right
+        elif pi < n - 1 and slopes[pi] < slopes[pi + 1]:
+            k = pi + 1
+            while True:
+                updated = slopes[pi:k + 1].mean()
+                if k == n - 1 or updated >= slopes[k + 1]:
+                    self._remove(pi + 1, k + 1)
+                    slopes[pi] = updated
+                    break
+                else:
+                    k += 1
+
+        # Check the number of slopes
+        if m is not None and self.n > m:
+            n = self.n
+            k = (slopes[:n-1] - slopes[1:n]).argmin()
+            slopes[k] = slopes[k:k+2].mean()
+            self._remove(k + 1, k + 2)
+
+
 class PWLFixedFunction(PWLFunction):
 
     def __init__(self):
@@ -128,6 +250,7 @@ class PWLFixedFunction(PWLFunction):
         return "{:s} (Dynamic)".format(super().__str__())
 
     def update(self, h: float, deltaV: float, alpha: float):
+        self.version += 1
 
         pi = self.pi(h)
 
@@ -162,11 +285,56 @@ class SeparableValueFunction(ValueFunction):
 
     def __init__(self, value_function_class=PWLDynamicFunction):
         super().__init__()
-        self.value_functions = pd.Series([value_function_class() for _ in range(N)], index=Data.columns)
+        if value_function_class is PWLCompactFunction and m is not None:
+            # The N functions are rows of the same matrices, so that they can be updated all at once
+            self._a = np.zeros((data.N, m+1))
+            self._slopes = np.zeros((data.N, m+1))
+            self._slopes[:, 0] = 1
+            self._n = np.ones(data.N, dtype=np.int64)
+            functions = [PWLCompactFunction(self._a[i], self._slopes[i], self._n[i:i+1]) for i in range(data.N)]
+        else:
+            self._a = None
+            functions = [value_function_class() for _ in range(data.N)]
+        self.value_functions = pd.Series(functions, index=data.Data.columns)
         self.cash = 1.
+        self._packed = None
+        self._versions = None
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # The views of the functions on the shared matrices are not kept by pickle: we link them again
+        if getattr(self, '_a', None) is not None:
+            for i, f in enumerate(self):
+                f._a, f._slopes, f._n = self._a[i], self._slopes[i], self._n[i:i+1]
 
     def __call__(self, h: np.ndarray) -> np.ndarray:
-        return np.array([h[0] * self.cash] + [self[i](x) for (i, x) in enumerate(h[1:])])
+        return self.evaluate_batch(h)[0]
+
+    def evaluate_batch(self, H: np.ndarray) -> np.ndarray:
+        """
+        Returns the values attributed to each position of the portfolios H[0], H[1], ...
+        :param H: K x (N+1) portfolios (or a single portfolio)
+        :return:  K x (N+1) values
+        """
+        return self.packed.evaluate_batch(H)
+
+    def versions(self) -> tuple:
+        """Returns the versions of the functions (see PWLFunction.version)."""
+        return tuple(getattr(f, 'version', 0) for f in self)
+
+    @property
+    def packed(self):
+        """
+        Array-backed copy of this value function, rebuilt after each update: by update, or by the update of one of the
+        functions (e.g. V[i].update), detected by their versions, or when the cash slope is changed.
+        :rtype: PackedValueFunction
+        """
+        versions = self.versions()
+        packed = getattr(self, '_packed', None)
+        if packed is None or packed.cash != self.cash or versions != getattr(self, '_versions', None):
+            self._packed = PackedValueFunction(self)
+            self._versions = versions
+        return self._packed
 
     def __str__(self):
         return "Separable Value Function ({:d} {:s})".format(len(self.value_functions),
@@ -179,23 +347,147 @@ class SeparableValueFunction(ValueFunction):
         return iter(self.value_functions)
 
     def update(self, h, deltaV, alpha):
+        self._packed = None
+
         # Update the cash slope
         self.cash = (1 - alpha) * self.cash + alpha * deltaV[0]
 
         # Updating the assets positions' value functions
-        for i in range(N):
-            self[i].update(h[i+1], deltaV[i+1], alpha)
+        if getattr(self, '_a', None) is not None:
+            self.update_batch(np.asarray(h[1:], dtype=np.float64), np.asarray(deltaV[1:], dtype=np.float64), alpha)
+        else:
+            for i in range(data.N):
+                self[i].update(h[i+1], deltaV[i+1], alpha)
+
+    def update_batch(self, h: np.ndarray, deltaV: np.ndarray, alpha: float):
+        """
+        Applies PWLCompactFunction.update to the N functions at once, on the shared N x (m+1) matrices: segment lookup,
+        insertion of the new breakpoints, restoration of the concavity and reduction of the number of slopes are
+        vectorized over the assets.
+        :param h:       N positions
+        :param deltaV:  N observed slopes
+        """
+        a, slopes, n = self._a, self._slopes, self._n
+        C = a.shape[1]
+        rows = np.arange(data.N)
+        cols = np.broadcast_to(np.arange(C), (data.N, C))
+
+        h = np.round(h, decimals)
+        pi = (np.where(cols < n[:, np.newaxis], a, np.inf) <= h[:, np.newaxis]).sum(axis=1) - 1
+        if (pi < 0).any():
+            raise ValueError("Positions below the first breakpoint: {}".format(h[pi < 0]))
+        new_slope = (1 - alpha) * slopes[rows, pi] + alpha * deltaV
+
+        # If the state has never been reached, we add a cut
+        cut = a[rows, pi] != h
+        pi += cut
+        src = cols - (cut[:, np.newaxis] & (cols > pi[:, np.newaxis]))
+        a[:] = np.take_along_axis(a, src, axis=1)
+        slopes[:] = np.take_along_axis(slopes, src, axis=1)
+        a[rows[cut], pi[cut]] = h[cut]
+        slopes[rows, pi] = new_slope
+        n += cut
+
+        # Checking if slopes are still decreasing: the slopes of the violating block are pooled to their mean
+        cumsum = np.concatenate((np.zeros((data.N, 1)), np.cumsum(slopes, axis=1)), axis=1)
+        previous = np.concatenate((np.full((data.N, 1), np.inf), slopes[:, :-1]), axis=1)
+        following = np.concatenate((slopes[:, 1:], np.full((data.N, 1), -np.inf)), axis=1)
+        current = slopes[rows, pi]
+        left = (pi > 0) & (previous[rows, pi] < current)
+        right = ~left & (pi < n - 1) & (current < following[rows, pi])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # First Case: monotonicity failed on the left, the block [k, pi] with the largest k < pi whose mean is below
+            # the slope k-1
+            mean = (cumsum[rows, pi + 1][:, np.newaxis] - cumsum[:, :C]) / (pi[:, np.newaxis] + 1 - cols)
+            valid = (cols < pi[:, np.newaxis]) & ((cols == 0) | (mean < previous))
+            kl = np.where(valid, cols, -1).max(axis=1)
+
+            # Second Case: monotonicity failed on the right, the block [pi, k] with the smallest k > pi whose mean is
+            # above the slope k+1
+            mean = (cumsum[:, 1:] - cumsum[rows, pi][:, np.newaxis]) / (cols + 1 - pi[:, np.newaxis])
+            valid = (cols > pi[:, np.newaxis]) & (cols < n[:, np.newaxis]) \
+                & ((cols == n[:, np.newaxis] - 1) | (mean >= following))
+            kr = np.where(valid, cols, C).min(axis=1)
+
+        first = np.where(left, kl, pi)                  # Pooled block [first, last]
+        last = np.where(left, pi, np.where(right, kr, pi))
+        block = (cols >= first[:, np.newaxis]) & (cols <= last[:, np.newaxis])
+        pooled = np.where(block, slopes, 0).sum(axis=1) / (last - first + 1)
+        slopes[rows, first] = np.where(left | right, pooled, slopes[rows, first])
+        self._remove(first + 1, last - first)
+
+        # Check the number of slopes
+        if m is not None:
+            over = n > m
+            if over.any():
+                diff = np.where(cols[:, :-1] < n[:, np.newaxis] - 1, slopes[:, :-1] - slopes[:, 1:], np.inf)
+                k = diff.argmin(axis=1)
+                slopes[rows, k] = np.where(over, (slopes[rows, k] + slopes[rows, k + 1]) / 2, slopes[rows, k])
+                self._remove(k + 1, over.astype(np.int64))
+
+    def _remove(self, start: np.ndarray, d: np.ndarray):
+        """Removes, on each row i, the d[i] breakpoints and slopes from start[i] of the shared matrices."""
+        C = self._a.shape[1]
+        cols = np.arange(C)
+        src = np.minimum(cols + d[:, np.newaxis] * (cols >= start[:, np.newaxis]), C - 1)
+        self._a[:] = np.take_along_axis(self._a, src, axis=1)
+        self._slopes[:] = np.take_along_axis(self._slopes, src, axis=1)
+        self._n -= d
+
+
+class PackedValueFunction(ValueFunction):
+    """
+    Array-backed representation of a SeparableValueFunction: the breakpoints, slopes and values at the breakpoints of
+    the N PWL functions are stored in N x m matrices, padded on the right with infinite breakpoints (which are never
+    reached), so that many portfolios can be evaluated without looping over the assets.
+    """
+
+    def __init__(self, V: SeparableValueFunction):
+        m = max(len(f.a) for f in V)
+        self.cash = V.cash
+        self.a = np.full((data.N, m), np.inf)
+        self.slopes = np.zeros((data.N, m))
+        self.y = np.zeros((data.N, m))
+        for i, f in enumerate(V):
+            k = len(f.a)
+            self.a[i, :k] = f.a
+            self.slopes[i, :k] = f.slopes
+            self.y[i, :k] = f.y()[:k]
+
+    def __call__(self, h: np.ndarray) -> np.ndarray:
+        return self.evaluate_batch(h)[0]
+
+    def pi(self, H: np.ndarray) -> np.ndarray:
+        """
+        Returns the K x N indexes of the segments containing the asset positions H (K x N). The positions below the first
+        breakpoint are on the first segment (extended).
+        """
+        return np.maximum((self.a <= H[..., np.newaxis]).sum(axis=-1) - 1, 0)
+
+    def evaluate_batch(self, H: np.ndarray) -> np.ndarray:
+        """
+        Returns the values attributed to each position of the portfolios H[0], H[1], ...
+        :param H: K x (N+1) portfolios (or a single portfolio)
+        :return:  K x (N+1) values
+        """
+        H = np.atleast_2d(np.asarray(H, dtype=np.float64))
+        h = H[:, 1:]
+        pi = self.pi(h)
+        assets = np.arange(data.N)
+        values = self.y[assets, pi] + (h - self.a[assets, pi]) * self.slopes[assets, pi]
+        return np.concatenate((H[:, :1] * self.cash, values), axis=1)
 
 
 if __name__ == '__main__':
     V = SeparableValueFunction()
     plt.ion()
     for s in range(100):
-        h = w0 * rd.rand(N+1)
-        deltaV = rd.rand(N+1)
+        h = w0 * rd.rand(data.N+1)
+        deltaV = rd.rand(data.N+1)
         alpha = 0.5
         V.update(h, deltaV, alpha)
         plt.clf()
-        for i in range(N):
+        for i in range(data.N):
             plt.plot(V[i].a, V[i].y())
         plt.pause(0.5)
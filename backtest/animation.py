@@ -3,7 +3,7 @@ from matplotlib import animation, pyplot as plt
 from .backtest import BackTestGroup, BackTestParamPool, BackTest
 from entities.model import EWPortfolioModel
 from scenarios_based.models import CVaR, Minimax, SemiMAD
-from scenarios import generateStudentTScenarios
+from generator import generateStudentTScenarios
 
 
 def animateBackTest(backtest: BackTest):
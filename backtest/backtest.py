@@ -1,20 +1,23 @@
-from gurobipy import GurobiError
+from multiprocessing import Pool
+
+from gurobipy import Env, GurobiError
 
 import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 
-from data import Data, figsize
+import data
+from data import figsize
 from entities.portfolio import EquallyWeightedPortfolio
-from entities.model import EWPortfolioModel
+from entities.model import EWPortfolioModel, PortfolioOptimizer
 from scenarios_based.models import SemiMAD
-from generator import generateStudentTScenarios
+from generator import WindowMoments, generateStudentTScenarios
 
 
 class BackTestParamPool(object):
     """Represents a set of parameters for a BackTest."""
 
-    def __init__(self, freq, window, generator, N, reconfigure=True):
+    def __init__(self, freq, window, generator, N, reconfigure=True, processes=1):
         """
         :type freq: string | pandas.DateOffset - Frequency of rebalancing, with anchor for exact rebalancing date, ex:
                                                     - weekly: 'W-MON', 'W-TUE', etc.
@@ -25,12 +28,19 @@ class BackTestParamPool(object):
         :type generator:   function            - Scenarios generator
         :type N:           int                 - Number of scenarios to generate at each rebalancing date
         :type reconfigure: bool                - Do we have to use the reconfigure method in the Models?
+        :type processes:   int | None          - Number of processes optimizing the rebalancing dates in parallel (None:
+                                                 number of cores). The dates are independent only without reconfigure.
         """
         self.freq = freq
         self.window = pd.Timedelta(days=window)
         self.generator = generator
         self.N = N
         self.reconfigure = reconfigure
+        self.processes = processes
+
+    @property
+    def parallel(self):
+        return self.processes != 1 and not self.reconfigure
 
     def __str__(self):
         return "Params: {:d} scenarios - {:s} rebalancing - Rolling window: {:d} days - Generator: {:s}".format(
@@ -44,6 +54,60 @@ class BackTestParamPool(object):
         return "<BackTest Parameters Pool {:s}".format(self)
 
 
+# Gurobi environment of a worker process of a parallel BackTest
+env = None
+
+
+def initWorker():
+    """Creates the Gurobi environment of the worker (the environment of the parent must not be shared)."""
+    global env
+    env = Env()
+
+
+def optimizeScenarios(task):
+    """
+    Optimizes a new model on the given scenarios (in a worker process).
+    :type task: tuple - (Model, params, scenarios, probas)
+    :return: the portfolio, the objective value and whether the model is infeasible
+    """
+    Model, params, s, p = task
+    if isinstance(Model, type) and issubclass(Model, PortfolioOptimizer):
+        # One thread per model: the parallelism is over the processes
+        model = Model(s, p, name='BackTest', env=env, **params)
+        model.setParam('Threads', 1)
+    else:
+        model = Model(s, p, name='BackTest', **params)
+    model.optimize()
+    try:
+        return model.getPortfolio(), model.objval, False
+    except GurobiError:
+        return EquallyWeightedPortfolio(), None, True
+
+
+def dateSeed(date):
+    """Return the seed of the scenarios of a rebalancing date, so that they do not depend on the order of the dates."""
+    return date.value % 2 ** 32
+
+
+def optimizeDate(task):
+    """
+    Generates the scenarios of a rebalancing date and optimizes the model on them (in a worker process).
+    :type task: tuple - (Model, params, generator, N, start, end, seed, moments), the moments of the window being
+                        computed by the parent (see WindowMoments)
+    :return: see optimizeScenarios
+    """
+    Model, params, generator, N, start, end, seed, moments = task
+    s, p = generator(N, nu=4, start=start, end=end, seed=seed, moments=moments)
+    return optimizeScenarios((Model, params, s, p))
+
+
+def printResult(date, objval, infeasible=False):
+    if infeasible:
+        print(date, "model infeasible, E.W. portfolio generated")
+    else:
+        print(date, objval)
+
+
 class BackTest(object):
     """Simulates a portfolio rebalanced at each rebalancing date."""
 
@@ -56,7 +120,7 @@ class BackTest(object):
         """
         self.Model = Model
         self.pool = pool
-        self.PeriodicData = Data.asfreq(pool.freq, method='pad')
+        self.PeriodicData = data.Data.asfreq(pool.freq, method='pad')
         self.PeriodicGrossReturns = (self.PeriodicData.shift(-1) / self.PeriodicData)[:-1]
 
         # We store the index on which we will do the computation (we need at least 'window' time of previous data to
@@ -64,29 +128,75 @@ class BackTest(object):
         self.index = self.PeriodicGrossReturns[self.PeriodicGrossReturns.index[0] + pool.window:].index
 
         self.params = params
-        self.portfolios = pd.DataFrame(columns=Data.columns)
+        self.portfolios = pd.DataFrame(columns=data.Data.columns)
+        # Model of the last rebalancing date, reconfigured at the next one
+        self.model = None
 
     def generator(self):
-        """This function is a python generator: for each rebalancing date, it yields the new portfolio."""
-        if self.pool.reconfigure:
-            s, p = self.pool.generator(self.pool.N)
-            model = self.Model(s, p, name='BackTest', **self.params)
-            model.update()
+        """
+        This function is a python generator: for each rebalancing date, it yields the new portfolio. The portfolios are
+        optimized sequentially, or by a pool of processes (see BackTestParamPool.processes), but always yielded in the
+        order of the dates.
+        """
+        for date, port in (self.parallelPortfolios() if self.pool.parallel else self.portfoliosByDate()):
+            yield date, self.record(date, port)
+
+    def record(self, date, port):
+        """
+        Stores the portfolio of a rebalancing date.
+        :return: its gross return until the next date
+        :rtype: float
+        """
+        self.portfolios.loc[date] = port
+        return (port * self.PeriodicGrossReturns.loc[date]).sum()
+
+    def parallelPortfolios(self):
+        """
+        Yields the portfolio of each rebalancing date, optimized by a pool of processes. The scenarios of a date are
+        generated from the seed of the date (see dateSeed) and from the moments of its window, computed here in date
+        order, the workers not sharing the random state nor the moments.
+        """
+        moments = WindowMoments()
+        tasks = (
+            (self.Model, self.params, self.pool.generator, self.pool.N, date - self.pool.window, date, dateSeed(date),
+             moments.window(date - self.pool.window, date))
+            for date in self.index
+        )
+        with Pool(self.pool.processes, initializer=initWorker) as pool:
+            for date, (port, objval, infeasible) in zip(self.index, pool.imap(optimizeDate, tasks)):
+                printResult(date, objval, infeasible)
+                yield date, port
+
+    def portfoliosByDate(self):
+        """
+        Yields the portfolio of each rebalancing date, optimized sequentially. The scenarios are the same as in
+        parallelPortfolios.
+        """
+        moments = WindowMoments()
         for date in self.index:
-            s, p = self.pool.generator(self.pool.N, nu=4, start=date - self.pool.window, end=date)
-            if self.pool.reconfigure:
-                model.reconfigure(s, p)
-            else:
-                model = self.Model(s, p, name='BackTest', **self.params)
-            model.optimize()
-            try:
-                port = model.getPortfolio()
-                print(date, model.objval)
-            except GurobiError:
-                print(date, "model infeasible, E.W. portfolio generated")
-                port = EquallyWeightedPortfolio()
-            self.portfolios.loc[date] = port
-            yield date, (port * self.PeriodicGrossReturns.loc[date]).sum()
+            start = date - self.pool.window
+            s, p = self.pool.generator(self.pool.N, nu=4, start=start, end=date, seed=dateSeed(date),
+                                       moments=moments.window(start, date))
+            yield date, self.optimize(date, s, p)
+
+    def optimize(self, date, s, p):
+        """
+        Optimizes the model on the scenarios of a rebalancing date (reconfiguring the model of the previous date if the
+        pool allows it).
+        :rtype: entities.portfolio.Portfolio
+        """
+        if self.pool.reconfigure and self.model is not None:
+            self.model.reconfigure(s, p)
+        else:
+            self.model = self.Model(s, p, name='BackTest', **self.params)
+        self.model.optimize()
+        try:
+            port = self.model.getPortfolio()
+            printResult(date, self.model.objval)
+        except GurobiError:
+            printResult(date, None, True)
+            port = EquallyWeightedPortfolio()
+        return port
 
     def compute(self):
         generator = self.generator()
@@ -136,24 +246,43 @@ class BackTestGroup(list):
     def __init__(self, models, pool):
         """
         :type models: list              - List of PortfolioOptimizer to backtest
-        :type pool:   BackTestParamPool - Parameters to apply to all models
+        :type pool:   BackTestParamPool - Parameters to apply to all models. With pool.processes, the models of a date
+                                          are optimized in parallel.
         """
         super().__init__([BackTest(model, pool) for model in models])
         self.pool = pool
-        self.PeriodicData = Data.asfreq(pool.freq, method='pad')
+        self.PeriodicData = data.Data.asfreq(pool.freq, method='pad')
         self.index = self.PeriodicData[self.PeriodicData.index[0] + pool.window:].index[:-1]
 
     def generator(self):
-        generators = [backtest.generator() for backtest in self]
-        for date in self.index:
-            res = []
-            for generator in generators:
-                res.append(generator.next()[1])
-            yield date, res
+        """
+        Python generator: for each rebalancing date, yields the gross returns of the new portfolio of each backtest. The
+        scenarios are generated once per date, and all the models are optimized on the same ones (common random
+        numbers).
+        """
+        workers = Pool(self.pool.processes, initializer=initWorker) if self.pool.parallel else None
+        moments = WindowMoments()
+        try:
+            for date in self.index:
+                start = date - self.pool.window
+                s, p = self.pool.generator(self.pool.N, nu=4, start=start, end=date,
+                                           moments=moments.window(start, date))
+                if workers is None:
+                    ports = [backtest.optimize(date, s, p) for backtest in self]
+                else:
+                    ports = []
+                    for port, objval, infeasible in workers.map(optimizeScenarios,
+                                                                [(b.Model, b.params, s, p) for b in self]):
+                        printResult(date, objval, infeasible)
+                        ports.append(port)
+                yield date, [backtest.record(date, port) for backtest, port in zip(self, ports)]
+        finally:
+            if workers is not None:
+                workers.terminate()
 
     def compute(self):
-        for backtest in self:
-            backtest.compute()
+        for _ in self.generator():
+            pass
 
     def plot(self):
         ax = plt.figure(figsize=figsize).gca()
@@ -1,4 +1,4 @@
-from data import Data
+import data
 
 
 class Strategy:
@@ -10,7 +10,7 @@ class Strategy:
 class BackTest:
 
     def __init__(self, strategy, freq, train_period, test_period):
-        data = Data.asfreq(freq, method='pad').pct_change()[1:]
-        train_data = data[train_period]
-        test_data = data[test_period]
+        returns = data.Data.asfreq(freq, method='pad').pct_change()[1:]
+        train_data = returns[train_period]
+        test_data = returns[test_period]
         strategy.train(train_data)
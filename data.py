@@ -1,51 +1,226 @@
+import sys
+import types
+from contextlib import contextmanager
+
 import pandas as pd
 import numpy as np
 
+from store import PriceStore
+
 CAC40Tickers = ['{:s}.PA'.format(t) for t in ['AC','ACA','AI','AIR','BN','BNP','CA','CAP','CS','DG','EI','EN','ENGI','FP','FR','GLE','KER','LHN','LI','LR','MC','ML','MT','NOKIA','OR','ORA','PUB','RI','RNO','SAF','SAN','SGO','SOLB','SU','SW','TEC','UG','UL','VIE','VIV']]
 # ASX100Tickers = ['{:s}.AX'.format(t) for t in ['ABC','AGL','ALQ','AWC','AMC','AMP','ANN','APA','ALL','ASX','AZJ','AST','ANZ','BOQ','BEN','BHP','BSL','BLD','BXB','CTX','CAR','CGF','CIM','CCL','COH','CBA','CPU','CWN','CSL','CSR','CYB','DXS','DMP','DOW','DUE','DLX','EVN','FXJ','FLT','FMG','GMG','GPT','GNC','HVN','HSO','HGG','ILU','IPL','IAG','IOF','IFL','JHX','JBH','LLC','LNK','MQA','MQG','MFG','MPL','MGR','NAB','NVT','NCM','NST','OSH','ORI','ORG','ORA','PPT','PRY','QAN','QBE','QUB','RHC','REA','RMD','RIO','STO','SCG','SEK','SHL','S32','SKI','SGP','SUN','SYD','TAH','TTS','TLS','SGR','TPM','TCL','TWE','VCX','VOC','WES','WFD','WBC','WPL','WOW']]
 filename = "pickle/data.pkl"    # For CAC 40
+storePath = "pickle/prices"     # Columnar store of the same data (see store.PriceStore)
 
 
 def ReLoadYahooData():
-    from entities.security import Security
+    from entities.security import downloader
     print("Loading data")
-    Securities = [Security(t) for t in CAC40Tickers]
-    Data = pd.DataFrame({s.ticker: s.data for s in Securities})
+    Data = downloader.download(CAC40Tickers)
     print("Removing missing values")
     Data = Data.loc[:, Data.isnull().sum() < 0.05 * len(Data)]
     Data.dropna(inplace=True)
+    if Data.empty:
+        raise ValueError("No prices downloaded")
     print("Saving data")
-    Data.to_pickle(filename)
+    PriceStore.write(Data, storePath)
     return Data
 
 
 def FilterData(Data):
     print("Removing Outliers")
     Data.drop(Data.index[((Data - Data.mean()).abs() > 3 * Data.std()).any(axis=1)], inplace=True)
-    Data.to_pickle(filename)
+    PriceStore.write(Data, storePath)
+
+
+def ConvertPickle():
+    """
+    Write the price store from the former pickle file. Until this is done, the prices are read from the pickle file.
+    :rtype: PriceStore
+    """
+    print('Converting', filename, 'to', storePath)
+    return PriceStore.write(pd.read_pickle(filename), storePath)
 
 
-def LoadData():
+def LoadStore():
+    """
+    Return the price store, which is never written here (see ConvertPickle and ReLoadYahooData).
+    :rtype: PriceStore
+    """
+    return PriceStore(storePath)
+
+
+def LoadPickle():
+    """
+    Return the prices of the former pickle file, when there is no price store yet.
+    :rtype: pandas.DataFrame
+    """
     try:
         return pd.read_pickle(filename)
-    except FileNotFoundError as e:
-        print('Error:', e)
-        print('Reloading data')
-        return ReLoadYahooData()
+    except FileNotFoundError:
+        raise FileNotFoundError("No price store in {:s} nor {:s} (see ReLoadYahooData)".format(storePath, filename))
+
+
+def lazy(method):
+    """Property computed at its first access, then cached in the instance."""
+    name = method.__name__
+
+    def getter(self):
+        if name not in self._cache:
+            self._cache[name] = method(self)
+        return self._cache[name]
+    getter.__doc__ = method.__doc__
+    return property(getter)
+
+
+class Dataset(object):
+    """
+    Prices data and the quantities derived from them, computed at their first access and cached: nothing is read from the
+    disk until one of them is needed. The current dataset is the module attribute 'dataset', and its quantities are also
+    read as attributes of this module (Data, Returns, Gross, N, A, ...), e.g.
+
+        import data
+        data.N                      # Number of stocks of the current dataset
+        with data.use(Dataset.synthetic()):
+            data.N                  # Number of stocks of the synthetic dataset
+    """
+
+    def __init__(self, Data=None, store=None):
+        """
+        :type Data:  pandas.DataFrame - Prices (dates x tickers), if not read from a store
+        :type store: PriceStore       - Store of the prices (default: LoadStore(), when Data is not given). Without
+                                        any store, the prices are read from the pickle file (see LoadPickle)
+        """
+        self._Data = Data
+        self._store = store
+        self._cache = {}
+
+    @classmethod
+    def synthetic(cls, N=10, T=2500, start='2005-01-03', mean=0.08, vol=0.25, seed=0):
+        """
+        Dataset of N stocks following independent geometric Brownian motions on T business days, without any disk access.
+        :type mean: float - Annualized mean of the log returns
+        :type vol:  float - Annualized volatility of the log returns
+        :rtype: Dataset
+        """
+        rd = np.random.RandomState(seed)
+        LogReturns = rd.normal(mean / 252, vol / np.sqrt(252), (T - 1, N))
+        prices = 100 * np.exp(np.concatenate((np.zeros((1, N)), np.cumsum(LogReturns, axis=0))))
+        index = pd.bdate_range(start, periods=T)
+        return cls(Data=pd.DataFrame(prices, index=index, columns=['S{:d}'.format(i) for i in range(N)]))
+
+    @lazy
+    def Store(self):
+        """:rtype: PriceStore"""
+        if self._store is not None:
+            return self._store
+        if self._Data is not None:
+            # Not the on-disk store, whose prices are not the ones of this dataset
+            raise ValueError("The dataset has no price store, its prices are in memory (see Dataset.Data)")
+        return LoadStore()
+
+    @lazy
+    def Data(self):
+        """:rtype: pandas.DataFrame"""
+        if self._Data is not None:
+            return self._Data
+        try:
+            return self.Store.prices()
+        except FileNotFoundError:
+            return LoadPickle()
+
+    @lazy
+    def Returns(self):
+        """
+        The Returns are (P[t] - P[t-1]) / P[t-1] = P[t] / P[t-1] - 1 = GrossReturns - 1
+        :rtype: pandas.DataFrame
+        """
+        return self.Data.pct_change()[1:]
+
+    @lazy
+    def Gross(self):
+        """
+        The Gross returns are computed as Price[t] / Price[t-1]. We remove the first element because it is NaN.
+        :rtype: pandas.DataFrame
+        """
+        return self.Returns + 1
+
+    @lazy
+    def N(self):
+        return len(self.Data.columns)
+
+    @lazy
+    def A(self):
+        return range(self.N)
+
+    @lazy
+    def MeanReturns(self):
+        """Annualized mean of the returns"""
+        return self.Returns.mean() * 252
+
+    @lazy
+    def CovReturns(self):
+        """Annualized variance-covariance matrix of the returns"""
+        return self.Returns.cov() * 252
+
+    @lazy
+    def VarReturns(self):
+        return pd.Series(np.diag(self.CovReturns), index=self.Data.columns)
+
+    @lazy
+    def VolReturns(self):
+        return np.sqrt(self.VarReturns)
+
+    def gross(self, start=None, end=None, freq=None):
+        """
+        Return the gross returns at the dates of [start, end] at the frequency freq (see PriceStore.gross), read from the
+        store when the dataset has one (and the prices are not loaded yet).
+        :rtype: pandas.DataFrame
+        """
+        if self._Data is None and 'Data' not in self._cache:
+            try:
+                store = self.Store
+            except FileNotFoundError:
+                pass
+            else:
+                return store.gross(start=start, end=end, freq=freq)
+        return ((self.Data.asfreq(freq, method='pad') if freq else self.Data).pct_change() + 1)[1:][start:end]
+
+
+# Quantities of the current dataset, read as attributes of this module
+attributes = ['Store', 'Data', 'Returns', 'Gross', 'N', 'A', 'MeanReturns', 'CovReturns', 'VarReturns', 'VolReturns']
+
+dataset = Dataset()
+""":type dataset: Dataset"""
+
+
+@contextmanager
+def use(new):
+    """
+    Context in which new is the current dataset.
+    :type new: Dataset
+    """
+    global dataset
+    old, dataset = dataset, new
+    try:
+        yield new
+    finally:
+        dataset = old
+
 
-Data = LoadData()[:]
+class DataModule(types.ModuleType):
+    """Module whose missing attributes are read from the current dataset (Python < 3.7 has no module __getattr__)."""
 
-# The Returns are (P[t] - P[t-1]) / P[t-1] = P[t] / P[t-1] - 1 = GrossReturns - 1
-Returns = Data.pct_change()[1:]
-""":type Returns: pandas.DataFrame"""
+    def __getattr__(self, name):
+        if name in attributes:
+            return getattr(self.dataset, name)
+        raise AttributeError("module '{:s}' has no attribute '{:s}'".format(self.__name__, name))
 
-# The Gross returns are computed as Price[t] / Price[t-1]. We remove the first element because it is NaN.
-Gross = Returns + 1
-""":type Gross: pandas.DataFrame"""
 
+sys.modules[__name__].__class__ = DataModule
 
-N = len(Data.columns)
-A = range(N)
+# The attributes of the dataset are left out, so that "from data import *" does not load the prices
+__all__ = ['CAC40Tickers', 'Dataset', 'dataset', 'figsize', 'use']
 
 # For the report
 # figsize = (10, 6.18)
@@ -2,7 +2,7 @@ from time import time
 
 from gurobipy import GRB, GurobiError, Model, quicksum
 
-from data import A, Data
+import data
 from .portfolio import EquallyWeightedPortfolio, Portfolio
 
 
@@ -12,7 +12,7 @@ class PortfolioOptimizer(Model):
     inheritance makes all the methods of gurobipy.Model also available here.
     """
 
-    def __init__(self, name, output=False, RRR=0.09, Nmax=None, Wmin=None, Wmax=1):
+    def __init__(self, name, output=False, RRR=0.09, Nmax=None, Wmin=None, Wmax=1, env=None):
         """
         Creates a Portfolio Model.
         :type name:      string       - Name of the Model
@@ -21,6 +21,7 @@ class PortfolioOptimizer(Model):
         :type Nmax:      int   | None - Max number of stocks to invest in. If None, there is no limit.
         :type Wmin:      float | None - Min investment in a stock. If None, there is no minimum investment.
         :type Wmax:      float        - Max investment in a stock (%) (default 1.0).
+        :type env:       gurobipy.Env - Gurobi environment of the model (default: the default environment)
 
         TODO:
         :type leverage:  bool  | None - Leverage to reach (ratio long/short). If None, we cannot short a stock.
@@ -32,7 +33,10 @@ class PortfolioOptimizer(Model):
             ', Wmax = {:.1%}'.format(Wmax) if Wmax < 1 else '',
         )
         # Call to gurobipy.Model constructor
-        super().__init__(name=modelName)
+        if env is None:
+            super().__init__(name=modelName)
+        else:
+            super().__init__(name=modelName, env=env)
         if not output:
             self.setParam('OutputFlag', False)
 
@@ -72,11 +76,11 @@ class PortfolioOptimizer(Model):
 
     def createVars(self):
         # Weights
-        self._W = [self.addVar(name=Data.columns[a], lb=0, ub=self._Wmax) for a in A]
+        self._W = [self.addVar(name=data.Data.columns[a], lb=0, ub=self._Wmax) for a in data.A]
 
         if self._Nmax is not None or self._Wmin is not None:
             # Do we invest in X?
-            self._X = [self.addVar(vtype=GRB.BINARY) for a in A]
+            self._X = [self.addVar(vtype=GRB.BINARY) for a in data.A]
 
     def createConstrs(self):
         """
@@ -85,11 +89,11 @@ class PortfolioOptimizer(Model):
         """
         self.addConstr(quicksum(self._W) == 1)
         if self._Nmax is not None or self._Wmin is not None:
-            [self.addConstr(self._W[a] <= self._X[a]) for a in A]
+            [self.addConstr(self._W[a] <= self._X[a]) for a in data.A]
         if self._Nmax is not None:
             self.addConstr(quicksum(self._X) <= self._Nmax)
         if self._Wmin is not None:
-            [self.addConstr(self._W[a] >= self._X[a] * self._Wmin) for a in A]
+            [self.addConstr(self._W[a] >= self._X[a] * self._Wmin) for a in data.A]
 
     def getPortfolio(self):
         """
@@ -97,7 +101,7 @@ class PortfolioOptimizer(Model):
         :rtype Portfolio
         """
         try:
-            return Portfolio(data=[w.x for w in self._W], index=Data.columns, name=self.ModelName)
+            return Portfolio(data=[w.x for w in self._W], index=data.Data.columns, name=self.ModelName)
         except GurobiError:
             # If the model is infeasible, we return an equally-weighted portfolio.
             return EquallyWeightedPortfolio()
@@ -4,7 +4,8 @@ from matplotlib import pyplot as plt
 from matplotlib.ticker import FuncFormatter
 from numpy import random as rd
 
-from data import A, Data, figsize, Gross, Returns
+import data
+from data import figsize
 
 
 class Portfolio(pd.Series):
@@ -22,21 +23,21 @@ class Portfolio(pd.Series):
         Computes the daily gross returns of this portfolio.
         :rtype: pandas.Series
         """
-        return (Gross * self).sum(axis=1)
+        return (data.Gross * self).sum(axis=1)
 
     def AnnualizedReturn(self):
         """
         Computes the annualized return of the portfolio, taking account of the compounding return (geometric mean).
         :rtype: float
         """
-        return self.DailyGross().prod() ** (252. / len(Returns)) - 1
+        return self.DailyGross().prod() ** (252. / len(data.Returns)) - 1
 
     def MeanReturn(self):
         """
         Computes the (arithmetic) mean return of the portfolio.
         :rtype: float
         """
-        return (self * Returns.mean()).sum()
+        return (self * data.Returns.mean()).sum()
 
     def Vol(self):
         """
@@ -80,19 +81,19 @@ class Portfolio(pd.Series):
 
     def __call__(self, start, stop):
         """Computes the return of this portfolio on this slice of time."""
-        data = Data[start:stop]
-        return (data.loc[-1] / data.loc[0])
+        prices = data.Data[start:stop]
+        return (prices.loc[-1] / prices.loc[0])
 
 
 class RandomPortfolio(Portfolio):
     def __init__(self):
-        port = rd.rand(len(A))
-        super().__init__(data=port / port.sum(), index=Data.columns)
+        port = rd.rand(len(data.A))
+        super().__init__(data=port / port.sum(), index=data.Data.columns)
 
 
 class EquallyWeightedPortfolio(Portfolio):
     def __init__(self):
-        super().__init__(data=np.ones(len(A)) / len(A), index=Data.columns)
+        super().__init__(data=np.ones(len(data.A)) / len(data.A), index=data.Data.columns)
 
 
 class PortfolioGroup(pd.DataFrame):
@@ -1,14 +1,118 @@
+import os
+from abc import ABCMeta, abstractmethod
+from datetime import date, timedelta
+from multiprocessing.pool import ThreadPool
+
 import pandas as pd
-from pandas_datareader import data as web
-from pandas_datareader._utils import RemoteDataError
+
+from store import PriceStore
+
+cacheDir = "pickle/securities"      # Cache of the downloaded prices, one PriceStore per ticker
+
+
+class Provider(metaclass=ABCMeta):
+    """Source of the prices of the securities."""
+
+    @abstractmethod
+    def fetch(self, ticker, start, end=None):
+        """
+        Return the prices of the ticker from start to end (default: today).
+        :rtype: pandas.Series
+        """
+        raise NotImplementedError
+
+
+class DataReaderProvider(Provider):
+    """Prices downloaded with pandas_datareader."""
+
+    def __init__(self, source='yahoo', field='Adj Close'):
+        self.source = source
+        self.field = field
+
+    def fetch(self, ticker, start, end=None):
+        from pandas_datareader import data as web
+        return web.DataReader(ticker, self.source, start, end)[self.field]
+
+
+class Downloader(object):
+    """
+    Downloads the prices of the securities concurrently, and keeps them in a local cache (one PriceStore per ticker, with
+    the date of its last update). A cached series is refreshed when it is older than maxAge days: only its missing tail,
+    after the last cached date, is fetched.
+    """
+
+    def __init__(self, provider=None, path=cacheDir, processes=8, start='2005-01-01', maxAge=1):
+        """
+        :type provider:  Provider - Source of the prices (default: DataReaderProvider())
+        :type path:      str      - Directory of the cache
+        :type processes: int      - Max number of concurrent downloads
+        :type start:     str      - First date of the downloaded series
+        :type maxAge:    int      - Age (in days) from which a cached series is refreshed
+        """
+        self.provider = provider if provider is not None else DataReaderProvider()
+        self.path = path
+        self.processes = processes
+        self.start = start
+        self.maxAge = maxAge
+
+    def cached(self, ticker):
+        """
+        Return the cache of the ticker, or None if it has not been downloaded yet.
+        :rtype: PriceStore
+        """
+        try:
+            return PriceStore(os.path.join(self.path, ticker))
+        except FileNotFoundError:
+            return None
+
+    def series(self, ticker):
+        """
+        Return the prices of the ticker, from the cache, downloaded or refreshed if needed (None if they cannot be
+        downloaded).
+        :rtype: pandas.Series
+        """
+        today = date.today()
+        cache = self.cached(ticker)
+        if cache is not None:
+            prices = cache.prices()[ticker]
+            if cache.updated and (today - date(*map(int, cache.updated.split('-')))).days < self.maxAge:
+                return prices
+            start = prices.index[-1] + timedelta(days=1)
+        else:
+            prices, start = None, self.start
+        try:
+            new = self.provider.fetch(ticker, start)
+        except Exception as e:
+            print('Data not loaded for', ticker, ':', e)
+            return prices
+        if prices is not None:
+            new = pd.concat((prices, new[new.index > prices.index[-1]]))
+        PriceStore.write(new.to_frame(ticker), os.path.join(self.path, ticker), updated=today.isoformat())
+        return new
+
+    def download(self, tickers):
+        """
+        Return the prices of the tickers (dates x tickers), downloaded concurrently. The tickers that cannot be
+        downloaded are left out.
+        :rtype: pandas.DataFrame
+        """
+        pool = ThreadPool(max(1, min(self.processes, len(tickers))))
+        try:
+            series = pool.map(self.series, tickers)
+        finally:
+            pool.terminate()
+        return pd.DataFrame({t: s for (t, s) in zip(tickers, series) if s is not None})
+
+
+downloader = Downloader()
 
 
 class Security(object):
 
-    def __init__(self, ticker, name=None, field='Adj Close'):
+    def __init__(self, ticker, name=None, downloader=downloader):
         self.ticker = ticker
         self.name = name
-        self.field = field
+        self.downloader = downloader
         self._data = None
 
     def __str__(self):
@@ -17,13 +121,12 @@ class Security(object):
     def __repr__(self):
         return self.ticker
 
-    def load(self, start='2005-01-01', end=None, data_provider='yahoo'):
+    def load(self, start=None, end=None):
         if self._data is None:
             print('Loading data for', self)
-            try:
-                self._data = web.DataReader(self.ticker, data_provider, start, end)[self.field]
-            except RemoteDataError as e:
-                print('Data not loaded:', e)
+            data = self.downloader.series(self.ticker)
+            if data is not None:
+                self._data = data[start:end]
 
     @property
     def data(self):
@@ -35,35 +138,37 @@ class Security(object):
         return self.data / self.data.shift() - 1
 
     def mean_return(self):
-        return self.returns.mean()
+        return self.returns().mean()
 
 
 class Group(list):
 
-    def __init__(self, name, securities):
+    def __init__(self, name, securities, downloader=downloader):
         super().__init__(securities)
         self.name = name
+        self.downloader = downloader
         self._data = None
 
     @property
     def data(self):
         if self._data is None:
             try:
-                self._data = pd.read_pickle(self.filename)
-            except IOError:
+                self._data = PriceStore(self.filename).prices()
+            except FileNotFoundError:
                 self.load()
+                self.save()
         return self._data
 
     def load(self):
-        df = pd.DataFrame({s.ticker: s.data for s in self})
+        df = self.downloader.download([s.ticker for s in self])
         # We remove the stocks where more that 5% data is missing
-        df = df.loc[:,df.isnull().sum() < 0.05 * len(df)]
+        df = df.loc[:, df.isnull().sum() < 0.05 * len(df)]
         df.dropna(inplace=True)
+        self._data = df
 
     def save(self):
-        self.data.to_pickle(self.filename)
+        PriceStore.write(self.data, self.filename)
 
     @property
     def filename(self):
         return "pickle/{:s}".format(self.name)
-
@@ -1,81 +1,268 @@
 import numpy as np
-from math import gamma as Gamma, pi
+from math import lgamma, pi
 from numpy import linalg as la, random as rd
 
-from data import Data, Returns
+import data
+from sampling import chiSquare, standardNormal
 
 
-def generateGaussianScenarios(NbScenarios=1000, start=None, end=None, seed=None):
+class RollingMoments(object):
+    """
+    Mean and covariance of the returns over a window of dates, updated incrementally when the window slides: the rows
+    leaving and entering the window are removed from / added to the moments by rank-k updates of the co-moment matrix
+    M2 = sum((x - mean) (x - mean)^T), instead of recomputing the N x N covariance over the whole window.
+    """
+
+    def __init__(self, returns):
+        """
+        :type returns: pandas.DataFrame - Returns, the first one being at the second date of Data
+        """
+        self.returns = returns.values
+        self.dates = data.Data.index
+        self.lo, self.hi = 0, 0                     # Rows [lo, hi) of returns in the window
+        self.n = 0
+        self.mean = np.zeros(returns.shape[1])
+        self.M2 = np.zeros((returns.shape[1],) * 2)
+
+    def add(self, X):
+        """Adds the rows X to the moments (Chan et al. parallel update)."""
+        k = len(X)
+        if k == 0:
+            return
+        mean = X.mean(axis=0)
+        Xc = X - mean
+        n = self.n + k
+        delta = mean - self.mean
+        self.M2 += Xc.T.dot(Xc) + np.outer(delta, delta) * self.n * k / n
+        self.mean += delta * k / n
+        self.n = n
+
+    def remove(self, X):
+        """Removes the rows X from the moments (inverse of add)."""
+        k = len(X)
+        if k == 0:
+            return
+        if k == self.n:
+            self.n, self.mean, self.M2 = 0, np.zeros_like(self.mean), np.zeros_like(self.M2)
+            return
+        mean = X.mean(axis=0)
+        Xc = X - mean
+        n = self.n - k
+        rest = (self.n * self.mean - k * mean) / n
+        delta = mean - rest
+        self.M2 -= Xc.T.dot(Xc) + np.outer(delta, delta) * n * k / self.n
+        self.mean, self.n = rest, n
+
+    def window(self, start=None, end=None):
+        """
+        Return the mean and covariance (ddof=1) of the returns computed from Data[start:end], i.e. the returns of its
+        dates but the first one.
+        :rtype: (numpy.array, numpy.array)
+        """
+        dates = self.dates.slice_indexer(start, end)
+        lo, hi = dates.start, max(dates.start, dates.stop - 1)
+        if lo >= self.hi or hi <= self.lo:
+            # No overlap: the moments are computed from scratch
+            self.n, self.mean, self.M2 = 0, np.zeros_like(self.mean), np.zeros_like(self.M2)
+            self.add(self.returns[lo:hi])
+        else:
+            self.add(self.returns[lo:self.lo])
+            self.add(self.returns[self.hi:hi])
+            self.remove(self.returns[self.lo:lo])
+            self.remove(self.returns[hi:self.hi])
+        self.lo, self.hi = lo, hi
+        return self.mean.copy(), self.M2 / (self.n - 1)
+
+
+class WindowMoments(object):
+    """
+    Rolling moments of the log returns and of the returns of the current dataset, for a caller walking the windows in
+    date order (e.g. a BackTest). The moments of a window are computed by the caller, and given to the generators (see
+    their argument moments), so that the scenarios do not depend on the windows computed before by another process.
+    """
+
+    def __init__(self):
+        Data = data.Data
+        self.rolling = {True: RollingMoments(np.log(Data / Data.shift())[1:]),
+                        False: RollingMoments((Data / Data.shift() - 1)[1:])}
+
+    def window(self, start=None, end=None):
+        """
+        Return the moments of the (log) returns of Data[start:end] (see RollingMoments.window), as {log: (mean, cov)}.
+        :rtype: dict
+        """
+        return {log: rolling.window(start, end) for (log, rolling) in self.rolling.items()}
+
+
+def windowMoments(log, start=None, end=None):
+    """
+    Return the mean and covariance of the (log) returns of Data[start:end], computed from scratch.
+    :type log: bool - Log returns or returns
+    """
+    Data = data.Data[start:end]
+    Returns = (np.log(Data / Data.shift()) if log else Data / Data.shift() - 1)[1:]
+    return Returns.mean().values, Returns.cov().values
+
+
+def randomState(seed=None):
+    """
+    Return the random state of a generation: a new one from the seed if given (the global random state of numpy is left
+    untouched, e.g. in the workers of a parallel BackTest), else the global one.
+    """
+    return rd.RandomState(seed) if seed is not None else rd
+
+
+def generateGaussianScenarios(NbScenarios=1000, start=None, end=None, seed=None, qmc=False, antithetic=False,
+                              moments=None):
     """
     Generates random scenarios based on a multivariate Gaussian distribution of the log returns.
         - NbScenarios: int    - Number of scenarios to compute
         - start/end:   period - Period on which computing the variance-covariance matrix
         - seed:        int    - Seed for random generation
+        - qmc:         bool   - Quasi-Monte Carlo sampling (scrambled Halton sequence, see sampling.standardNormal)
+        - antithetic:  bool   - Antithetic sampling
+        - moments:     dict   - Moments of the period (see WindowMoments.window), computed from scratch if not given
     """
-    LocalData = Data[start:end]
-    LogReturns = np.log(LocalData / LocalData.shift())[1:]
-    MeanLogReturns = LogReturns.mean()
-    CovLogReturns = LogReturns.cov()
+    MeanLogReturns, CovLogReturns = moments[True] if moments is not None else windowMoments(True, start, end)
 
-    if seed is not None:
-        rd.seed(seed)
+    random = randomState(seed)
 
-    LogScenarios = rd.multivariate_normal(MeanLogReturns, CovLogReturns, size=NbScenarios)
+    if qmc or antithetic:
+        Z = standardNormal(NbScenarios, len(MeanLogReturns), qmc, antithetic, random)
+        LogScenarios = Z.dot(la.cholesky(CovLogReturns).T) + MeanLogReturns
+    else:
+        LogScenarios = random.multivariate_normal(MeanLogReturns, CovLogReturns, size=NbScenarios)
     Scenarios = np.exp(LogScenarios) - 1
 
     Probas = np.ones(NbScenarios) / NbScenarios
     return Scenarios, Probas
 
 
-def generateStudentTScenarios(NbScenarios=1000, nu=3, start=None, end=None, seed=None):
+def generateStudentTScenarios(NbScenarios=1000, nu=3, start=None, end=None, seed=None, qmc=False, antithetic=False,
+                              moments=None):
     """
     Generates random scenarios based on a multivariate 'student' t distribution of the log returns.
         - NbScenarios: int    - Number of scenarios to compute
         - start/end:   period - Period on which to compute the
                                 variance-covariance matrix
         - seed:        int    - Seed for random generation
+        - qmc:         bool   - Quasi-Monte Carlo sampling (see generateGaussianScenarios), the chi-square variable being
+                                drawn as a sum of nu squared normal variables (nu must be an integer)
+        - antithetic:  bool   - Antithetic sampling
+        - moments:     dict   - Moments of the period (see WindowMoments.window), computed from scratch if not given
     """
-    LocalData = Data[start:end]
-    LocalReturns = (LocalData / LocalData.shift() - 1)[1:]
-    MeanLocalReturns = LocalReturns.mean()
-    CovLocalReturns = LocalReturns.cov()
+    MeanLocalReturns, CovLocalReturns = moments[False] if moments is not None else windowMoments(False, start, end)
 
-    if seed is not None:
-        rd.seed(seed)
+    random = randomState(seed)
 
-    gaussian = rd.multivariate_normal(np.zeros(len(Data.columns)), CovLocalReturns, NbScenarios)
-    chi2 = rd.chisquare(nu, (NbScenarios, 1))
-    scenarios = gaussian / np.sqrt(nu / chi2) + np.array(MeanLocalReturns)
+    if qmc or antithetic:
+        if nu != int(nu):
+            raise ValueError("Quasi-Monte Carlo and antithetic sampling need an integer nu")
+        N = len(MeanLocalReturns)
+        Z = standardNormal(NbScenarios, N + int(nu), qmc, antithetic, random)
+        gaussian, chi2 = Z[:, :N].dot(la.cholesky(CovLocalReturns).T), chiSquare(Z[:, N:])
+    else:
+        gaussian = random.multivariate_normal(np.zeros(len(MeanLocalReturns)), CovLocalReturns, NbScenarios)
+        chi2 = random.chisquare(nu, (NbScenarios, 1))
+    scenarios = gaussian / np.sqrt(nu / chi2) + MeanLocalReturns
     probas = np.ones(NbScenarios) / NbScenarios
     return scenarios, probas
 
 
+class MultivariateT(object):
+    """
+    Multivariate Student-t distribution, whose scale matrix is factorized once (Cholesky) so that the density of many
+    points is evaluated with triangular solves only.
+    """
+
+    def __init__(self, mu, sigma, df):
+        """
+        :type mu:    numpy.array - Location (d dimensional)
+        :type sigma: numpy.array - Scale matrix (d x d)
+        :type df:    float       - Degrees of freedom
+        """
+        self.mu = np.asarray(mu, dtype=np.float64)
+        self.df = df
+        self.d = len(self.mu)
+        L = la.cholesky(np.asarray(sigma, dtype=np.float64))
+        self.Linv = la.inv(L)
+        logdet = 2 * np.log(np.diag(L)).sum()
+        self.constant = lgamma((self.d + df) / 2.) - lgamma(df / 2.) - self.d / 2. * np.log(df * pi) - logdet / 2
+
+    def logpdf(self, X):
+        """
+        Log-density of the points X.
+        :type X: numpy.array - M x d points (or a single d dimensional point)
+        :rtype: numpy.array | float
+        """
+        Z = (np.asarray(X, dtype=np.float64) - self.mu).dot(self.Linv.T)
+        return self.constant - (self.d + self.df) / 2. * np.log1p((Z ** 2).sum(axis=-1) / self.df)
+
+    def pdf(self, X):
+        return np.exp(self.logpdf(X))
+
+
 def multivariate_t_pdf(x, mu, sigma, df):
     """
     Multivariate t-student density:
     output:
-        the density of the given x element
+        the density of the given x element(s)
     input:
-        x = parameter (d dimensional numpy array or scalar)
-        mu = mean (d dimensional numpy array or scalar)
+        x = parameter (d dimensional numpy array, or M x d array of points)
+        mu = mean (d dimensional numpy array)
         sigma = scale matrix (dxd numpy array)
         df = degrees of freedom
     """
-    d = len(Returns)
-    Num = Gamma(1. * (d + df) / 2)
-    Denom = Gamma(1. * df / 2) * pow(df * pi, 1. * d / 2) \
-            * np.sqrt(la.det(sigma)) \
-            * (1 + (1./df) * np.dot(np.dot((x - mu), la.inv(sigma)), (x - mu))) ** ((d+df)/2)
-    d = 1. * Num / Denom 
-    return d
+    return MultivariateT(mu, sigma, df).pdf(x)
 
 
-def K(h):
+def triangularKernel(u):
     """Triangular Kernel."""
-    def wrapped(x):
-        return (np.abs(x) < 1./h) * h * (1 - h * np.abs(x))
-    return wrapped
+    return np.maximum(1 - np.abs(u), 0)
 
 
-def kernel_density_estimator(x, h, data):
-    return K(h)((x - Returns) / h).prod(axis=1).sum() / (len(data) * h.prod())
+def kernel_density_estimator(x, h, sample, chunk=2 ** 20):
+    """
+    Triangular kernel density estimator of the sample, with bandwidths h, evaluated at the points x:
+        f(x) = sum_s prod_i K((x[i] - sample[s, i]) / h[i]) / (len(sample) * prod(h))
+    As the kernel has a compact support:
+        - the points and the sample are sorted along their widest dimension (in bandwidths), and each block of points is
+          only compared to the sample points within one bandwidth of it along this dimension,
+        - the product over the dimensions of a block is computed densely until most of its terms are zero, then only on
+          the remaining nonzero pairs (point, sample point).
+    Each block handles at most chunk pairs.
+    :type x:      numpy.array - M x d points (or a single d dimensional point)
+    :type h:      numpy.array - d bandwidths
+    :type sample: numpy.array | pandas.DataFrame - S x d sample
+    :rtype: numpy.array | float
+    """
+    h = np.asarray(h, dtype=np.float64)
+    X = np.atleast_2d(np.asarray(x, dtype=np.float64)) / h
+    sample = np.asarray(sample, dtype=np.float64) / h
+    dims = np.argsort(- sample.std(axis=0))
+    k = dims[0]
+    sample = sample[np.argsort(sample[:, k])]
+    order = np.argsort(X[:, k])
+    density = np.zeros(len(X))
+    block = max(1, int(np.sqrt(chunk)))
+    for b in range(0, len(X), block):
+        rows = order[b:b + block]
+        Xb = X[rows]
+        lo = np.searchsorted(sample[:, k], Xb[0, k] - 1, side='left')
+        hi = np.searchsorted(sample[:, k], Xb[-1, k] + 1, side='right')
+        for c in range(lo, hi, block):
+            S = sample[c:min(hi, c + block)]
+            product = np.ones((len(rows), len(S)))
+            for n, i in enumerate(dims):
+                product *= triangularKernel(Xb[:, i, np.newaxis] - S[:, i])
+                if np.count_nonzero(product) < product.size / 8:
+                    break
+            I, J = np.nonzero(product)
+            values = product[I, J]
+            for i in dims[n + 1:]:
+                values *= triangularKernel(Xb[I, i] - S[J, i])
+                nonzero = values > 0
+                I, J, values = I[nonzero], J[nonzero], values[nonzero]
+            density[rows] += np.bincount(I, values, minlength=len(rows))
+    density /= len(sample) * h.prod()
+    return density if np.ndim(x) > 1 else density[0]
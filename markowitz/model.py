@@ -2,7 +2,7 @@ from gurobipy import quicksum
 
 import pandas as pd
 
-from data import A
+import data
 from entities.model import PortfolioOptimizer
 
 
@@ -18,14 +18,14 @@ class Markowitz(PortfolioOptimizer):
         cov = self._cov.as_matrix()
         self.setObjective(
             quicksum(
-                cov[i, j] * self._W[i] * self._W[j] for i in A for j in A
+                cov[i, j] * self._W[i] * self._W[j] for i in data.A for j in data.A
             )
         )
 
     def createConstrs(self):
         super().createConstrs()
         self.addConstr(
-            quicksum(self._W[i] * self._mean[i] for i in A) >= self._RRR
+            quicksum(self._W[i] * self._mean[i] for i in data.A) >= self._RRR
     )
 
     def plot(self):
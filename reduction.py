@@ -0,0 +1,154 @@
+import numpy as np
+from numpy import linalg as la, random as rd
+
+
+def nearest(scenarios, centers, chunk=2 ** 22):
+    """
+    Return, for each scenario, the index of the nearest center and the (Euclidean) distance to it. The distances are
+    computed by blocks of at most chunk values.
+    :rtype: (numpy.array, numpy.array)
+    """
+    squares = (centers ** 2).sum(axis=1)
+    labels = np.empty(len(scenarios), dtype=np.int64)
+    distances = np.empty(len(scenarios))
+    block = max(1, chunk // len(centers))
+    for i in range(0, len(scenarios), block):
+        X = scenarios[i:i + block]
+        D = squares - 2 * X.dot(centers.T)
+        labels[i:i + block] = D.argmin(axis=1)
+        distances[i:i + block] = D[np.arange(len(X)), labels[i:i + block]] + (X ** 2).sum(axis=1)
+    return labels, np.sqrt(np.maximum(distances, 0))
+
+
+def reductionError(scenarios, probas, reduced):
+    """
+    Return the Kantorovich (transport) distance between the distribution (scenarios, probas) and the reduced scenarios,
+    whose probabilities are those of the scenarios nearest to each of them (as given by the reductions of this module):
+        sum(probas[s] * min_k |scenarios[s] - reduced[k]|)
+    :rtype: float
+    """
+    return probas.dot(nearest(scenarios, reduced)[1])
+
+
+def matchMoments(reduced, weights, scenarios, probas):
+    """
+    Return the reduced scenarios transformed (affinely) so that their mean and covariance are those of the distribution
+    (scenarios, probas). They must have at least N+1 affinely independent scenarios.
+    :rtype: numpy.array
+    """
+    mean = probas.dot(scenarios)
+    X, Y = scenarios - mean, reduced - weights.dot(reduced)
+    L = la.cholesky(X.T.dot(X * probas[:, np.newaxis]))
+    M = la.cholesky(Y.T.dot(Y * weights[:, np.newaxis]))
+    return mean + Y.dot(la.solve(M.T, L.T))
+
+
+def kMeansReduction(scenarios, probas, K, maxiter=20, tol=1e-3, moments=True, seed=None):
+    """
+    Reduces the scenarios to K weighted scenarios with the (probability weighted) k-means algorithm: the reduced
+    scenarios are the centers of K clusters of scenarios, with the probability of their cluster. The centers are
+    initialized by k-means++.
+    The centers keep the mean of the distribution, but shrink its dispersion (each cluster is replaced by its mean,
+    which underestimates the risk of the tails): by default, they are then transformed to match its covariance too.
+    O(S K N) operations by iteration.
+    :type scenarios: numpy.array - S x N scenarios
+    :type probas:    numpy.array - Probability of each scenario
+    :type K:         int         - Number of reduced scenarios
+    :type maxiter:   int         - Max number of iterations (Lloyd)
+    :type tol:       float       - The iterations stop when less than this fraction of the scenarios change of cluster
+    :type moments:   bool        - Matches the covariance of the distribution (see matchMoments), if K > N
+    :type seed:      int         - Seed of the initialization
+    :rtype: (numpy.array, numpy.array)
+    """
+    if K >= len(scenarios):
+        return scenarios, probas
+    random = rd.RandomState(seed) if seed is not None else rd
+
+    # k-means++: each center is drawn with a probability proportional to the weighted squared distance to the others
+    centers = np.empty((K, scenarios.shape[1]))
+    centers[0] = scenarios[random.choice(len(scenarios), p=probas)]
+    distances = ((scenarios - centers[0]) ** 2).sum(axis=1)
+    for k in range(1, K):
+        weights = probas * distances
+        centers[k] = scenarios[random.choice(len(scenarios), p=weights / weights.sum())]
+        distances = np.minimum(distances, ((scenarios - centers[k]) ** 2).sum(axis=1))
+
+    labels = None
+    for _ in range(maxiter):
+        new, distances = nearest(scenarios, centers)
+        if labels is not None and (new != labels).mean() < tol:
+            break
+        labels = new
+        weights = np.bincount(labels, weights=probas, minlength=K)
+        # The empty clusters are moved to the farthest scenarios
+        empty = np.nonzero(weights == 0)[0]
+        far = np.argsort(- probas * distances)[:len(empty)]
+        labels[far] = empty
+        weights = np.bincount(labels, weights=probas, minlength=K)
+        for j in range(scenarios.shape[1]):
+            centers[:, j] = np.bincount(labels, weights=probas * scenarios[:, j], minlength=K) / weights
+    if moments and K > scenarios.shape[1]:
+        centers = matchMoments(centers, weights, scenarios, probas)
+    return centers, weights
+
+
+def forwardSelection(scenarios, probas, K):
+    """
+    Reduces the scenarios to K of them with the fast forward selection of Heitsch and Roemisch: the scenarios are
+    selected one by one, each minimizing the Kantorovich distance between the distribution and the selected scenarios,
+    and the probability of each other scenario is then given to its nearest selected one.
+    O(S^2) memory and O(K S^2) operations: for large S, use kMeansReduction (or reduce a k-means reduction).
+    :type scenarios: numpy.array - S x N scenarios
+    :type probas:    numpy.array - Probability of each scenario
+    :type K:         int         - Number of reduced scenarios
+    :rtype: (numpy.array, numpy.array)
+    """
+    if K >= len(scenarios):
+        return scenarios, probas
+    squares = (scenarios ** 2).sum(axis=1)
+    D = np.sqrt(np.maximum(squares[:, np.newaxis] - 2 * scenarios.dot(scenarios.T) + squares, 0))
+
+    selected = np.zeros(len(scenarios), dtype=bool)
+    # Distance of each scenario to the nearest selected one
+    distances = np.full(len(scenarios), np.inf)
+    for _ in range(K):
+        # Kantorovich distance obtained by selecting each scenario u
+        z = probas.dot(np.minimum(distances[:, np.newaxis], D))
+        z[selected] = np.inf
+        u = z.argmin()
+        selected[u] = True
+        distances = np.minimum(distances, D[:, u])
+
+    index = np.nonzero(selected)[0]
+    labels = D[:, index].argmin(axis=1)
+    return scenarios[index], np.bincount(labels, weights=probas, minlength=K)
+
+
+methods = {
+    'kmeans': kMeansReduction,
+    'forward': forwardSelection
+}
+
+
+class ReducedGenerator(object):
+    """
+    Scenarios generator followed by a reduction: it has the same interface as the generator (e.g.
+    generateStudentTScenarios), and returns K weighted scenarios representing the NbScenarios generated ones.
+    """
+
+    def __init__(self, generator, K, method='kmeans'):
+        """
+        :type generator: function - Scenarios generator, returning (scenarios, probas)
+        :type K:         int      - Number of reduced scenarios
+        :type method:    str      - Reduction, 'kmeans' (kMeansReduction) or 'forward' (forwardSelection)
+        """
+        self.generator = generator
+        self.K = K
+        self.method = method
+
+    def __call__(self, *args, **kwargs):
+        scenarios, probas = self.generator(*args, **kwargs)
+        if self.method == 'kmeans':
+            # The initialization is drawn from the seed of the generation, if any
+            return kMeansReduction(scenarios, probas, self.K, seed=kwargs.get('seed'))
+        return methods[self.method](scenarios, probas, self.K)
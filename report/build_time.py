@@ -0,0 +1,45 @@
+from time import time
+
+from tabulate import tabulate
+
+from generator import generateGaussianScenarios
+from scenarios_based.models.risk.gmd import GMD
+from scenarios_based.models.risk.mad import MAD
+from scenarios_based.models.risk.semi_mad import SemiMAD
+from scenarios_based.models.safety.cvar import CVaR
+from scenarios_based.models.safety.minimax import Minimax
+from scenarios_based.models.safety.var import VaR
+
+# Max number of scenarios of each model (GMD has S^2 constraints, VaR is a MIP)
+models = {
+    MAD: 10000,
+    SemiMAD: 10000,
+    CVaR: 10000,
+    Minimax: 10000,
+    GMD: 100,
+    VaR: 1000
+}
+
+
+def BuildTime(model_class, scenarios, probas):
+    """
+    Times the construction (constructor and update) and the resolution of a scenarios based model.
+    :return: (build time, solve time)
+    """
+    t = time()
+    model = model_class(scenarios, probas)
+    build = time() - t
+    t = time()
+    model.optimize()
+    return build, time() - t
+
+
+if __name__ == '__main__':
+    rows = []
+    for S in (100, 1000, 10000):
+        scenarios, probas = generateGaussianScenarios(S, seed=0)
+        for model_class, Smax in models.items():
+            if S <= Smax:
+                print(model_class.__name__, S)
+                rows.append([model_class.__name__, S] + list(BuildTime(model_class, scenarios, probas)))
+    print(tabulate(rows, headers=['Model', 'S', 'Build (s)', 'Solve (s)']))
@@ -1,6 +1,6 @@
 from numpy.random import chisquare, multivariate_normal
 
-from data import *
+from data import Gross
 from report.config import *
 
 figure(figsize=(10, 5))
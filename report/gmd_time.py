@@ -0,0 +1,30 @@
+from time import time
+
+from tabulate import tabulate
+
+from generator import generateGaussianScenarios
+from scenarios_based.models.risk.gmd import GMD
+
+
+def GMDTime(scenarios, probas, cuts):
+    """
+    Times the construction and the resolution of the GMD model.
+    :return: (build time, solve time, GMD, number of cuts)
+    """
+    t = time()
+    model = GMD(scenarios, probas, cuts=cuts)
+    build = time() - t
+    t = time()
+    model.optimize()
+    return build, time() - t, model.objVal, len(model._cstr) if cuts else None
+
+
+if __name__ == '__main__':
+    rows = []
+    for S in (100, 300, 1000, 10000, 100000):
+        scenarios, probas = generateGaussianScenarios(S, seed=0)
+        # The pairwise formulation has S^2 / 2 variables
+        for cuts in ((False, True) if S <= 1000 else (True,)):
+            print(S, "cuts" if cuts else "pairwise")
+            rows.append([S, "Cuts" if cuts else "Pairwise"] + list(GMDTime(scenarios, probas, cuts)))
+    print(tabulate(rows, headers=['S', 'Formulation', 'Build (s)', 'Solve (s)', 'GMD', 'Cuts']))
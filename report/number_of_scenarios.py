@@ -8,12 +8,12 @@ from adp.plot.wealth import FinalReturnPlotter
 from adp.pwladp.trainer import ADPStrategyTrainer
 from adp.strategy import ADPStrategy
 from adp.value_function import PWLDynamicFunction
-from data import Data
+import data
 from parameters import S, periods, repeat, freq
 
 (period, start, middle, end, _) = periods[3]
 
-Gross_test = (Data.asfreq(freq, method='pad').pct_change() + 1)[1:][middle:end]
+Gross_test = data.dataset.gross(start=middle, end=end, freq=freq)
 generator = GaussianGenerator(start=start, end=middle)
 strategy = ADPStrategy(value_function_class=PWLDynamicFunction)
 trainer = ADPStrategyTrainer(gamma=0.5, generator=generator)
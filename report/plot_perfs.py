@@ -6,7 +6,7 @@ from matplotlib.ticker import FuncFormatter
 
 from adp.generator import GaussianGenerator
 from adp.single_period_model import singlePeriodModel
-from data import Data
+import data
 from markowitz import Markowitz
 from parameters import init, periods, theta, gammas, perf_dir_name, fig_file_name
 
@@ -17,15 +17,15 @@ k = 500
 for (key, (period, start, middle, end, r)) in periods.items():
 
     # Training data
-    Return_train = Data.pct_change()[1:][start:middle] * 252
+    Return_train = data.Data.pct_change()[1:][start:middle] * 252
     """:type: pandas.DataFrame"""
 
 
     # Testing data
-    Data_test = Data[middle:end]
-    Gross_test = (Data.pct_change() + 1)[1:][middle:end]
+    Data_test = data.Data[middle:end]
+    Gross_test = data.dataset.gross(start=middle, end=end)
     Gross_test.insert(0, 'r', 1 + r)
-    Weekly_Gross_test = (Data.asfreq('W-FRI', method='pad').pct_change()[1:] + 1)[middle:end]
+    Weekly_Gross_test = data.dataset.gross(start=middle, end=end, freq='W-FRI')
     Weekly_Gross_test.insert(0, 'r', 1 + r)
 
 
@@ -0,0 +1,48 @@
+from time import time
+
+import numpy as np
+from tabulate import tabulate
+
+from generator import generateStudentTScenarios
+from reduction import forwardSelection, kMeansReduction, reductionError
+from scenarios_based.models.risk.mad import MAD
+from scenarios_based.models.safety.cvar import CVaR
+
+models = [CVaR, MAD]
+
+
+def ReductionError(model_class, scenarios, probas, reduced, weights):
+    """
+    Solves the model on the scenarios and on their reduction.
+    :return: (solve time on the scenarios, on the reduction, objective on the scenarios, on the reduction,
+              L1 distance between the two portfolios)
+    """
+    t = time()
+    full = model_class(scenarios, probas).optimize()
+    tFull = time() - t
+    t = time()
+    small = model_class(reduced, weights).optimize()
+    tSmall = time() - t
+    gap = np.abs(full.getPortfolio() - small.getPortfolio()).sum()
+    return tFull, tSmall, full.objVal, small.objVal, gap
+
+
+if __name__ == '__main__':
+    S, K = 50000, 500
+    scenarios, probas = generateStudentTScenarios(S, seed=0)
+    reductions = [('k-means', lambda: kMeansReduction(scenarios, probas, K, seed=0)),
+                  # The forward selection is quadratic in S: it is applied to a first k-means reduction to 5K scenarios
+                  ('k-means + forward', lambda: forwardSelection(*kMeansReduction(scenarios, probas, 5 * K, seed=0,
+                                                                                  moments=False), K))]
+    rows = []
+    for (name, reduce) in reductions:
+        t = time()
+        reduced, weights = reduce()
+        tReduce = time() - t
+        error = reductionError(scenarios, probas, reduced)
+        for model_class in models:
+            print(name, model_class.__name__)
+            rows.append([name, model_class.__name__, tReduce, error] +
+                        list(ReductionError(model_class, scenarios, probas, reduced, weights)))
+    print(tabulate(rows, headers=['Reduction', 'Model', 'Reduction (s)', 'Kantorovich', 'Solve S (s)', 'Solve K (s)',
+                                  'Objective S', 'Objective K', 'Portfolio L1 gap']))
@@ -0,0 +1,68 @@
+from time import time
+
+from numpy import random as rd
+from tabulate import tabulate
+
+from adp.generator import GaussianGenerator
+from adp.pwladp.model import PWLADPModel, gurobiModel
+from adp.pwladp.trainer import ADPStrategyTrainer
+from adp.strategy import ADPStrategy
+from adp.value_function import PWLDynamicFunction
+from parameters import T, periods
+
+
+class RebuiltModel:
+    """Former behaviour: a new Gurobi model is built at each call."""
+
+    def solve(self, R, hp, V):
+        return gurobiModel(R, hp, V)
+
+
+class TimedModel:
+    """Decision model whose calls to solve are timed (the model itself is left untouched)."""
+
+    def __init__(self, model, timer):
+        """
+        :param timer:  1-element list, to which the time of each call is added
+        """
+        self.model = model
+        self.timer = timer
+
+    def solve(self, *args):
+        t = time()
+        res = self.model.solve(*args)
+        self.timer[0] += time() - t
+        return res
+
+
+def TrainingTime(model_class, S, generator, gamma=0.2, seed=0):
+    """
+    Times a full training run of S scenarios, with the decisions computed by model_class.
+    :return: (total time, time of the decision models only)
+    """
+    rd.seed(seed)
+    strategy = ADPStrategy(value_function_class=PWLDynamicFunction)
+    trainer = ADPStrategyTrainer(gamma=gamma, generator=generator, model_class=model_class)
+
+    # We time the calls to solve of every time step model
+    timer = [0.]
+    trainer.models = [TimedModel(model, timer) for model in trainer.models]
+
+    t = time()
+    for s in range(S):
+        trainer.train(strategy)
+    return time() - t, timer[0]
+
+
+if __name__ == '__main__':
+    S = 100
+    (period, start, middle, end, r) = periods['DD']
+    generator = GaussianGenerator(r=r, start=start, end=middle)
+
+    rows = []
+    for name, model_class in (('Build', RebuiltModel), ('Update', PWLADPModel)):
+        print("Training with", name)
+        total, solve = TrainingTime(model_class, S, generator)
+        rows.append([name, total, solve, 1000 * solve / (S * T)])
+    print("\nTraining time with {:d} scenarios\n".format(S))
+    print(tabulate(rows, headers=['Model', 'Total (s)', 'Decisions (s)', 'Per decision (ms)']))
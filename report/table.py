@@ -3,7 +3,7 @@ from time import time
 from matplotlib import pyplot as plt
 from tabulate import tabulate
 
-from data import *
+from data import Returns, figsize
 from entities.portfolio import EquallyWeightedPortfolio, PortfolioGroup
 from generator import generateGaussianScenarios, generateStudentTScenarios
 from markowitz import Markowitz
@@ -0,0 +1,52 @@
+from time import time
+
+import numpy as np
+from numpy import random as rd
+from tabulate import tabulate
+
+from adp.value_function import PWLCompactFunction, PWLDynamicFunction, SeparableValueFunction
+from data import N
+from parameters import w0
+
+
+def UpdatesPerSecond(value_function_class, h, deltaV, alpha):
+    """Applies the updates (h[i], deltaV[i], alpha[i]) to a new value function, returns it and the updates/second."""
+    f = value_function_class()
+    t = time()
+    for args in zip(h, deltaV, alpha):
+        f.update(*args)
+    return f, len(h) / (time() - t)
+
+
+def SeparableUpdatesPerSecond(value_function_class, h, deltaV, alpha):
+    """Same as UpdatesPerSecond for a SeparableValueFunction (one update = the N + 1 positions of a time step)."""
+    V = SeparableValueFunction(value_function_class=value_function_class)
+    t = time()
+    for args in zip(h, deltaV, alpha):
+        V.update(*args)
+    return V, len(h) / (time() - t)
+
+
+if __name__ == '__main__':
+    n = 100000
+    rd.seed(0)
+    h = w0 * rd.rand(n)
+    deltaV = 2 * rd.rand(n)
+    alpha = 500 / (500 + np.arange(n))
+
+    rows = []
+    for value_function_class in (PWLDynamicFunction, PWLCompactFunction):
+        f, speed = UpdatesPerSecond(value_function_class, h, deltaV, alpha)
+        rows.append([value_function_class.__name__, speed])
+    print("\n{:d} updates of one PWL value function\n".format(n))
+    print(tabulate(rows, headers=['Class', 'Updates / s']))
+
+    n = 10000
+    h = w0 * rd.rand(n, N+1)
+    deltaV = 2 * rd.rand(n, N+1)
+    rows = []
+    for value_function_class in (PWLDynamicFunction, PWLCompactFunction):
+        V, speed = SeparableUpdatesPerSecond(value_function_class, h, deltaV, alpha[:n])
+        rows.append([value_function_class.__name__, speed])
+    print("\n{:d} updates of a separable value function ({:d} assets)\n".format(n, N))
+    print(tabulate(rows, headers=['Class', 'Updates / s']))
@@ -0,0 +1,30 @@
+from tabulate import tabulate
+
+from scenarios_based.models.safety.cvar import CVaR
+from scenarios_based.variance import WeightsStdErr
+
+# Sampling options of generateGaussianScenarios
+modes = {
+    'Monte Carlo': {},
+    'Antithetic': {'antithetic': True},
+    'Quasi-Monte Carlo': {'qmc': True},
+    'QMC + Antithetic': {'qmc': True, 'antithetic': True}
+}
+
+
+def ScenariosNeeded(Ns, stderrs, target):
+    """Return the smallest number of scenarios of Ns whose standard error is below target (None if there is none)."""
+    return next((N for (N, stderr) in zip(Ns, stderrs) if stderr <= target), None)
+
+
+if __name__ == '__main__':
+    Ns = [250, 500, 1000, 2000, 4000]
+    M = 50
+    stderrs = {}
+    for (mode, kwargs) in modes.items():
+        print(mode)
+        stderrs[mode] = [WeightsStdErr(CVaR, N=N, M=M, **kwargs) for N in Ns]
+    # Standard error of the objective reached by plain Monte Carlo with the most scenarios
+    target = stderrs['Monte Carlo'][-1]
+    rows = [[mode] + errors + [ScenariosNeeded(Ns, errors, target)] for (mode, errors) in stderrs.items()]
+    print(tabulate(rows, headers=['Sampling'] + ['S = {:d}'.format(N) for N in Ns] + ['S needed'], floatfmt='.2e'))
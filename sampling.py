@@ -0,0 +1,91 @@
+import numpy as np
+from numpy import random as rd
+
+# Coefficients of Acklam's rational approximation of the inverse of the standard normal CDF (relative error < 1.2e-9)
+_a = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02,
+      -3.066479806614716e+01, 2.506628277459239e+00]
+_b = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01,
+      -1.328068155288572e+01]
+_c = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00,
+      4.374664141464968e+00, 2.938163982698783e+00]
+_d = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00]
+
+
+def normalPpf(u):
+    """
+    Inverse of the standard normal CDF.
+    :type u: numpy.array - Values in (0, 1)
+    :rtype: numpy.array
+    """
+    u = np.asarray(u, dtype=np.float64)
+    x = np.empty_like(u)
+    low, high = u < 0.02425, u > 1 - 0.02425
+    central = ~(low | high)
+
+    q = u[central] - 0.5
+    r = q * q
+    x[central] = (np.polyval(_a, r) * q) / (np.polyval(_b + [1.], r))
+
+    for tail, sign, v in ((low, 1, u[low]), (high, -1, 1 - u[high])):
+        q = np.sqrt(-2 * np.log(v))
+        x[tail] = sign * np.polyval(_c, q) / np.polyval(_d + [1.], q)
+    return x
+
+
+def primes(n):
+    """Return the n first prime numbers."""
+    found = []
+    k = 2
+    while len(found) < n:
+        if all(k % p for p in found if p * p <= k):
+            found.append(k)
+        k += 1
+    return found
+
+
+def halton(n, d, random=rd):
+    """
+    Randomly scrambled Halton sequence: the n first points of the d dimensional Halton sequence, whose digits (in the
+    base of each dimension) are shuffled by random permutations, drawn for each dimension and each digit.
+    The scrambling removes the correlations between the dimensions of high prime bases, and the sequences of two calls
+    are independent randomized quasi-Monte Carlo samples.
+    :param random: Random state of the permutations (default: the global one of numpy)
+    :return: n x d array of points of (0, 1)
+    """
+    points = np.zeros((n, d))
+    index = np.arange(1, n + 1)
+    for j, b in enumerate(primes(d)):
+        # Number of digits giving a double precision resolution
+        digits = int(np.ceil(53 * np.log(2) / np.log(b)))
+        i = index.copy()
+        scale = 1.
+        for _ in range(digits):
+            scale /= b
+            points[:, j] += random.permutation(b)[i % b] * scale
+            i //= b
+    # Points at 0 (all the digits mapped to 0) are moved inside the interval
+    return np.clip(points, 0.5 / 2 ** 53, 1 - 0.5 / 2 ** 53)
+
+
+def standardNormal(n, d, qmc=False, antithetic=False, random=rd):
+    """
+    Return n samples of d independent standard normal variables.
+    :param qmc:        If True, the samples are the inverse CDF of a scrambled Halton sequence (quasi-Monte Carlo)
+    :param antithetic: If True, the second half of the samples are the opposite of the first half
+    :param random:     Random state (default: the global one of numpy)
+    :rtype: numpy.array - n x d
+    """
+    m = (n + 1) // 2 if antithetic else n
+    Z = normalPpf(halton(m, d, random)) if qmc else random.standard_normal((m, d))
+    if antithetic:
+        Z = np.concatenate((Z, -Z))[:n]
+    return Z
+
+
+def chiSquare(Z):
+    """
+    Return the chi-square samples, with Z.shape[1] degrees of freedom, given by the sum of the squares of the rows of Z
+    (see standardNormal).
+    :rtype: numpy.array - len(Z) x 1
+    """
+    return (Z ** 2).sum(axis=1, keepdims=True)
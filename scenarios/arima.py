@@ -2,7 +2,7 @@ from matplotlib import pyplot as plt
 from statsmodels.tsa.arima_model import ARIMA
 from statsmodels.tsa.stattools import pacf, acf
 
-from data import *
+from data import Data
 
 d = Data.iloc[:, 0]
 
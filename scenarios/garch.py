@@ -1,21 +1,121 @@
+import hashlib
+import os
+from multiprocessing import Pool
+
 import numpy as np
-from arch import arch_model
+import pandas as pd
+
+import data
+
+cacheDir = "pickle/garch"       # Results tables of the model selections, one file per (returns, grid) key
+
+means = ('Constant',)
+vols = ('GARCH', 'EGARCH', 'ARCH')
+dists = ('Normal', 'StudentsT')
+orders = range(1, 20, 3)
+
+
+def grid(means=means, vols=vols, dists=dists, orders=orders):
+    """
+    Return the specifications (mean, vol, dist, p, q) of the grid. ARCH models have no q, so they are only fitted once
+    for each p (with q = 0).
+    :rtype: list
+    """
+    specs = []
+    for mean in means:
+        for vol in vols:
+            for dist in dists:
+                for p in orders:
+                    for q in (orders if vol != 'ARCH' else (0,)):
+                        specs.append((mean, vol, dist, p, q))
+    return specs
+
+
+def logReturns():
+    """Return the daily log returns of Data, in percent (the scale expected by the arch optimizer)."""
+    return 100 * np.log(data.Data / data.Data.shift())[1:]
+
+
+def dataKey(returns, specs):
+    """
+    Return the key of the model selection of the returns over the grid specs: a hash of their values, dates, tickers and
+    of the grid.
+    :rtype: str
+    """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(returns.values, dtype=np.float64).tobytes())
+    h.update(returns.index.values.astype('datetime64[ns]').tobytes())
+    h.update(repr((list(returns.columns), specs)).encode())
+    return h.hexdigest()[:16]
+
+
+def fitSpecification(task):
+    """
+    Fits a model to the returns of a ticker, and return its row of the results table: the ticker, the specification,
+    the AIC / BIC and the fitted parameters. The convergence warnings are replaced by the 'converged' column.
+    :type task: (str, numpy.array, tuple) - Ticker, returns and specification (mean, vol, dist, p, q)
+    :rtype: dict
+    """
+    from arch import arch_model
+    ticker, returns, (mean, vol, dist, p, q) = task
+    fit = arch_model(returns, mean=mean, vol=vol, dist=dist, p=p, q=q).fit(disp='off', show_warning=False)
+    return {'ticker': ticker, 'mean': mean, 'vol': vol, 'dist': dist, 'p': p, 'q': q, 'aic': fit.aic, 'bic': fit.bic,
+            'converged': fit.convergence_flag == 0, 'params': dict(fit.params)}
+
+
+def fitGrid(returns, specs, processes=None):
+    """
+    Fits all the specifications to all the assets, in a pool of processes.
+    :type returns:   pandas.DataFrame - Returns (dates x tickers)
+    :type processes: int              - Number of workers (default: number of cores)
+    :rtype: pandas.DataFrame
+    """
+    tasks = [(ticker, returns[ticker].values, spec) for ticker in returns.columns for spec in specs]
+    with Pool(processes) as pool:
+        rows = pool.map(fitSpecification, tasks, chunksize=max(1, len(tasks) // (8 * (processes or os.cpu_count()))))
+    return pd.DataFrame(rows, columns=['ticker', 'mean', 'vol', 'dist', 'p', 'q', 'aic', 'bic', 'converged', 'params'])
+
+
+def modelSelection(returns=None, specs=None, processes=None, path=cacheDir):
+    """
+    Return the results table of the fits of the grid to each asset (see fitSpecification). The table is cached on the
+    disk, keyed by the returns and the grid (see dataKey): the grid is only fitted for new data.
+    :type returns: pandas.DataFrame - Returns (default: logReturns())
+    :type specs:   list             - Specifications (default: grid())
+    :rtype: pandas.DataFrame
+    """
+    returns = logReturns() if returns is None else returns
+    specs = grid() if specs is None else specs
+    filename = os.path.join(path, dataKey(returns, specs) + '.pkl')
+    if os.path.exists(filename):
+        return pd.read_pickle(filename)
+    table = fitGrid(returns, specs, processes)
+    os.makedirs(path, exist_ok=True)
+    table.to_pickle(filename + '.tmp')
+    os.replace(filename + '.tmp', filename)
+    return table
+
 
-from data import Data
+def bestSpecifications(table, criterion='aic'):
+    """
+    Return the chosen model of each asset: the converged fit minimizing the criterion.
+    :type criterion: str - 'aic' or 'bic'
+    :rtype: pandas.DataFrame - Indexed by ticker
+    """
+    table = table[table.converged]
+    return table.loc[table.groupby('ticker')[criterion].idxmin()].set_index('ticker')
 
-D = Data.iloc[:, 1]
 
-q = 1
-ps = range(1, 10)
-fits = {}
-for mean in ('Constant',):
-    for vol in ('GARCH', 'EGARCH', 'ARCH'):
-        for dist in ('Normal', 'StudentsT'):
-            for p in range(1, 20, 3):
-                for q in range(1, 20, 3):
-                    fits[mean, vol, dist, p, q] = arch_model(D, p=p, q=q, mean=mean, vol=vol, dist=dist).fit()
+def specifications(criterion='aic', **kwargs):
+    """
+    Return the chosen specification of each asset, as the arguments of arch_model (arch_model(returns,
+    **specifications()[ticker])), e.g. for adp.generator.ARCHGenerator. kwargs are passed to modelSelection.
+    :rtype: dict
+    """
+    best = bestSpecifications(modelSelection(**kwargs), criterion)
+    return {ticker: {'mean': row['mean'], 'vol': row.vol, 'dist': row.dist, 'p': int(row.p), 'q': int(row.q)}
+            for (ticker, row) in best.iterrows()}
 
-s = sorted([(v.aic, i) for (i, v) in fits.items()], reverse=True)
 
-for x in s:
-    print(x)
+if __name__ == '__main__':
+    print(bestSpecifications(modelSelection()).drop('params', axis=1))
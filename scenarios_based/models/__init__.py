@@ -1,6 +1,6 @@
 from .model import ScenariosBasedPortfolioModel
 from .risk import GMD, MAD, SemiMAD
-from .safety import CVaR, Minimax, VaR
+from .safety import CVaR, InteriorPointCVaR, Minimax, VaR
 
 
 
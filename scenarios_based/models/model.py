@@ -1,11 +1,25 @@
 from time import time
 
-from gurobipy import quicksum
+from gurobipy import GRB, GurobiError, LinExpr
 
-from data import A
+import data
 from entities.model import PortfolioOptimizer
 
 
+def constraint(expr, sense, rhs):
+    """
+    Return the constraint expr <sense> rhs (gurobipy.TempConstr), accepted by addConstr in any version of gurobipy.
+    :type sense: str - GRB.GREATER_EQUAL, GRB.LESS_EQUAL or GRB.EQUAL
+    """
+    if sense == GRB.GREATER_EQUAL:
+        return expr >= rhs
+    if sense == GRB.LESS_EQUAL:
+        return expr <= rhs
+    if sense == GRB.EQUAL:
+        return expr == rhs
+    raise ValueError("Unknown constraint sense {!r}".format(sense))
+
+
 class ScenariosBasedPortfolioModel(PortfolioOptimizer):
     """
     Overrides entities.portfolio.PortfolioOptimizer class. A scenarios_based portfolio model must have a list of possible scenarios
@@ -22,7 +36,9 @@ class ScenariosBasedPortfolioModel(PortfolioOptimizer):
         self._scenarios = scenarios
         self._probas = probas
         self._S = range(len(scenarios))
-        
+        # Basis of the last resolution, set by reconfigure to warm start the next one
+        self._basis = None
+
         # Call to PortfolioOptimizer constructor
         super().__init__(name, *args, **kwargs)
 
@@ -36,14 +52,50 @@ class ScenariosBasedPortfolioModel(PortfolioOptimizer):
         MuA = self._probas.dot(self._scenarios)
 
         # Mean return of the portfolio (gurobipy.LinExpr)
-        self._mu = quicksum(MuA[a] * self._W[a] for a in A)
+        self._mu = LinExpr(MuA.tolist(), self._W)
 
-        # Return in each scenario (gurobipy.LinExpr)
-        self._Y = [
-            quicksum(self._scenarios[s, a] * self._W[a] for a in A)
-            for s in self._S
+        # Return in each scenario (gurobipy.LinExpr), each one built at once from its row of the scenarios matrix
+        self._Y = [LinExpr(row, self._W) for row in self._scenarios.tolist()]
+
+    def addScenariosConstrs(self, X, terms=(), sense=GRB.GREATER_EQUAL, rhs=0.):
+        """
+        Adds one constraint per row s of the matrix X, built at once from its coefficients (instead of LinExpr
+        arithmetic):
+            X[s] . W + sum(c * v[s] for (c, v) in terms) <sense> rhs
+        :type X:     numpy.array - S x N coefficients of the weights
+        :type terms: iterable    - (coefficient, variables) pairs, the variables being a list (one per scenario) or a
+                                   single variable
+        :rtype: list
+        """
+        terms = [(c, v if isinstance(v, (list, tuple)) else [v] * len(X)) for (c, v) in terms]
+        coeffs = [c for (c, _) in terms]
+        return [
+            self.addConstr(constraint(LinExpr(row + coeffs, self._W + [v[s] for (_, v) in terms]), sense, rhs))
+            for (s, row) in enumerate(X.tolist())
         ]
 
+    def resizeScenariosVars(self, vars, **kwargs):
+        """
+        Adds or removes variables at the end of a list of variables indexed by the scenarios, so that there is one
+        variable per scenario. The kwargs are passed to addVar.
+        :type vars: list
+        :rtype: list
+        """
+        S = len(self._S)
+        if len(vars) > S:
+            self.remove(vars[S:])
+            return vars[:S]
+        return vars + [self.addVar(**kwargs) for s in range(len(vars), S)]
+
+    def getBasis(self):
+        """
+        Return the (VBasis, CBasis) of the last resolution, or None if it is not available (model not solved, or MIP).
+        """
+        try:
+            return self.getAttr('VBasis', self.getVars()), self.getAttr('CBasis', self.getConstrs())
+        except GurobiError:
+            return None
+
     def createConstrs(self):
         """Adds the base constraints of the Linear Model portfolio."""
         super().createConstrs()
@@ -51,15 +103,22 @@ class ScenariosBasedPortfolioModel(PortfolioOptimizer):
 
     def reconfigure(self, scenarios, probas):
         """
+        Stores the new scenarios and probas and updates the RRR constraint. The children replace their scenarios
+        constraints: the old ones are removed, and the new ones added one per scenario (see addScenariosConstrs), each
+        from its row of coefficients instead of changing them one by one with chgCoeff, so that the number of scenarios
+        can change. When it does not, the basis of the last resolution is kept to warm start the next one.
         :rtype: ScenariosBasedPortfolioModel
         """
+        self._basis = self.getBasis()
+
         # Stores the new scenarios and probas
         self._scenarios = scenarios
         self._probas = probas
+        self._S = range(len(scenarios))
 
         # Removes the internal LinExpr _mu and _Y (note: this is not 'useful', because in the following lines the
-        # constraints will be updated through the method chgCoeff, but this is only for sake of consistency, to avoid
-        # having internal data unconsistent with the constraints).
+        # constraints will be updated, but this is only for sake of consistency, to avoid having internal data
+        # unconsistent with the constraints).
         self._mu = None
         self._Y = None
 
@@ -69,8 +128,19 @@ class ScenariosBasedPortfolioModel(PortfolioOptimizer):
         if self._output:
             t = time()
             print("Updating RRR Constr")
-        [self.chgCoeff(self._RRRConstr, self._W[a], 252 * MuA[a]) for a in A]
+        [self.chgCoeff(self._RRRConstr, self._W[a], 252 * MuA[a]) for a in data.A]
         if self._output:
             print("\t{:.1f} s".format(time() - t))
 
-        return self
\ No newline at end of file
+        return self
+
+    def optimize(self):
+        """Extends PortfolioOptimizer.optimize to warm start from the basis kept by reconfigure."""
+        if self._basis is not None:
+            self.update()
+            (vbasis, cbasis), variables, constrs = self._basis, self.getVars(), self.getConstrs()
+            if len(vbasis) == len(variables) and len(cbasis) == len(constrs):
+                self.setAttr('VBasis', variables, vbasis)
+                self.setAttr('CBasis', constrs, cbasis)
+            self._basis = None
+        return super().optimize()
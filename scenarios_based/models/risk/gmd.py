@@ -1,11 +1,11 @@
-from gurobipy import quicksum
+from gurobipy import GRB, LinExpr
 from time import time
 
 import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
-from data import A, figsize
+from data import figsize
 from scenarios_based.models.model import ScenariosBasedPortfolioModel
 from generator import generateGaussianScenarios
 
@@ -13,58 +13,126 @@ from generator import generateGaussianScenarios
 class GMD(ScenariosBasedPortfolioModel):
     """
     Implements Gini's Mean Deviation minimization model. Extends ScenariosBasedPortfolioModel, which itself extends
-    gurobipy.Model.
+    gurobipy.Model. The GMD of the portfolio returns Y is
+        sum(p[s1] * p[s2] * |Y[s1] - Y[s2]| for s1 < s2)
+
+    Two formulations are available:
+        - pairwise: one variable and two constraints per pair of scenarios (S^2 / 2 variables);
+        - cuts:     the GMD is the maximum, over the orderings of the scenarios, of the linear functions
+                        sum(p[s1] * p[s2] * (Y[s2] - Y[s1]) for s1 before s2)
+                    (equality when the ordering sorts Y). A single variable G is minimized, and the cuts G >= ... of the
+                    orderings of the successive solutions are added until the GMD of the solution is G (Kelley's
+                    cutting-plane method, which is exact since the GMD is polyhedral). Each cut has N coefficients and
+                    costs a sort of the scenarios.
     """
-    def __init__(self, scenarios, probas, name='GMD', *args, **kwargs):
+    def __init__(self, scenarios, probas, name='GMD', cuts=False, tol=1e-6, *args, **kwargs):
+        """
+        :type cuts: bool  - Use the cutting-plane formulation instead of the pairwise one
+        :type tol:  float - Relative tolerance on the GMD of the cutting-plane formulation
+        """
+        self._cuts = cuts
+        self._tol = tol
         super().__init__(name, scenarios, probas, *args, **kwargs)
 
     def createVars(self):
         """Adds the variables specific to the GMD model."""
         super().createVars()
+        if self._cuts:
+            self._G = self.addVar(lb=0)
+        else:
+            self.createPairsVars()
+
+    def createPairsVars(self):
         self._D = {
             (s1, s2): self.addVar(lb=0)
             for s1 in self._S for s2 in self._S if s1 < s2
         }
 
     def createObjective(self):
-        self.setObjective(
-            2 * quicksum(
-                self._probas[s1] * self._probas[s2] * self._D[s1, s2] for s1, s2 in self._D
-            )
-        )
+        if self._cuts:
+            self.setObjective(self._G)
+        else:
+            s1, s2 = np.array(list(self._D)).T
+            self.setObjective(LinExpr((self._probas[s1] * self._probas[s2]).tolist(), list(self._D.values())))
 
     def createConstrs(self):
         super().createConstrs()
-        self._cstr = {
-            (s1, s2): self.addConstr(self._D[s1, s2] >= self._Y[s1] - self._Y[s2])
-            for s1, s2 in self._D
+        self.createScenariosConstrs()
+
+    def createScenariosConstrs(self):
+        if self._cuts:
+            # The cuts are added by optimize
+            self._cstr = []
+        else:
+            # D[s1, s2] >= |Y[s1] - Y[s2]|
+            s1, s2 = np.array(list(self._D)).T
+            X, D = self._scenarios[s1] - self._scenarios[s2], list(self._D.values())
+            self._cstr = self.addScenariosConstrs(-X, [(1, D)]) + self.addScenariosConstrs(X, [(1, D)])
+
+    @staticmethod
+    def giniCoefficients(Y, probas):
+        """
+        Return the coefficients c of the scenarios such that GMD(Y) = c . Y (c only depends on the ordering of Y).
+        Sorting Y increasingly, the scenario k has the coefficient p[k] * (P[< k] - P[> k]).
+        :type Y:      numpy.array - Returns in each scenario
+        :type probas: numpy.array - Probability of each scenario
+        :rtype: numpy.array
+        """
+        order = np.argsort(Y, kind='mergesort')
+        p = probas[order]
+        before = np.cumsum(p) - p
+        c = np.empty_like(p)
+        c[order] = p * (2 * before + p - p.sum())
+        return c
+
+    def addCut(self, c, scale=1.):
+        """
+        Adds the cut G >= (c . scenarios) . W, multiplied by scale (the GMD being small, the cuts are scaled so that the
+        feasibility tolerance of the solver is relative to the GMD).
+        """
+        coeffs = - scale * c.dot(self._scenarios)
+        self._cstr.append(
+            self.addConstr(LinExpr([scale] + coeffs.tolist(), [self._G] + self._W) >= 0)
+        )
 
-        }
+    def optimize(self):
+        """Extends ScenariosBasedPortfolioModel.optimize to add the cuts of the cutting-plane formulation."""
+        super().optimize()
+        # A violation below the feasibility tolerance would not cut the solution
+        tol = max(self._tol, self.Params.FeasibilityTol)
+        while self._cuts and self.status == GRB.OPTIMAL:
+            Y = self._scenarios.dot([w.x for w in self._W])
+            c = self.giniCoefficients(Y, self._probas)
+            gmd = c.dot(Y)
+            if gmd - self._G.x <= tol * gmd:
+                break
+            self.addCut(c, 1 / gmd)
+            super().optimize()
+        return self
 
     def reconfigure(self, scenarios, probas):
         """
         This function is here to avoid re-creating the model several time, to save the time to add the variables.
-        Updates the internal _scenarios and _probas, updates the internal LinExpr _Mu and _Y, and updates the
-        constraints coefficients.
+        Updates the internal _scenarios and _probas via parent and replaces the scenarios constraints (the pairs
+        variables too if the number of scenarios changes, the cuts of the cutting-plane formulation).
         """
+        S = len(self._S)
         # Calls ScenariosBasedPortfolioModel.reconfigure which reconfigures the RRR constraints, stores the new scenarios/probas
-        # updates the internal _mu and _Y
+        # and keeps the basis
         super().reconfigure(scenarios, probas)
 
         if self._output:
             t = time()
             print("Updating Constr")
-        for a in A:
-            for s1, s2 in self._D:
-                self.chgCoeff(self._cstr[s1, s2], self._W[a], - (scenarios[s1, a] - scenarios[s2, a]))
+        self.remove(self._cstr)
+        if not self._cuts and S != len(scenarios):
+            self.remove(list(self._D.values()))
+            self.createPairsVars()
+        self.createScenariosConstrs()
         if self._output:
             print("\t{:.2f} s".format(time() - t))
             print("Updating objective")
-        self.setObjective(
-            2 * quicksum(
-                probas[s1] * probas[s2] * self._D[s1, s2] for s1, s2 in self._D
-            )
-        )
+        self.createObjective()
         if self._output:
             print("\t{:.2f} s".format(time() - t))
 
@@ -1,10 +1,10 @@
-from gurobipy import quicksum
+from gurobipy import LinExpr
 from time import time
 
 import numpy as np
 from matplotlib import pyplot as plt
 
-from data import A, figsize
+from data import figsize
 from scenarios_based.models.model import ScenariosBasedPortfolioModel
 
 
@@ -23,46 +23,37 @@ class MAD(ScenariosBasedPortfolioModel):
         self._D = [self.addVar(lb=0) for s in self._S]
 
     def createObjective(self):
-        self.setObjective(
-            quicksum(self._probas[s] * self._D[s] for s in self._S)
-        )
+        self.setObjective(LinExpr(self._probas.tolist(), self._D))
 
     def createConstrs(self):
         super().createConstrs()
-        self._cstr1 = [
-            self.addConstr(self._D[s] >= self._Y[s] - self._mu)
-            for s in self._S
-        ]
-        self._cstr2 = [
-            self.addConstr(self._D[s] >= - (self._Y[s] - self._mu))
-            for s in self._S
-        ]
+        self.createScenariosConstrs()
+
+    def createScenariosConstrs(self):
+        # Deviations of the scenarios from the mean: D[s] >= Y[s] - mu and D[s] >= - (Y[s] - mu)
+        deviations = self._scenarios - self._probas.dot(self._scenarios)
+        self._cstr1 = self.addScenariosConstrs(-deviations, [(1, self._D)])
+        self._cstr2 = self.addScenariosConstrs(deviations, [(1, self._D)])
 
     def reconfigure(self, scenarios, probas):
         """
         This function is here to avoid re-creating the model several time, to save the time to add the variables.
-        Updates the internal _scenarios and _probas via parent and updates the constraints coefficients.
+        Updates the internal _scenarios and _probas via parent and replaces the block of scenarios constraints.
         """
         # Calls ScenariosBasedPortfolioModel.reconfigure which reconfigures the RRR constraints, stores the new scenarios/probas
-        # updates the internal _mu and _Y
+        # and keeps the basis
         super().reconfigure(scenarios, probas)
 
-        S = range(len(scenarios))
-        MuA = probas.dot(scenarios)
-
         if self._output:
             t = time()
             print("Updating Constraints")
-        for s in S:
-            for a in A:
-                self.chgCoeff(self._cstr1[s], self._W[a], - (scenarios[s, a] - MuA[a]))
-                self.chgCoeff(self._cstr2[s], self._W[a], scenarios[s, a] - MuA[a])
+        self._D = self.resizeScenariosVars(self._D, lb=0)
+        self.remove(self._cstr1 + self._cstr2)
+        self.createScenariosConstrs()
         if self._output:
             print("\t{:.1f} s".format(time() - t))
             print("Updating objective")
-        self.setObjective(
-            quicksum(probas[s] * self._D[s] for s in S)
-        )
+        self.createObjective()
         if self._output:
             print("\t{:.1f} s".format(time() - t))
 
@@ -1,3 +1,4 @@
 from .var import VaR
 from .minimax import Minimax
 from .cvar import CVaR
+from .interior_point import InteriorPointCVaR
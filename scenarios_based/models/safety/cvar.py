@@ -1,11 +1,11 @@
-from gurobipy import GRB, quicksum
+from gurobipy import GRB, LinExpr
 from time import time
 
 import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
-from data import figsize, A
+from data import figsize
 from scenarios_based.models.model import ScenariosBasedPortfolioModel
 from generator import generateGaussianScenarios
 
@@ -29,34 +29,39 @@ class CVaR(ScenariosBasedPortfolioModel):
 
     def createObjective(self):
         self.setObjective(
-            self._eta - quicksum(self._probas[s] * self._d[s] for s in self._S) / self._beta,
+            LinExpr([1.] + (- self._probas / self._beta).tolist(), [self._eta] + self._d),
             GRB.MAXIMIZE
         )
 
     def createConstrs(self):
         super().createConstrs()
-        self._cstr = [
-            self.addConstr(
-                self._d[s] >= self._eta - self._Y[s]
-            ) for s in self._S
-        ]
+        self.createScenariosConstrs()
+
+    def createScenariosConstrs(self):
+        # d[s] >= eta - Y[s]
+        self._cstr = self.addScenariosConstrs(self._scenarios, [(1, self._d), (-1, self._eta)])
 
     def reconfigure(self, scenarios, probas):
+        """
+        This function is here to avoid re-creating the model several time, to save the time to add the variables.
+        Updates the internal _scenarios and _probas via parent and replaces the block of scenarios constraints.
+        """
+        # Calls ScenariosBasedPortfolioModel.reconfigure which reconfigures the RRR constraints, stores the new scenarios/probas
+        # and keeps the basis
         super().reconfigure(scenarios, probas)
-        S = range(len(scenarios))
 
         if self._output:
             t = time()
             print("Updating Constr")
-        for s in S:
-            for a in A:
-                self.chgCoeff(self._cstr[s], self._W[a], scenarios[s, a])
+        self._d = self.resizeScenariosVars(self._d, lb=0)
+        self.remove(self._cstr)
+        self.createScenariosConstrs()
         if self._output:
             print("\t{:.1f} s".format(time() - t))
             print("Updating objective")
+        self.createObjective()
         if self._output:
             print("\t{:.1f} s".format(time() - t))
-        self.createObjective()
         return self
 
     def plot(self):
@@ -0,0 +1,213 @@
+import warnings
+
+import numpy as np
+
+import data
+from entities.portfolio import EquallyWeightedPortfolio, Portfolio
+
+
+def projectBudget(w, Wmax):
+    """
+    Euclidean projection of w onto the budget constraints {sum(W) = 1, 0 <= W <= Wmax} (with len(w) * Wmax >= 1), i.e.
+    clip(w - tau, 0, Wmax), the shift tau being found by bisection.
+    :rtype: numpy.array
+    """
+    lo, hi = w.min() - Wmax, w.max()
+    for _ in range(100):
+        tau = (lo + hi) / 2
+        if np.clip(w - tau, 0, Wmax).sum() > 1:
+            lo = tau
+        else:
+            hi = tau
+    return np.clip(w - (lo + hi) / 2, 0, Wmax)
+
+
+def portfolioCVaR(returns, probas, beta):
+    """
+    Return the beta-CVaR of the portfolio returns, max_eta eta - sum(p[s] * max(eta - Y[s], 0)) / beta, the max being
+    reached at the beta-quantile of the returns.
+    :rtype: float
+    """
+    order = np.argsort(returns)
+    eta = returns[order[min(np.searchsorted(np.cumsum(probas[order]), beta), len(order) - 1)]]
+    return eta - probas.dot(np.maximum(eta - returns, 0)) / beta
+
+
+class InteriorPointCVaR(object):
+    """
+    Solver-free equivalent of CVaR, with the same interface as a PortfolioOptimizer (without Nmax and Wmin, which need
+    binary variables): maximizes the beta-CVaR of the portfolio returns Y = scenarios . W
+        max  eta - sum(p[s] * d[s]) / beta
+        s.t. d[s] >= eta - Y[s],  d >= 0,  sum(W) = 1,  0 <= W <= Wmax,  252 * mu . W >= RRR
+    with a primal-dual interior point method (Mehrotra's predictor-corrector).
+
+    The S auxiliary variables d are eliminated from each Newton system, which reduces to a dense (N+2) x (N+2) system:
+    an iteration costs O(S N^2) operations and O(S) memory (on top of the scenarios), and 20 to 30 iterations are
+    enough to solve the LP to the tolerance, whatever S.
+    """
+
+    def __init__(self, scenarios, probas, beta=0.1, name='CVaR', output=False, RRR=0.09, Nmax=None, Wmin=None, Wmax=1,
+                 tol=1e-9, maxiter=100):
+        """
+        :type scenarios: numpy.array - Return of each stock in each scenario
+        :type probas:    numpy.array - Probability of each scenario
+        :type beta:      float       - Level of the CVaR
+        :type tol:       float       - Tolerance on the (relative) residuals and duality gap
+        :type maxiter:   int         - Max number of iterations
+        """
+        if Nmax is not None or Wmin is not None:
+            raise ValueError("InteriorPointCVaR cannot limit the number of stocks (Nmax, Wmin), use CVaR instead")
+        self.ModelName = '{:s}{:s}'.format(name, ', Wmax = {:.1%}'.format(Wmax) if Wmax < 1 else '')
+        self._beta = beta
+        self._output = output
+        self._RRR = RRR
+        self._Wmax = Wmax
+        self._tol = tol
+        self._maxiter = maxiter
+        self.reconfigure(scenarios, probas)
+
+    def update(self):
+        return self
+
+    def reconfigure(self, scenarios, probas):
+        """
+        :rtype: InteriorPointCVaR
+        """
+        self._scenarios = scenarios
+        self._probas = probas
+        self._w = None
+        self.objval = None
+        self.status = None
+        return self
+
+    @property
+    def objVal(self):
+        return self.objval
+
+    def feasible(self):
+        """Checks that the RRR can be reached: the best mean return is obtained by investing Wmax in the best stocks."""
+        N, Wmax = len(self._scenarios[0]), self._Wmax
+        if N * Wmax < 1:
+            return False
+        mu = np.sort(252 * self._probas.dot(self._scenarios))[::-1]
+        return mu.dot(np.diff(np.minimum(np.arange(N + 1) * Wmax, 1))) >= self._RRR
+
+    def optimize(self):
+        """
+        Solves the CVaR LP. The inequality constraints are, in this order, with their slacks s and duals z:
+            (1) Y - eta + d >= 0,  (2) d >= 0,  (3) W >= 0,  (4) Wmax - W >= 0,  (5) mu . W - RRR >= 0
+        :rtype: InteriorPointCVaR
+        """
+        if not self.feasible():
+            self.status = 'infeasible'
+            if self._output:
+                print("RRR of {:.1%} unreachable, E.W. portfolio generated".format(self._RRR))
+            return self
+
+        S, N = self._scenarios.shape
+        Wmax = self._Wmax
+        # The problem is scaled so that the returns have a unit std
+        scale = self._scenarios.std() or 1.
+        R = self._scenarios / scale
+        mu = 252 * self._probas.dot(R)
+        r = self._RRR / scale
+        c = self._probas / self._beta
+
+        def G(w, eta, d):
+            """Left-hand side of the inequality constraints"""
+            return [R.dot(w) - eta + d, d, w, - w, np.array([mu.dot(w)])]
+
+        h = [0., 0., 0., - Wmax, r]
+
+        # Infeasible starting point
+        w = np.full(N, 1. / N)
+        eta = np.percentile(R.dot(w), 100 * self._beta)
+        d = np.maximum(eta - R.dot(w), 0) + 1
+        s = [np.maximum(g - hi, 1.) for g, hi in zip(G(w, eta, d), h)]
+        z = [c / 2 + 1, c / 2 + 1, np.ones(N), np.ones(N), np.ones(1)]
+        y = 0.
+        n = 2 * S + 2 * N + 1
+
+        self.status = 'optimal'
+
+        for self.iterations in range(self._maxiter):
+            # Residuals of the dual (w, eta, d), primal and equality constraints
+            rw = - (z[0].dot(R) + z[2] - z[3] + mu * z[4][0]) - y
+            reta = z[0].sum() - 1
+            rd = c - z[0] - z[1]
+            rp = [g - hi - si for g, hi, si in zip(G(w, eta, d), h, s)]
+            req = 1 - w.sum()
+            gap = sum(si.dot(zi) for si, zi in zip(s, z))
+            obj = c.dot(d) - eta
+
+            pinf = max(np.abs(ri).max() for ri in rp + [np.array([req])])
+            dinf = max(np.abs(rw).max(), abs(reta), np.abs(rd).max())
+            if self._output:
+                print("{:d}\t{:.6e}\t{:.1e}\t{:.1e}\t{:.1e}".format(self.iterations, - obj * scale, pinf, dinf, gap))
+            if pinf < self._tol and dinf < self._tol and gap < self._tol * (1 + abs(obj)):
+                break
+
+            D = [zi / si for si, zi in zip(s, z)]
+            # Schur complement of the d block in the reduced system, in the variables (w, eta, y)
+            Dd = D[0] * D[1] / (D[0] + D[1])
+            RD = R.T * Dd
+            M = np.zeros((N + 2, N + 2))
+            M[:N, :N] = RD.dot(R) + np.diag(D[2] + D[3]) + D[4][0] * np.outer(mu, mu)
+            M[:N, N] = M[N, :N] = - RD.sum(axis=1)
+            M[N, N] = Dd.sum()
+            M[:N, N + 1] = -1
+            M[N + 1, :N] = 1
+
+            def direction(comp):
+                """Newton direction for the complementarity right-hand side comp (s z = comp)."""
+                rho = [ci / si - Di * ri for ci, si, Di, ri in zip(comp, s, D, rp)]
+                hw = rho[0].dot(R) + rho[2] - rho[3] + mu * rho[4][0] - rw
+                he = - rho[0].sum() - reta
+                hd = rho[0] + rho[1] - rd
+                q = D[0] * hd / (D[0] + D[1])
+                sol = np.linalg.solve(M, np.concatenate((hw - q.dot(R), (he + q.sum(), req))))
+                dw, de, dy = sol[:N], sol[N], sol[N + 1]
+                dd = (hd - D[0] * (R.dot(dw) - de)) / (D[0] + D[1])
+                ds = [g + ri for g, ri in zip(G(dw, de, dd), rp)]
+                dz = [(ci - zi * dsi) / si for ci, si, zi, dsi in zip(comp, s, z, ds)]
+                return dw, de, dd, dy, ds, dz
+
+            def step(v, dv):
+                """Max step in [0, 1] keeping the v + step * dv nonnegative"""
+                return min([1.] + [(- vi[dvi < 0] / dvi[dvi < 0]).min() for vi, dvi in zip(v, dv) if (dvi < 0).any()])
+
+            # Predictor (affine scaling direction), then corrector
+            _, _, _, _, ds, dz = direction([- si * zi for si, zi in zip(s, z)])
+            ap, ad = step(s, ds), step(z, dz)
+            gapAff = sum((si + ap * dsi).dot(zi + ad * dzi) for si, dsi, zi, dzi in zip(s, ds, z, dz))
+            sigma = (gapAff / gap) ** 3
+            comp = [sigma * gap / n - si * zi - dsi * dzi for si, zi, dsi, dzi in zip(s, z, ds, dz)]
+            dw, de, dd, dy, ds, dz = direction(comp)
+            ap, ad = 0.99 * step(s, ds), 0.99 * step(z, dz)
+
+            w, eta, d = w + ap * dw, eta + ap * de, d + ap * dd
+            s = [si + ap * dsi for si, dsi in zip(s, ds)]
+            z = [zi + ad * dzi for zi, dzi in zip(z, dz)]
+            y += ad * dy
+        else:
+            self.status = 'iteration limit'
+
+        # The iterates are only feasible at the tolerance (or not at all on 'iteration limit'): the objective value is
+        # the one of the projected portfolio
+        self._w = projectBudget(w, Wmax)
+        self.objval = portfolioCVaR(self._scenarios.dot(self._w), self._probas, self._beta)
+        if self.status == 'iteration limit':
+            warnings.warn("InteriorPointCVaR stopped after {:d} iterations, the portfolio is not optimal and its mean "
+                          "return is {:.1%} (RRR of {:.1%})".format(self._maxiter, 252 * self._probas.dot(
+                              self._scenarios.dot(self._w)), self._RRR), RuntimeWarning)
+        return self
+
+    def getPortfolio(self):
+        """
+        Return an object Portfolio generated from the result of the algorithm. Must be used after 'optimize'.
+        :rtype Portfolio
+        """
+        if self._w is None:
+            # If the model is infeasible, we return an equally-weighted portfolio.
+            return EquallyWeightedPortfolio()
+        return Portfolio(data=self._w, index=data.Data.columns, name=self.ModelName)
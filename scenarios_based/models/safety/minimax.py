@@ -3,7 +3,6 @@ from time import time
 
 from matplotlib import pyplot as plt
 
-from data import A
 from scenarios_based.models.model import ScenariosBasedPortfolioModel
 from generator import generateGaussianScenarios
 
@@ -24,27 +23,26 @@ class Minimax(ScenariosBasedPortfolioModel):
 
     def createConstrs(self):
         super().createConstrs()
-        self._cstr = [
-            self.addConstr(self._Y[s] >= self._My)
-            for s in self._S
-        ]
+        self.createScenariosConstrs()
+
+    def createScenariosConstrs(self):
+        # Y[s] >= My
+        self._cstr = self.addScenariosConstrs(self._scenarios, [(-1, self._My)])
 
     def reconfigure(self, scenarios, probas):
         """
         This function is here to avoid re-creating the model several time, to save the time to add the variables.
-        Updates the internal _scenarios and _probas, updates the internal LinExpr _Mu and _Y, and updates the
-        constraints coefficients.
+        Updates the internal _scenarios and _probas via parent and replaces the block of scenarios constraints.
         """
         # Calls ScenariosBasedPortfolioModel.reconfigure which reconfigures the RRR constraints, stores the new scenarios/probas
-        # updates the internal _mu and _Y
+        # and keeps the basis
         super().reconfigure(scenarios, probas)
 
         if self._output:
             t = time()
             print("Updating Constr")
-        for a in A:
-            for s in self._S:
-                self.chgCoeff(self._cstr[s], self._W[a], scenarios[s, a])
+        self.remove(self._cstr)
+        self.createScenariosConstrs()
         if self._output:
             print("\t{:.2f} s".format(time() - t))
 
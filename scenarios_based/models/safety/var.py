@@ -1,9 +1,8 @@
-from gurobipy import GRB, quicksum
+from gurobipy import GRB, LinExpr
 from time import time
 
 from matplotlib import pyplot as plt
 
-from data import A
 from scenarios_based.models.model import ScenariosBasedPortfolioModel
 
 
@@ -27,41 +26,32 @@ class VaR(ScenariosBasedPortfolioModel):
 
     def createConstrs(self):
         super().createConstrs()
+        self.createScenariosConstrs()
+
+    def createScenariosConstrs(self):
         eps = self._probas.min() / 10
         M = 1
-        self._cstr1 = [
-            self.addConstr(
-                self._Y[s] >= self._My - M * self._Z[s]
-            ) for s in self._S
-        ]
+        # Y[s] >= My - M * Z[s]
+        self._cstr1 = self.addScenariosConstrs(self._scenarios, [(-1, self._My), (M, self._Z)])
         self._cstr2 = self.addConstr(
-            quicksum(self._probas[s] * self._Z[s] for s in self._S) <= self._beta - eps
+            LinExpr(self._probas.tolist(), self._Z) <= self._beta - eps
         )
 
     def reconfigure(self, scenarios, probas):
         """
         This function is here to avoid re-creating the model several time, to save the time to add the variables.
-        Updates the internal _scenarios and _probas, updates the internal LinExpr _Mu and _Y, and updates the
-        constraints coefficients.
+        Updates the internal _scenarios and _probas via parent and replaces the block of scenarios constraints.
         """
         # Calls ScenariosBasedPortfolioModel.reconfigure which reconfigures the RRR constraints, stores the new scenarios/probas
-        # updates the internal _mu and _Y
+        # and keeps the basis
         super().reconfigure(scenarios, probas)
 
         if self._output:
             t = time()
-            print("Updating Constraints 1")
-        for a in A:
-            for s in self._S:
-                self.chgCoeff(self._cstr1[s], self._W[a], scenarios[s, a])
-        if self._output:
-            print("\t{:.2f} s".format(time() - t))
-            t = time()
-            print("Updating Constraint 2")
-        for s in self._S:
-            self.chgCoeff(self._cstr2, self._Z[s], probas[s])
-        eps = probas.min() / 10
-        self._cstr2.rhs = self._beta - eps
+            print("Updating Constraints")
+        self._Z = self.resizeScenariosVars(self._Z, vtype=GRB.BINARY)
+        self.remove(self._cstr1 + [self._cstr2])
+        self.createScenariosConstrs()
         if self._output:
             print("\t{:.2f} s".format(time() - t))
 
@@ -8,22 +8,23 @@ from data import figsize
 from entities import PortfolioGroup
 from markowitz import Markowitz
 from scenarios_based.models import *
-from scenarios import generateGaussianScenarios
+from generator import generateGaussianScenarios
 
 
-def WeightsStdErr(model, N=100, M=100):
+def WeightsStdErr(model, N=100, M=100, **kwargs):
     """
     Computes the standard error of the model: generates M times the model with N scenarios, and returns the MAX of the
     standard errors of the weights of the output portfolios.
     :type model: PortfolioOptimizer
     :type M:        int - Number of samples
     :type N:        int - Sample size
+    :param kwargs:  Sampling options of generateGaussianScenarios (qmc, antithetic)
     """
     objvals = []
-    s, p = generateGaussianScenarios(N)
+    s, p = generateGaussianScenarios(N, **kwargs)
     m = model(s, p).update()
     for i in range(M):
-        s, p = generateGaussianScenarios(N)
+        s, p = generateGaussianScenarios(N, **kwargs)
         m.reconfigure(s, p).optimize()
         try:
             objvals.append(m.objval)
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Version of the on-disk format, stored in the metadata of each store
+FORMAT_VERSION = 1
+
+
+class PriceStore(object):
+    """
+    Columnar on-disk store of the prices: a directory with a 'meta.json' (format version, tickers, date of the last
+    update), the shared date index 'dates.npy' and one float64 array '<ticker>.npy' per ticker. The arrays are
+    memory-mapped, so that loading a window or a few tickers only reads these rows and columns from the disk.
+    """
+
+    def __init__(self, path):
+        """
+        :type path: str - Directory of the store
+        """
+        self.path = path
+        try:
+            with open(os.path.join(path, 'meta.json')) as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            raise FileNotFoundError("No price store in {:s}".format(path))
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError("Price store {:s} has format version {:d}, expected {:d}".format(path, meta['version'],
+                                                                                              FORMAT_VERSION))
+        self.tickers = meta['tickers']
+        self.updated = meta.get('updated')
+        self.index = pd.DatetimeIndex(np.load(os.path.join(path, 'dates.npy')))
+        self._columns = {}
+
+    def __repr__(self):
+        return "<PriceStore {:s}: {:d} tickers, {:s} to {:s}>".format(self.path, len(self.tickers),
+                                                                     str(self.index[0].date()),
+                                                                     str(self.index[-1].date()))
+
+    @staticmethod
+    def write(data, path, updated=None):
+        """
+        Writes the prices data (dates x tickers) in a new store, which replaces the existing one at once.
+        :type data:    pandas.DataFrame
+        :type updated: str - Date of the last update of the data (ISO format), if known
+        :rtype: PriceStore
+        """
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, 'dates.npy'), data.index.values.astype('datetime64[ns]'))
+        for ticker in data.columns:
+            np.save(os.path.join(tmp, '{:s}.npy'.format(ticker)), data[ticker].values.astype(np.float64))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as file:
+            json.dump({'version': FORMAT_VERSION, 'tickers': list(data.columns), 'updated': updated}, file)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return PriceStore(path)
+
+    def column(self, ticker):
+        """
+        Return the (memory-mapped) prices of a ticker.
+        :rtype: numpy.memmap
+        """
+        if ticker not in self._columns:
+            if ticker not in self.tickers:
+                raise KeyError(ticker)
+            self._columns[ticker] = np.load(os.path.join(self.path, '{:s}.npy'.format(ticker)), mmap_mode='r')
+        return self._columns[ticker]
+
+    def rows(self, tickers, rows):
+        """Return the prices of the tickers at the rows (slice or array of positions) of the index, as a 2D array."""
+        return np.column_stack([self.column(ticker)[rows] for ticker in tickers])
+
+    def prices(self, tickers=None, start=None, end=None):
+        """
+        Return the prices of the tickers (default: all) on the period [start, end], i.e. the same as Data[start:end].
+        :rtype: pandas.DataFrame
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        dates = self.index.slice_indexer(start, end)
+        return pd.DataFrame(self.rows(tickers, dates), index=self.index[dates], columns=tickers)
+
+    def gross(self, tickers=None, start=None, end=None, freq=None):
+        """
+        Return the gross returns of the tickers (default: all) at the dates of [start, end], at the frequency freq
+        (default: the one of the store), i.e. the same as
+            (Data.asfreq(freq, method='pad').pct_change() + 1)[1:][start:end]
+        The prices are only read at these dates and at the previous one.
+        :type freq: string | pandas.DateOffset
+        :rtype: pandas.DataFrame
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        if freq is None:
+            index = self.index
+            positions = np.arange(len(index))
+        else:
+            index = pd.date_range(self.index[0], self.index[-1], freq=freq)
+            # Last quotation at or before each date (method='pad')
+            positions = self.index.searchsorted(index, side='right') - 1
+        dates = index[1:].slice_indexer(start, end)
+        rows = positions[dates.start:dates.stop + 1]
+        prices = self.rows(tickers, rows)
+        return pd.DataFrame(prices[1:] / prices[:-1], index=index[1:][dates], columns=tickers)
@@ -1,12 +1,41 @@
+import os
+import pickle
+import tempfile
 import unittest
+from unittest import mock
 from abc import ABCMeta, abstractmethod
+from math import gamma, pi
 from random import randint
 
-from data import A, MeanReturns
+import numpy as np
+import pandas as pd
+
+import data
+from adp.cvar import IncrementalCVaR, generateΔCVaR
+from adp.generator import ARCHGenerator, GaussianGenerator, OGARCHGenerator, defaultSpecification, fitGARCH, \
+    loadScenarios
+from adp.pwladp.inspection import PWLADPInspectionModel
+from adp.pwladp.model import PWLADPModel, gurobiModel
+from adp.pwladp.sweep import TrainingJob
+from adp.pwladp.trainer import ADPStrategyTrainer, TrainingMemory
+from adp import value_function
+from adp.strategy import ADPStrategy, bootstrap
+from adp.value_function import PWLCompactFunction, PWLDynamicFunction, PWLFixedFunction, PackedValueFunction, \
+    SeparableValueFunction
+from backtest.backtest import BackTest, BackTestGroup, BackTestParamPool
+from data import Dataset, use
 from entities.portfolio import Portfolio
-from generator import generateGaussianScenarios, generateStudentTScenarios
+from entities.security import Downloader, Provider
+from generator import MultivariateT, RollingMoments, WindowMoments, generateGaussianScenarios, \
+    generateStudentTScenarios, kernel_density_estimator, windowMoments
 from markowitz import Markowitz
-from scenarios_based.models import CVaR, GMD, MAD, Minimax, SemiMAD, VaR
+from parameters import T, perf_dir_name
+from reduction import ReducedGenerator, forwardSelection, kMeansReduction, reductionError
+from sampling import halton, normalPpf, standardNormal
+from scenarios.garch import bestSpecifications, grid, modelSelection, specifications
+from scenarios_based.models import CVaR, GMD, InteriorPointCVaR, MAD, Minimax, SemiMAD, VaR
+from scenarios_based.models.safety.interior_point import projectBudget
+from store import PriceStore
 
 
 class TestCaseWrapper(object):
@@ -47,7 +76,7 @@ class TestCaseWrapper(object):
                 m.optimize().objval,
                 float
             )
-            for a in A:
+            for a in data.A:
                 if m._X[a].x > 0.5:
                     self.assertGreaterEqual(m._W[a].x, Wmin - 1e-7)
 
@@ -55,7 +84,7 @@ class TestCaseWrapper(object):
             Wmax = 0.1
             m = self.createModel(Wmax=Wmax)
             self.assertIsInstance(m.optimize().objval, float)
-            for a in A:
+            for a in data.A:
                 self.assertLessEqual(m._W[a].x, Wmax)
 
         def test_Nmax(self):
@@ -63,7 +92,7 @@ class TestCaseWrapper(object):
             m = self.createModel(Nmax=Nmax)
             self.assertIsInstance(m.optimize().objval, float)
             nbAssets = 0
-            for a in A:
+            for a in data.A:
                 if m._W[a].x > 1e-7:
                     nbAssets += 1
             self.assertLessEqual(nbAssets, Nmax)
@@ -94,6 +123,16 @@ class TestCaseWrapper(object):
                 self.Model(s2, p2).optimize().objval
             )
 
+        def test_reconfigure_size(self):
+            """Checks that the model can be reconfigured with a different number of scenarios."""
+            s, p = self.scenarios, self.probas
+            for S in (len(p) // 2, 2 * len(p)):
+                s2, p2 = generateGaussianScenarios(S, seed=self.seed + S)
+                self.assertAlmostEqual(
+                    self.Model(s, p).optimize().reconfigure(s2, p2).optimize().objval,
+                    self.Model(s2, p2).optimize().objval
+                )
+
     class GeneratorBaseTestCase(unittest.TestCase):
         """
         This class should be overriden by all the plot_test cases of generators. Tests the scenarios generators over the
@@ -110,13 +149,19 @@ class TestCaseWrapper(object):
         def test_shape(self):
             N = randint(1000, 100000)
             scenarios, probas = self.generator(N)
-            self.assertEqual(scenarios.shape, (N, len(A)))
+            self.assertEqual(scenarios.shape, (N, data.N))
             self.assertEqual(probas.shape, (N,))
 
+        def test_seed(self):
+            """Checks that a seed gives the same scenarios, without changing the global random state of numpy."""
+            state = np.random.get_state()
+            np.testing.assert_array_equal(self.generator(100, seed=1)[0], self.generator(100, seed=1)[0])
+            np.testing.assert_array_equal(np.random.get_state()[1], state[1])
+
         def test_mean(self):
             N = 1000000
             s, p = self.generator(N)
-            self.assertAlmostEqual((s.mean(axis=0) * 252 - MeanReturns).mean(), 0, delta=0.1)
+            self.assertAlmostEqual((s.mean(axis=0) * 252 - data.MeanReturns).mean(), 0, delta=0.1)
 
 
 class TestMAD(TestCaseWrapper.ScenariosBasedModelBaseTestCase):
@@ -140,6 +185,25 @@ class TestGMD(TestCaseWrapper.ScenariosBasedModelBaseTestCase):
         return GMD
 
 
+class GMDCutsTestCase(unittest.TestCase):
+
+    def test_same_output(self):
+        """Checks that the cutting-plane formulation gives the same GMD as the pairwise one."""
+        for seed in range(3):
+            s, p = generateGaussianScenarios(50, seed=seed)
+            self.assertAlmostEqual(
+                GMD(s, p, cuts=True).optimize().objval / GMD(s, p).optimize().objval, 1, places=5
+            )
+
+    def test_reconfigure(self):
+        s, p = generateGaussianScenarios(50, seed=0)
+        s2, p2 = generateGaussianScenarios(80, seed=1)
+        self.assertAlmostEqual(
+            GMD(s, p, cuts=True).optimize().reconfigure(s2, p2).optimize().objval / GMD(s2, p2).optimize().objval, 1,
+            places=5
+        )
+
+
 class TestMinimax(TestCaseWrapper.ScenariosBasedModelBaseTestCase):
 
     @property
@@ -161,6 +225,49 @@ class TestCVaR(TestCaseWrapper.ScenariosBasedModelBaseTestCase):
         return CVaR
 
 
+class InteriorPointCVaRTestCase(unittest.TestCase):
+
+    def test_same_output(self):
+        """Checks that the interior point method gives the same CVaR as the Gurobi model."""
+        s, p = generateGaussianScenarios(500, seed=0)
+        for kwargs in ({}, {'Wmax': 0.2}, {'RRR': 0.15}):
+            self.assertAlmostEqual(
+                InteriorPointCVaR(s, p, **kwargs).optimize().objval,
+                CVaR(s, p, **kwargs).optimize().objval
+            )
+
+    def test_iteration_limit(self):
+        """
+        Checks that stopping the iterations early warns, and that the portfolio still satisfies the budget constraints,
+        with the objective value of this portfolio.
+        """
+        s, p = generateGaussianScenarios(500, seed=0)
+        for Wmax in (1, 0.2):
+            with self.assertWarns(RuntimeWarning):
+                m = InteriorPointCVaR(s, p, Wmax=Wmax, maxiter=2).optimize()
+            self.assertEqual(m.status, 'iteration limit')
+            w = m.getPortfolio()
+            self.assertAlmostEqual(w.sum(), 1, places=12)
+            self.assertGreaterEqual(w.min(), 0)
+            self.assertLessEqual(w.max(), Wmax)
+            Y = np.sort(s.dot(w.values))
+            self.assertAlmostEqual(m.objval, Y[:int(0.1 * len(Y))].mean())
+
+    def test_project_budget(self):
+        """Checks that the projection is feasible, and optimal: W = clip(w - tau, 0, Wmax) for a single shift tau."""
+        rd = np.random.RandomState(0)
+        for Wmax in (1, 0.3):
+            w = rd.normal(0.1, 0.4, 10)
+            W = projectBudget(w, Wmax)
+            self.assertAlmostEqual(W.sum(), 1, places=12)
+            self.assertTrue(((W >= 0) & (W <= Wmax)).all())
+            free = (W > 0) & (W < Wmax)
+            tau = (w - W)[free].mean()
+            np.testing.assert_allclose((w - W)[free], tau, atol=1e-12)
+            self.assertTrue((w[W == 0] <= tau + 1e-12).all())
+            self.assertTrue((w[W == Wmax] - Wmax >= tau - 1e-12).all())
+
+
 class TestMarkowitz(TestCaseWrapper.ModelBaseTestCase):
 
     @property
@@ -194,6 +301,624 @@ class StudentGeneratorTestCase(TestCaseWrapper.GeneratorBaseTestCase):
         return generateStudentTScenarios
 
 
+class GenerateBatchTestCase(unittest.TestCase):
+
+    def test_streaming(self):
+        """Checks that the scenarios streamed to a file by chunks are the ones generated at once, memory-mapped."""
+        generator = GaussianGenerator(r=0.001)
+        generator.chunk = 7
+        np.random.seed(0)
+        scenarios = generator.generate_batch(20, 5)
+        self.assertEqual(scenarios.shape, (20, 5, data.N + 1))
+        with tempfile.TemporaryDirectory() as path:
+            np.random.seed(0)
+            generator.generate_batch(20, 5, filename=os.path.join(path, 'scenarios.npy'))
+            streamed = loadScenarios(os.path.join(path, 'scenarios.npy'))
+            self.assertIsInstance(streamed, np.memmap)
+            np.testing.assert_array_equal(streamed, scenarios)
+            del streamed
+
+
+class OGARCHGeneratorTestCase(unittest.TestCase):
+
+    def test_fit(self):
+        """Checks that the parameters of a simulated GARCH(1,1) series are recovered."""
+        rng = np.random.RandomState(1)
+        omega, alpha, beta = 5e-7, 0.1, 0.85
+        x, h = np.empty(2000), 1e-5
+        for t in range(len(x)):
+            x[t] = np.sqrt(h) * rng.standard_normal()
+            h = omega + alpha * x[t] ** 2 + beta * h
+        _, a, b, _ = fitGARCH(x)
+        self.assertAlmostEqual(a, alpha, delta=0.05)
+        self.assertAlmostEqual(b, beta, delta=0.05)
+
+    def test_paths(self):
+        """Checks the shape of the paths, and that they keep the mean of the log gross returns."""
+        generator = OGARCHGenerator(0.001)
+        paths = generator.generate_batch(2000, 10)
+        self.assertEqual(paths.shape, (2000, 10, data.N + 1))
+        np.testing.assert_allclose(paths[:, :, 0], 1.001)
+        LogGross = np.log(paths[:, :, 1:]).reshape(-1, data.N)
+        np.testing.assert_allclose(LogGross.mean(axis=0), generator.mean, atol=5 * LogGross.std(axis=0).max() / 100)
+
+
+class ARCHGeneratorTestCase(unittest.TestCase):
+
+    def test_specifications(self):
+        """Checks that the generator fits the chosen specification of each asset, and the shape of its paths."""
+        returns = 100 * np.log(data.Data / data.Data.shift())[1:].iloc[-500:, :2]
+        with tempfile.TemporaryDirectory() as path:
+            chosen = specifications(returns=returns, specs=grid(vols=('GARCH', 'EGARCH'), orders=(1, 2)), processes=2,
+                                    path=path)
+        self.assertEqual(sorted(chosen), sorted(returns.columns))
+        generator = ARCHGenerator(0.001, specifications=chosen)
+        for ticker, fit in zip(data.Data.columns, generator.fits):
+            spec = chosen.get(ticker, defaultSpecification)
+            self.assertEqual(type(fit.model.volatility).__name__, spec['vol'])
+            self.assertEqual(type(fit.model.distribution).__name__, spec['dist'])
+            self.assertEqual(fit.model.volatility.p, spec['p'])
+        paths = generator.generate_batch(1000, 5)
+        self.assertEqual(paths.shape, (1000, 5, data.N + 1))
+        np.testing.assert_allclose(paths[:, :, 0], 1.001)
+        LogGross = np.log(paths[:, :, 1:]).reshape(-1, data.N)
+        Mean = np.log(generator.Gross).mean().values
+        np.testing.assert_allclose(LogGross.mean(axis=0), Mean, atol=5 * LogGross.std(axis=0).max() / 70)
+
+
+class GARCHSelectionTestCase(unittest.TestCase):
+
+    def test_cache(self):
+        """Checks that the selection is only fitted once for given data, and that it chooses the best fit by asset."""
+        returns = 100 * np.log(data.Data / data.Data.shift())[1:].iloc[-500:, :2]
+        specs = grid(orders=(1, 2))
+        with tempfile.TemporaryDirectory() as path:
+            table = modelSelection(returns, specs, processes=2, path=path)
+            self.assertEqual(len(table), 2 * len(specs))
+            self.assertEqual(os.listdir(path), [os.listdir(path)[0]])
+            self.assertTrue(modelSelection(returns, specs, path=path).equals(table))
+            modelSelection(returns[1:], specs, processes=2, path=path)
+            self.assertEqual(len(os.listdir(path)), 2)
+        best = bestSpecifications(table)
+        for ticker in returns.columns:
+            self.assertEqual(best.aic[ticker], table[(table.ticker == ticker) & table.converged].aic.min())
+
+
+class RollingMomentsTestCase(unittest.TestCase):
+
+    def test_same_output(self):
+        """Checks the moments of sliding (and jumping) windows against the ones computed from scratch."""
+        moments = RollingMoments((data.Data / data.Data.shift() - 1)[1:])
+        dates = data.Data.index[::20]
+        for (start, end) in list(zip(dates[:-12], dates[12:])) + [(dates[0], dates[5]), (dates[3], dates[-1])]:
+            mean, cov = moments.window(start, end)
+            Returns = (data.Data[start:end] / data.Data[start:end].shift() - 1)[1:]
+            np.testing.assert_allclose(mean, Returns.mean(), atol=1e-12)
+            np.testing.assert_allclose(cov, Returns.cov(), atol=1e-12)
+
+    def test_window_moments(self):
+        """Checks the rolling moments of both kinds, and that the generators use the moments they are given."""
+        moments = WindowMoments()
+        dates = data.Data.index[::50]
+        for (start, end) in zip(dates[:-5], dates[5:]):
+            window = moments.window(start, end)
+            scratch = {log: windowMoments(log, start, end) for log in (True, False)}
+            for log in (True, False):
+                for x, y in zip(window[log], scratch[log]):
+                    np.testing.assert_allclose(x, y, atol=1e-12)
+        for generator in (generateGaussianScenarios, generateStudentTScenarios):
+            np.testing.assert_array_equal(generator(100, start=start, end=end, seed=0, moments=scratch)[0],
+                                          generator(100, start=start, end=end, seed=0)[0])
+
+
+class DatasetTestCase(unittest.TestCase):
+
+    def test_synthetic(self):
+        """Checks that the module attributes and the generators follow the current dataset."""
+        dataset = Dataset.synthetic(N=5, T=1000)
+        with use(dataset):
+            self.assertIs(data.dataset, dataset)
+            self.assertEqual(data.N, 5)
+            self.assertEqual(list(data.A), list(range(5)))
+            self.assertEqual(data.Gross.shape, (999, 5))
+            scenarios, _ = generateGaussianScenarios(100, seed=0)
+            self.assertEqual(scenarios.shape, (100, 5))
+            with self.assertRaises(ValueError):
+                data.Store
+        self.assertIsNot(data.dataset, dataset)
+        self.assertEqual(data.N, data.N)
+
+    def test_pickle(self):
+        """Checks that the prices are read from the pickle file without writing any store, until ConvertPickle."""
+        prices = Dataset.synthetic(N=3, T=500).Data
+        with tempfile.TemporaryDirectory() as path, \
+                mock.patch.object(data, 'filename', os.path.join(path, 'data.pkl')), \
+                mock.patch.object(data, 'storePath', os.path.join(path, 'prices')):
+            with self.assertRaises(FileNotFoundError):
+                Dataset().Data
+            prices.to_pickle(data.filename)
+            dataset = Dataset()
+            np.testing.assert_allclose(dataset.gross(freq='W-FRI'), Dataset(Data=prices).gross(freq='W-FRI'))
+            np.testing.assert_array_equal(dataset.Data, prices)
+            self.assertEqual(os.listdir(path), ['data.pkl'])
+            data.ConvertPickle()
+            dataset = Dataset()
+            np.testing.assert_allclose(dataset.gross(freq='W-FRI'), Dataset(Data=prices).gross(freq='W-FRI'))
+            self.assertIsInstance(dataset.Store, PriceStore)
+
+
+class ReductionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.scenarios, self.probas = generateStudentTScenarios(2000, seed=0)
+
+    def test_kmeans(self):
+        """Checks that the k-means reduction keeps the mean and the covariance of the scenarios."""
+        reduced, weights = kMeansReduction(self.scenarios, self.probas, 100, seed=0)
+        self.assertEqual(reduced.shape, (100, data.N))
+        self.assertAlmostEqual(weights.sum(), 1)
+        np.testing.assert_allclose(weights.dot(reduced), self.probas.dot(self.scenarios), atol=1e-12)
+        np.testing.assert_allclose(np.cov(reduced.T, aweights=weights, bias=True),
+                                   np.cov(self.scenarios.T, aweights=self.probas, bias=True), atol=1e-12)
+
+    def test_forward_selection(self):
+        """Checks that the forward selection keeps scenarios, and gets closer to the distribution as K grows."""
+        errors = []
+        for K in (10, 50, 200):
+            reduced, weights = forwardSelection(self.scenarios, self.probas, K)
+            self.assertAlmostEqual(weights.sum(), 1)
+            self.assertTrue(all((self.scenarios == r).all(axis=1).any() for r in reduced))
+            errors.append(reductionError(self.scenarios, self.probas, reduced))
+        self.assertEqual(errors, sorted(errors, reverse=True))
+
+    def test_generator(self):
+        scenarios, probas = ReducedGenerator(generateGaussianScenarios, 50)(1000, seed=0)
+        self.assertEqual(scenarios.shape, (50, data.N))
+        self.assertAlmostEqual(probas.sum(), 1)
+
+
+class SamplingTestCase(unittest.TestCase):
+
+    def test_halton(self):
+        """Checks that each dimension of the scrambled Halton sequence has exactly one point in each stratum."""
+        b = [2, 3, 5, 7]
+        points = halton(b[-1] ** 2 * 2 * 3 * 5, 4)
+        for j in range(4):
+            self.assertEqual(np.bincount((points[:, j] * b[j]).astype(int)).tolist(), [len(points) // b[j]] * b[j])
+
+    def test_standard_normal(self):
+        """Checks the inverse normal CDF and the antithetic pairs."""
+        u = np.linspace(1e-6, 1 - 1e-6, 1001)
+        np.testing.assert_allclose(normalPpf(u), - normalPpf(1 - u), atol=1e-8)
+        self.assertAlmostEqual(normalPpf(np.array([0.975]))[0], 1.959963984540054, places=8)
+        Z = standardNormal(1000, 5, qmc=True, antithetic=True)
+        np.testing.assert_array_equal(Z[:500], - Z[500:])
+        self.assertAlmostEqual(Z[:500].std(), 1, delta=0.01)
+
+
+class DensityTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rd = np.random.RandomState(0)
+
+    def test_multivariate_t(self):
+        """Checks the batch log-density against the direct formula, point by point."""
+        d, df = 5, 4
+        B = self.rd.rand(d, d)
+        mu, sigma = self.rd.rand(d), B.dot(B.T) + np.identity(d)
+        X = self.rd.normal(size=(50, d))
+        log = MultivariateT(mu, sigma, df).logpdf(X)
+        for x, l in zip(X, log):
+            q = (x - mu).dot(np.linalg.inv(sigma)).dot(x - mu)
+            pdf = gamma((d + df) / 2) / (gamma(df / 2) * (df * pi) ** (d / 2) * np.sqrt(np.linalg.det(sigma))
+                                         * (1 + q / df) ** ((d + df) / 2))
+            self.assertAlmostEqual(l, np.log(pdf))
+
+    def test_kernel_density_estimator(self):
+        """Checks the pruned, chunked KDE against the sum over the whole sample."""
+        sample, X, h = self.rd.normal(size=(500, 3)), self.rd.normal(size=(200, 3)), np.array([0.5, 0.8, 1.])
+        density = [np.prod(np.maximum(1 - np.abs((x - sample) / h), 0), axis=1).sum() / (500 * h.prod()) for x in X]
+        for chunk in (2 ** 20, 100):
+            np.testing.assert_allclose(kernel_density_estimator(X, h, sample, chunk=chunk), density, atol=1e-12)
+
+
+class PriceStoreTestCase(unittest.TestCase):
+
+    def test_same_output(self):
+        """Checks that the store gives back the prices and the (resampled) gross returns computed from Data."""
+        with tempfile.TemporaryDirectory() as path:
+            store = PriceStore.write(data.Data, os.path.join(path, 'prices'))
+            np.testing.assert_array_equal(store.prices(), data.Data)
+            for freq in (None, 'W-FRI', 'M'):
+                for (start, end) in ((None, None), (data.Data.index[100], data.Data.index[-100])):
+                    Prices = data.Data.asfreq(freq, method='pad') if freq else data.Data
+                    Gross = (Prices.pct_change() + 1)[1:][start:end]
+                    np.testing.assert_allclose(store.gross(start=start, end=end, freq=freq), Gross)
+                    np.testing.assert_array_equal(store.gross(start=start, end=end, freq=freq).index, Gross.index)
+
+
+class FakeProvider(Provider):
+    """Provider of the synthetic prices of a Dataset up to the date end, recording the requested start dates."""
+
+    def __init__(self, dataset, end):
+        self.dataset = dataset
+        self.end = end
+        self.requests = []
+
+    def fetch(self, ticker, start, end=None):
+        self.requests.append((ticker, start))
+        return self.dataset.Data[ticker][start:self.end]
+
+
+class DownloaderTestCase(unittest.TestCase):
+
+    def test_refresh(self):
+        """Checks that the downloader caches the series, and only fetches their missing tail on refresh."""
+        dataset = Dataset.synthetic(N=3, T=500)
+        dates = dataset.Data.index
+        with tempfile.TemporaryDirectory() as path:
+            provider = FakeProvider(dataset, dates[300])
+            downloader = Downloader(provider, path=path, start=dates[0], maxAge=0)
+            np.testing.assert_array_equal(downloader.download(['S0', 'S1']), dataset.Data[['S0', 'S1']][:301])
+            provider.end = dates[-1]
+            provider.requests = []
+            prices = downloader.download(['S0', 'S1', 'S2'])
+            np.testing.assert_array_equal(prices, dataset.Data)
+            np.testing.assert_array_equal(prices.index, dates)
+            self.assertEqual(sorted(provider.requests), [('S0', dates[300] + pd.Timedelta(days=1)),
+                                                         ('S1', dates[300] + pd.Timedelta(days=1)),
+                                                         ('S2', dates[0])])
+            downloader.maxAge = 1
+            provider.requests = []
+            downloader.download(['S0', 'S1', 'S2'])
+            self.assertEqual(provider.requests, [])
+
+
+class IncrementalCVaRTestCase(unittest.TestCase):
+
+    def test_same_output(self):
+        """Checks that the sorted-loss index gives the same ΔCVaR as the full re-sorts, while the memory grows."""
+        rd = np.random.RandomState(1)
+        index = IncrementalCVaR()
+        RT = np.zeros((0, data.N + 1))
+        hp = np.zeros((0, data.N + 1))
+        for s in range(200):
+            RT = np.vstack((RT, np.exp(rd.normal(0, 0.03, data.N + 1))))
+            hp = np.vstack((hp, rd.rand(data.N + 1) * 1e4))
+            index.add(RT[-1], hp[-1])
+            np.testing.assert_allclose(index.ΔCVaR(), generateΔCVaR(RT, hp), atol=1e-7)
+
+
+class TrainingMemoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rd = np.random.RandomState(2)
+        self.RT = np.exp(rd.normal(0, 0.03, (60, data.N + 1)))
+        self.hp = rd.rand(60, data.N + 1) * 1e4
+        self.h = (self.RT * self.hp).sum(axis=1)
+
+    def fill(self, memory, S=60):
+        for s in range(S):
+            memory.add(self.RT[s], self.hp[s], self.h[s])
+        return memory
+
+    def test_ring_buffer(self):
+        """Checks that a bounded memory keeps the last scenarios, from the oldest to the newest."""
+        memory = self.fill(TrainingMemory(capacity=16), 37)
+        self.assertEqual(len(memory), 16)
+        np.testing.assert_array_equal(memory.RT, self.RT[21:37])
+        np.testing.assert_array_equal(memory.hp, self.hp[21:37])
+        np.testing.assert_array_equal(memory.h, self.h[21:37])
+
+    def test_window(self):
+        """Checks the sliding window ΔCVaR against the full re-sorts of the last window scenarios."""
+        memory = TrainingMemory(capacity=32, window=20)
+        for s in range(60):
+            memory.add(self.RT[s], self.hp[s], self.h[s])
+            lo = max(0, s + 1 - 20)
+            np.testing.assert_allclose(memory.ΔCVaR(), generateΔCVaR(self.RT[lo:s+1], self.hp[lo:s+1]), atol=1e-7)
+
+    def test_remove(self):
+        """Checks the ΔCVaR of the index after removing scenarios of given slots."""
+        index = IncrementalCVaR()
+        for s in range(40):
+            index.add(self.RT[s], self.hp[s])
+        kept = list(range(40))
+        for i in (0, 17, 39, 5):
+            index.remove(i)
+            kept.remove(i)
+            np.testing.assert_allclose(index.ΔCVaR(), generateΔCVaR(self.RT[kept], self.hp[kept]), atol=1e-7)
+
+    def test_history(self):
+        """Checks that the file keeps all the scenarios, while the memory only keeps the last ones."""
+        with tempfile.TemporaryDirectory() as path:
+            memory = self.fill(TrainingMemory(capacity=8, filename=os.path.join(path, 'history')))
+            RT, hp, h = memory.history()
+            np.testing.assert_array_equal(RT, self.RT)
+            np.testing.assert_array_equal(hp, self.hp)
+            np.testing.assert_array_equal(h, self.h)
+            del RT, hp, h
+
+    def test_old_pickle(self):
+        """Checks that a memory pickled with only RT, hp and h is loaded, and can keep on training."""
+        memory = TrainingMemory.__new__(TrainingMemory)
+        memory.__setstate__({'RT': self.RT[:30], 'hp': self.hp[:30], 'h': self.h[:30]})
+        np.testing.assert_array_equal(memory.hp, self.hp[:30])
+        self.fill(memory)
+        np.testing.assert_array_equal(memory.RT[30:], self.RT)
+        np.testing.assert_allclose(memory.ΔCVaR(), generateΔCVaR(memory.RT, memory.hp), atol=1e-7)
+
+
+class PWLCompactFunctionTestCase(unittest.TestCase):
+
+    def test_same_output(self):
+        """Checks that the in-place updates give the same function as PWLDynamicFunction."""
+        rd = np.random.RandomState(5)
+        dynamic, compact = PWLDynamicFunction(), PWLCompactFunction()
+        for s in range(20000):
+            h, deltaV, alpha = 5e4 * rd.rand(), 2 * rd.rand(), 500 / (500 + s)
+            dynamic.update(h, deltaV, alpha)
+            compact.update(h, deltaV, alpha)
+        np.testing.assert_array_equal(compact.a, dynamic.a)
+        np.testing.assert_array_equal(compact.slopes, dynamic.slopes)
+        for h in (0, 1e3, 5e4, 1e6):
+            self.assertEqual(compact(h), dynamic(h))
+
+    def test_below_first_breakpoint(self):
+        with self.assertRaises(ValueError):
+            PWLCompactFunction().pi(-1.)
+
+
+class SeparableValueFunctionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rd = np.random.RandomState(6)
+
+    def randomUpdates(self, *functions, S=2000):
+        for s in range(S):
+            h, deltaV = 5e4 * self.rd.rand(data.N + 1), 2 * self.rd.rand(data.N + 1)
+            for V in functions:
+                V.update(h, deltaV, 500 / (500 + s))
+
+    def test_update_batch(self):
+        """Checks that the batch update of the shared matrices gives the same functions as the per-asset updates."""
+        batch = SeparableValueFunction(value_function_class=PWLCompactFunction)
+        dynamic = SeparableValueFunction(value_function_class=PWLDynamicFunction)
+        self.randomUpdates(batch, dynamic)
+        self.assertEqual(batch.cash, dynamic.cash)
+        for f, g in zip(batch, dynamic):
+            np.testing.assert_array_equal(f.a, g.a)
+            np.testing.assert_array_equal(f.slopes, g.slopes)
+
+    def test_evaluate_batch(self):
+        """
+        Checks the batch evaluation (and the packed copy) against the evaluation of each function, with positions below
+        the first breakpoint (on the first segment, extended) and beyond the last one.
+        """
+        V = SeparableValueFunction(value_function_class=PWLDynamicFunction)
+        self.randomUpdates(V, S=300)
+        H = 6e4 * self.rd.rand(50, data.N + 1)
+        H[:10, 1:] = - 1e3 * self.rd.rand(10, data.N)
+        H[10:20, 1:] = 1e7
+        expected = np.empty_like(H)
+        for k, h in enumerate(H):
+            expected[k, 0] = V.cash * h[0]
+            for i, f in enumerate(V):
+                x = h[i+1]
+                expected[k, i+1] = f(x) if x >= f.a[0] else f.y()[0] + (x - f.a[0]) * f.slopes[0]
+        np.testing.assert_allclose(V.evaluate_batch(H), expected, rtol=1e-12)
+        np.testing.assert_allclose(PackedValueFunction(V).evaluate_batch(H), expected, rtol=1e-12)
+        np.testing.assert_allclose(V(H[25]), expected[25], rtol=1e-12)
+
+    def test_packed_invalidation(self):
+        """Checks that the packed copy is rebuilt when a function is updated directly, and when the cash slope changes."""
+        H = 6e4 * self.rd.rand(50, data.N + 1)
+        for value_function_class in (PWLCompactFunction, PWLDynamicFunction, PWLFixedFunction):
+            V = SeparableValueFunction(value_function_class=value_function_class)
+            self.randomUpdates(V, S=100)
+            V.evaluate_batch(H)
+            for i in range(data.N):
+                V[i].update(3e4 * self.rd.rand(), 2 * self.rd.rand(), 0.5)
+            np.testing.assert_array_equal(V.evaluate_batch(H), PackedValueFunction(V).evaluate_batch(H))
+            V.cash = 2.
+            np.testing.assert_array_equal(V.evaluate_batch(H)[:, 0], 2 * H[:, 0])
+
+    def test_pickle(self):
+        """Checks that the functions of an unpickled value function are still the rows of its matrices."""
+        V = SeparableValueFunction(value_function_class=PWLCompactFunction)
+        self.randomUpdates(V, S=200)
+        W = pickle.loads(pickle.dumps(V))
+        for f, g in zip(V, W):
+            np.testing.assert_array_equal(f.a, g.a)
+            np.testing.assert_array_equal(f.slopes, g.slopes)
+        self.randomUpdates(V, W, S=200)
+        for i, (f, g) in enumerate(zip(V, W)):
+            np.testing.assert_array_equal(g.a, W._a[i, :W._n[i]])
+            np.testing.assert_array_equal(f.slopes, g.slopes)
+
+
+class PWLADPInspectionModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rd = np.random.RandomState(0)
+
+    def randomValueFunction(self, value_function_class):
+        V = SeparableValueFunction(value_function_class=value_function_class)
+        for s in range(self.rd.randint(1, 50)):
+            V.update(5e4 * self.rd.rand(data.N + 1), 2 * self.rd.rand(data.N + 1), 0.3)
+        return V
+
+    def test_same_output(self):
+        """Checks that the inspection model reaches the same objective value as the Gurobi model."""
+        model = PWLADPModel()
+        inspection = PWLADPInspectionModel()
+        for value_function_class in (PWLDynamicFunction, PWLFixedFunction):
+            for i in range(20):
+                V = self.randomValueFunction(value_function_class)
+                hp = 3e4 * self.rd.rand(data.N + 1)
+                R = np.exp(self.rd.normal(0, 0.02, data.N + 1))
+                h_plus, _ = inspection.solve(R, hp, V)
+                model.solve(R, hp, V)
+                self.assertGreaterEqual(h_plus.min(), 0)
+                self.assertAlmostEqual(V(h_plus).sum() - V.cash * (R * hp)[0], model.objVal,
+                                       delta=1e-6 * abs(model.objVal))
+
+
+class ADPStrategyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rd = np.random.RandomState(4)
+        self.strategy = ADPStrategy(value_function_class=PWLDynamicFunction)
+        for V in self.strategy:
+            for s in range(self.rd.randint(1, 20)):
+                V.update(5e4 * self.rd.rand(data.N + 1), 2 * self.rd.rand(data.N + 1), 0.3)
+
+    def test_solve_batch(self):
+        """Checks that solving K portfolios at once gives the same decisions as K calls to solve."""
+        model = PWLADPInspectionModel()
+        R = np.exp(self.rd.normal(0, 0.02, (20, data.N + 1)))
+        hp = 3e4 * self.rd.rand(20, data.N + 1)
+        h_plus, ΔV = model.solve_batch(R, hp, self.strategy[0])
+        for k in range(20):
+            expected_h_plus, expected_ΔV = model.solve(R[k], hp[k], self.strategy[0])
+            np.testing.assert_allclose(h_plus[k], expected_h_plus, rtol=1e-12, atol=1e-8)
+            np.testing.assert_allclose(ΔV[k], expected_ΔV, rtol=1e-12, atol=1e-12)
+
+    def test_score_batch(self):
+        """Checks that the batch replay of the strategy gives the positions of score on each path."""
+        gross = np.exp(self.rd.normal(0, 0.02, (300, data.N + 1)))
+        gross[:, 0] = 1.001
+        paths = bootstrap(gross, 4)
+        self.assertEqual(paths.shape, (4, T, data.N + 1))
+        np.testing.assert_array_equal(paths[0], gross[:T])
+        h = self.strategy.score_batch(paths)
+        for k in range(len(paths)):
+            # score uses one more row (the returns after the last decision, not used)
+            expected = self.strategy.score(pd.DataFrame(np.vstack((paths[k], np.ones(data.N + 1)))))
+            np.testing.assert_allclose(h[k], expected.values.astype(np.float64), rtol=1e-6, atol=1e-3)
+
+    def test_bootstrap_short(self):
+        """Checks that fewer rows than time steps are resampled, without a historical path."""
+        paths = bootstrap(np.ones((T // 2, data.N + 1)), 3)
+        self.assertEqual(paths.shape, (3, T, data.N + 1))
+
+
+class TrainingJobTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.m = value_function.m
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def job(self, name):
+        return TrainingJob('gaussian', 'DD', 3, 0.2, S=12, model_class=PWLADPInspectionModel, test=5, checkpoint=5,
+                           path=os.path.join(self.tmp.name, name, perf_dir_name),
+                           scratch=os.path.join(self.tmp.name, name, 'scenarios'))
+
+    @staticmethod
+    def load(job, name):
+        with open(job.dirname + name, 'rb') as file:
+            return pickle.load(file)
+
+    def test_resume(self):
+        """Checks that a job interrupted after a checkpoint, then resumed, gives the same strategy as a full run."""
+        full = self.job('full').run()
+
+        train = ADPStrategyTrainer.train
+
+        def interrupted(trainer, strategy):
+            if trainer.counter == 7:
+                raise KeyboardInterrupt
+            return train(trainer, strategy)
+
+        job = self.job('interrupted')
+        with mock.patch.object(ADPStrategyTrainer, 'train', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                job.run()
+        self.assertTrue(os.path.exists(job.dirname + 'checkpoint'))
+        self.assertFalse(job.finished())
+        self.assertEqual(value_function.m, self.m)
+        job.run()
+        self.assertEqual(value_function.m, self.m)
+        self.assertTrue(job.finished())
+        self.assertFalse(os.path.exists(job.dirname + 'checkpoint'))
+
+        self.assertEqual(self.load(job, 'test'), self.load(full, 'test'))
+        np.testing.assert_array_equal(self.load(job, 'memory').RT, self.load(full, 'memory').RT)
+        for V, W in zip(self.load(job, 'strategy'), self.load(full, 'strategy')):
+            self.assertEqual(V.cash, W.cash)
+            for f, g in zip(V, W):
+                np.testing.assert_array_equal(f.a, g.a)
+                np.testing.assert_array_equal(f.slopes, g.slopes)
+
+
+class PWLADPModelTestCase(unittest.TestCase):
+
+    def test_same_output(self):
+        """Checks that the persistent model gives the same decisions as a new model, along updates of V, R and hp."""
+        rd = np.random.RandomState(3)
+        model = PWLADPModel()
+        V = SeparableValueFunction(value_function_class=PWLDynamicFunction)
+        for s in range(30):
+            V.update(5e4 * rd.rand(data.N + 1), 2 * rd.rand(data.N + 1), 0.3)
+            hp = 3e4 * rd.rand(data.N + 1)
+            R = np.exp(rd.normal(0, 0.02, data.N + 1))
+            h_plus, ΔV = model.solve(R, hp, V)
+            expected_h_plus, expected_ΔV = gurobiModel(R, hp, V)
+            np.testing.assert_allclose(h_plus, expected_h_plus, rtol=1e-6, atol=1e-4)
+            np.testing.assert_allclose(ΔV, expected_ΔV, rtol=1e-6, atol=1e-6)
+
+
+class RecordingCVaR(InteriorPointCVaR):
+    """InteriorPointCVaR recording the scenarios it is created on (in the current process)."""
+
+    scenarios = []
+
+    def __init__(self, scenarios, probas, **kwargs):
+        RecordingCVaR.scenarios.append((scenarios, probas))
+        super().__init__(scenarios, probas, **kwargs)
+
+
+class BackTestTestCase(unittest.TestCase):
+
+    def test_parallel(self):
+        """Checks that the portfolios do not depend on the number of processes."""
+        portfolios = []
+        for processes in (1, 2):
+            pool = BackTestParamPool(freq='4W-FRI', window=365, generator=generateStudentTScenarios, N=200,
+                                     reconfigure=False, processes=processes)
+            backtest = BackTest(InteriorPointCVaR, pool, RRR=0.)
+            backtest.compute()
+            portfolios.append(backtest.portfolios.astype(np.float64))
+        self.assertEqual(len(portfolios[0]), len(backtest.index))
+        np.testing.assert_array_equal(portfolios[0].values, portfolios[1].values)
+
+    def test_group(self):
+        """Checks that the models of a date share its scenarios, and that the portfolios do not depend on the workers."""
+        RecordingCVaR.scenarios = scenarios = []
+        portfolios = []
+        for processes in (1, 2):
+            pool = BackTestParamPool(freq='4W-FRI', window=365, generator=generateStudentTScenarios, N=200,
+                                     reconfigure=False, processes=processes)
+            group = BackTestGroup([RecordingCVaR, RecordingCVaR, InteriorPointCVaR], pool)
+            # The scenarios are drawn (without seed) by the parent process
+            np.random.seed(0)
+            group.compute()
+            portfolios.append([backtest.portfolios.astype(np.float64).values for backtest in group])
+
+        # Only the serial BackTestGroup creates its models in this process
+        self.assertEqual(len(scenarios), 2 * len(group.index))
+        for (s1, p1), (s2, p2) in zip(scenarios[::2], scenarios[1::2]):
+            np.testing.assert_array_equal(s1, s2)
+            np.testing.assert_array_equal(p1, p2)
+        for serial, parallel in zip(*portfolios):
+            self.assertEqual(len(serial), len(group.index))
+            np.testing.assert_array_equal(serial, portfolios[0][0])
+            np.testing.assert_array_equal(serial, parallel)
+
+
 class Test(unittest.TestCase):
 
     def test_coucou(self):